@@ -1,30 +1,54 @@
 import React, { useState } from "react";
 import "./App.css";
 
+// Users per /users/ page; the dropdown loads the next page when "Load more users" is picked
+const USERS_PAGE_SIZE = 100;
+const LOAD_MORE_USERS = "load-more";
+
 const App = () => {
   const [messages, setMessages] = useState([]);
   const [isSending, setIsSending] = useState(false);
   const [users, setUsers] = useState([]);
   const [selectedUserId, setSelectedUserId] = useState(null);
+  const [nextUsersAfterId, setNextUsersAfterId] = useState(null);
+  const [isLoadingUsers, setIsLoadingUsers] = useState(false);
 
-  // Fetch users when component mounts
-  React.useEffect(() => {
-    const fetchUsers = async () => {
-      try {
-        const response = await fetch("http://localhost:8000/users/");
-        const data = await response.json();
-        setUsers(data);
-        // Set first user as default if available
-        if (data.length > 0) {
-          setSelectedUserId(data[0].id);
-        }
-      } catch (error) {
-        console.error("Error fetching users:", error);
+  // Fetch one keyset page of users; the first on mount, later ones when the dropdown asks for more
+  const loadUsers = React.useCallback(async (afterId) => {
+    setIsLoadingUsers(true);
+    try {
+      // Only the columns the dropdown shows
+      const params = new URLSearchParams({
+        fields: "id,name",
+        limit: String(USERS_PAGE_SIZE),
+      });
+      if (afterId !== null) {
+        params.set("after_id", afterId);
+      }
+      const response = await fetch(`http://localhost:8000/users/?${params}`);
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      const page = await response.json();
+      setUsers((prevUsers) =>
+        afterId === null ? page.items : [...prevUsers, ...page.items]
+      );
+      setNextUsersAfterId(page.next_after_id);
+      // Set first user as default if available
+      if (afterId === null && page.items.length > 0) {
+        setSelectedUserId(page.items[0].id);
       }
-    };
-    fetchUsers();
+    } catch (error) {
+      console.error("Error fetching users:", error);
+    } finally {
+      setIsLoadingUsers(false);
+    }
   }, []);
 
+  React.useEffect(() => {
+    loadUsers(null);
+  }, [loadUsers]);
+
   const addMessage = (message) => {
     setMessages((prevMessages) => [...prevMessages, message]);
   };
@@ -106,6 +130,9 @@ const App = () => {
           users={users}
           selectedUserId={selectedUserId}
           onUserSelect={setSelectedUserId}
+          hasMoreUsers={nextUsersAfterId !== null}
+          isLoadingUsers={isLoadingUsers}
+          onLoadMoreUsers={() => loadUsers(nextUsersAfterId)}
         />
       </div>
     </div>
@@ -283,6 +310,9 @@ const InputArea = ({
   users,
   selectedUserId,
   onUserSelect,
+  hasMoreUsers,
+  isLoadingUsers,
+  onLoadMoreUsers,
 }) => {
   const [question, setQuestion] = useState("");
 
@@ -299,7 +329,13 @@ const InputArea = ({
         <select
           className="user-dropdown"
           value={selectedUserId || ""}
-          onChange={(e) => onUserSelect(Number(e.target.value))}
+          onChange={(e) => {
+            if (e.target.value === LOAD_MORE_USERS) {
+              onLoadMoreUsers();
+            } else {
+              onUserSelect(Number(e.target.value));
+            }
+          }}
           disabled={isSending}
         >
           {users.map((user) => (
@@ -307,6 +343,11 @@ const InputArea = ({
               {user.name}
             </option>
           ))}
+          {hasMoreUsers && (
+            <option value={LOAD_MORE_USERS} disabled={isLoadingUsers}>
+              {isLoadingUsers ? "Loading users..." : "Load more users..."}
+            </option>
+          )}
         </select>
       )}
       <input
@@ -21,7 +21,7 @@ if config.config_file_name is not None:
 from config.db import Base
 from app.User.model import User
 from app.Post.model import Post
-from app.Media.model import Media
+from app.Media.model import Media, MediaHash, MediaJob
 from app.Timeline.model import Timeline
 from app.Follow.model import Follow
 from app.Places.model import Place
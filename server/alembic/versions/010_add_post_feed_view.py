@@ -0,0 +1,55 @@
+"""Add post_feed materialized view
+
+Revision ID: 010
+Revises: 009
+Create Date: 2025-11-24 10:00:00.000000
+
+One row per post with author, caption, timestamps, media URL and tags so the
+SQL agent can answer post/image questions with a single indexed scan.
+
+The data lives in the post_feed_mv materialized view. post_feed is a plain
+view over it because SQLDatabase only reflects tables and plain views; the
+planner inlines it, so queries still use the materialized view's indexes.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE MATERIALIZED VIEW post_feed_mv AS
+        SELECT
+            p.id AS post_id,
+            p.user_id,
+            u.name AS author_name,
+            u.avatar_url AS author_avatar_url,
+            p.caption,
+            p.created_at,
+            p.updated_at,
+            p.media_id,
+            m.external_resource_url AS media_url,
+            ARRAY(SELECT json_array_elements_text(m.meta -> 'tags')) AS tags
+        FROM posts p
+        JOIN users u ON u.id = p.user_id
+        LEFT JOIN media m ON m.id = p.media_id
+    """)
+
+    # Unique index is required for REFRESH MATERIALIZED VIEW CONCURRENTLY
+    op.execute("CREATE UNIQUE INDEX ix_post_feed_mv_post_id ON post_feed_mv (post_id)")
+    op.execute("CREATE INDEX ix_post_feed_mv_user_id_created_at ON post_feed_mv (user_id, created_at DESC)")
+    op.execute("CREATE INDEX ix_post_feed_mv_created_at ON post_feed_mv (created_at DESC)")
+    op.execute("CREATE INDEX ix_post_feed_mv_tags ON post_feed_mv USING GIN (tags)")
+
+    op.execute("CREATE VIEW post_feed AS SELECT * FROM post_feed_mv")
+
+
+def downgrade() -> None:
+    op.execute("DROP VIEW IF EXISTS post_feed")
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS post_feed_mv")
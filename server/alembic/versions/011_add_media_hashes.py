@@ -0,0 +1,35 @@
+"""Add media_hashes content index
+
+Revision ID: 011
+Revises: 010
+Create Date: 2025-12-01 10:00:00.000000
+
+SHA-256 of the stored bytes -> media row. Ingestion looks uploads up here
+first, so a photo that was already stored is not uploaded (or resized)
+again and the existing media row is returned instead.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'media_hashes',
+        sa.Column('sha256', sa.String(length=64), primary_key=True),
+        sa.Column('media_id', sa.Integer(), sa.ForeignKey('media.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    )
+    op.create_index('ix_media_hashes_media_id', 'media_hashes', ['media_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_media_hashes_media_id', table_name='media_hashes')
+    op.drop_table('media_hashes')
@@ -0,0 +1,40 @@
+"""Add media_jobs queue table
+
+Revision ID: 012
+Revises: 011
+Create Date: 2025-12-08 10:00:00.000000
+
+Media generation runs as background jobs. Each submitted job is a row
+here (queued -> running -> succeeded/failed) holding its request and,
+once finished, its results, so clients can poll for them and jobs still
+queued or running when the server stops are picked up again on start.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'media_jobs',
+        sa.Column('id', sa.String(length=32), primary_key=True),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_media_jobs_status', 'media_jobs', ['status'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_media_jobs_status', table_name='media_jobs')
+    op.drop_table('media_jobs')
@@ -0,0 +1,33 @@
+"""Add claims to media_jobs
+
+Revision ID: 013
+Revises: 012
+Create Date: 2025-12-15 10:00:00.000000
+
+Every API process can queue media jobs, and job runners claim queued rows
+with FOR UPDATE SKIP LOCKED. A claim holds a token and a lease the runner
+keeps extending while the job runs; a running job whose lease expired (its
+process died) can be claimed again, and only the current claim can record
+the job's result.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '013'
+down_revision = '012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('media_jobs', sa.Column('claim_id', sa.String(length=32), nullable=True))
+    op.add_column('media_jobs', sa.Column('claimed_until', sa.DateTime(), nullable=True))
+    op.create_index('ix_media_jobs_status_created_at', 'media_jobs', ['status', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_media_jobs_status_created_at', table_name='media_jobs')
+    op.drop_column('media_jobs', 'claimed_until')
+    op.drop_column('media_jobs', 'claim_id')
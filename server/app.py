@@ -27,6 +27,7 @@ from app.Media.model import Media
 from app.Timeline.model import Timeline
 from app.Follow.model import Follow
 from app.Places.model import Place
+from app.Post.feed import post_feed_refresher
 
 
 app.add_middleware(
@@ -43,6 +44,14 @@ app.add_middleware(
 async def root():
     return {"app": __app_name__, "version": __version__}
 
+@app.on_event("startup")
+async def start_background_jobs():
+    post_feed_refresher.start()
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    await post_feed_refresher.stop()
+
 @app.get("/health")
 async def health_check():
     # Basic health check - could add DB ping, etc.
@@ -0,0 +1,332 @@
+"""
+Bulk copy of externally hosted media into MinIO
+
+Replaces the serial download/upload loop of migration 009:
+
+- bounded pool of workers, each streaming the source response body straight
+  into MinIO (no full download into memory first)
+- every finished row is appended to a JSONL checkpoint, so an interrupted run
+  resumes where it stopped instead of starting over. The checkpoint is tied to
+  the database and bucket it was written for, and is deleted once a run that
+  commits its own UPDATEs finishes without failures (a run on the caller's
+  connection keeps it, since that transaction may still roll back)
+- media URLs are rewritten with one batched UPDATE per batch_size rows
+- throughput (rows/s, MB/s) is logged while running and returned at the end
+
+Standalone:
+    python -m app.Media.bulk_upload --workers 32 --checkpoint /tmp/media_upload.jsonl
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from boto3.s3.transfer import TransferConfig
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.common.async_minio_client import AsyncMinIOClient
+from app.common.batch_sql import update_from_values
+from app.common.minio_client import MinIOClient, minio_client
+from config.db import engine
+
+logger = logging.getLogger(__name__)
+
+# Rows migration 009 copies: seed photos and avatars still pointing at their original hosts
+DEFAULT_SOURCE_FILTER = (
+    "external_resource_url LIKE 'https://images.unsplash.com%' "
+    "OR external_resource_url LIKE 'https://i.pravatar.cc%'"
+)
+PAGE_SIZE = 1000
+REPORT_EVERY_SECONDS = 10
+STREAM_CHUNK_SIZE = 256 * 1024
+
+
+def object_key(media_id: int, source_url: str, content_type: str) -> str:
+    """
+    MinIO key for a copied row (same layout migration 009 always used)
+
+    Args:
+        media_id: media.id
+        source_url: Original URL, picks the folder
+        content_type: Response Content-Type, picks the extension
+
+    Returns:
+        Key such as photos/media_12.jpg
+    """
+    if 'png' in content_type:
+        extension = 'png'
+    elif 'webp' in content_type:
+        extension = 'webp'
+    else:
+        extension = 'jpg'
+    folder = 'photos' if 'unsplash' in source_url else 'avatars'
+    return f"{folder}/media_{media_id}.{extension}"
+
+
+class UploadStats:
+    """Counters for one run."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.uploaded = 0
+        self.failed = 0
+        self.resumed = 0
+        self.bytes = 0
+
+    def summary(self) -> Dict:
+        elapsed = time.monotonic() - self.started
+        return {
+            'uploaded': self.uploaded,
+            'failed': self.failed,
+            'resumed': self.resumed,
+            'megabytes': round(self.bytes / 1e6, 2),
+            'elapsed_s': round(elapsed, 2),
+            'rows_per_s': round(self.uploaded / elapsed, 2) if elapsed else 0.0,
+            'mb_per_s': round(self.bytes / 1e6 / elapsed, 2) if elapsed else 0.0,
+        }
+
+
+class _StreamReader:
+    """File-like view of a streamed response body for upload_fileobj; counts the bytes passed through."""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self.chunks = chunks
+        self.buffer = bytearray()
+        self.count = 0
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self.buffer) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.buffer += chunk
+        if size < 0:
+            size = len(self.buffer)
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        self.count += len(data)
+        return data
+
+
+class BulkMediaUploader:
+    """Copies media rows matching a filter into MinIO and points them at the copies."""
+
+    def __init__(
+        self,
+        connection: Optional[Connection] = None,
+        client: MinIOClient = minio_client,
+        workers: int = 16,
+        batch_size: int = 200,
+        checkpoint_path: Optional[str] = None,
+        timeout: Tuple[float, float] = (5, 30)
+    ):
+        """
+        Args:
+            connection: Connection to run queries/UPDATEs on (e.g. a migration's); defaults to short engine transactions
+            client: MinIO client to upload with
+            workers: Concurrent downloads/uploads
+            batch_size: Rows per batched UPDATE
+            checkpoint_path: JSONL progress log; defaults to MEDIA_UPLOAD_CHECKPOINT or ./media_upload_checkpoint.jsonl
+            timeout: (connect, read) timeout for source downloads
+        """
+        self.connection = connection
+        self.client = client
+        self.workers = workers
+        self.batch_size = batch_size
+        self.checkpoint_path = checkpoint_path or os.getenv('MEDIA_UPLOAD_CHECKPOINT', 'media_upload_checkpoint.jsonl')
+        self.timeout = timeout
+        # Bodies up to the threshold go up in one put_object; larger ones as multipart
+        self.transfer_config = TransferConfig(multipart_threshold=16 * 1024 * 1024, max_concurrency=4)
+        # boto3 client with a connection pool sized for the workers (the default pool holds 10)
+        self.s3 = AsyncMinIOClient(client, max_connections=workers).client
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def run(self, source_filter: str = DEFAULT_SOURCE_FILTER) -> Dict:
+        """
+        Copy every matching row, resuming from the checkpoint
+
+        Args:
+            source_filter: SQL condition on media selecting the rows to copy
+
+        Returns:
+            UploadStats.summary()
+        """
+        stats = UploadStats()
+        scope = self._scope()
+        # media id -> (source URL, uploaded URL) from an interrupted run for this database and bucket
+        done = self._load_checkpoint(scope)
+        if done:
+            logger.info(f"Resuming: {len(done)} rows already uploaded")
+        pending: List[Tuple[int, str, str]] = []
+
+        last_report = time.monotonic()
+        with open(self.checkpoint_path, 'a') as checkpoint, ThreadPoolExecutor(max_workers=self.workers) as executor:
+            if checkpoint.tell() == 0:
+                checkpoint.write(json.dumps({'scope': scope}) + '\n')
+            in_flight: Dict[Future, Tuple[int, str]] = {}
+            rows = self._rows(source_filter)
+            exhausted = False
+            while in_flight or not exhausted:
+                # Keep the pool busy without queueing the whole table
+                while not exhausted and len(in_flight) < self.workers * 2:
+                    row = next(rows, None)
+                    if row is None:
+                        exhausted = True
+                        break
+                    media_id, source_url = row
+                    if done.get(media_id, (None,))[0] == source_url:
+                        # Uploaded before, but the row still points at its source: the UPDATE didn't land
+                        stats.resumed += 1
+                        pending.append((media_id, source_url, done[media_id][1]))
+                        continue
+                    in_flight[executor.submit(self._copy, media_id, source_url)] = row
+                if len(pending) >= self.batch_size:
+                    self._flush(pending)
+                    pending = []
+                if not in_flight:
+                    break
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    media_id, source_url = in_flight.pop(future)
+                    try:
+                        url, size = future.result()
+                    except Exception as e:
+                        stats.failed += 1
+                        checkpoint.write(json.dumps({'id': media_id, 'error': str(e)}) + '\n')
+                        logger.warning(f"Failed to upload media {media_id}: {e}")
+                        continue
+                    stats.uploaded += 1
+                    stats.bytes += size
+                    checkpoint.write(json.dumps({'id': media_id, 'source': source_url, 'url': url}) + '\n')
+                    pending.append((media_id, source_url, url))
+
+                if len(pending) >= self.batch_size:
+                    checkpoint.flush()
+                    self._flush(pending)
+                    pending = []
+                if time.monotonic() - last_report >= REPORT_EVERY_SECONDS:
+                    last_report = time.monotonic()
+                    logger.info(f"Media upload progress: {stats.summary()}")
+
+            checkpoint.flush()
+            self._flush(pending)
+
+        if not stats.failed and self.connection is None:
+            # Every UPDATE is committed and nothing is left to resume; a later run starts clean
+            os.remove(self.checkpoint_path)
+        elif not stats.failed:
+            # The caller's transaction (e.g. the migration's) may still roll back the UPDATEs;
+            # the checkpoint then spares the uploads, so it stays until that has committed
+            logger.info(f"Keeping {self.checkpoint_path} until the caller's transaction commits; delete it afterwards")
+        summary = stats.summary()
+        logger.info(f"Media upload finished: {summary}")
+        return summary
+
+    def _copy(self, media_id: int, source_url: str) -> Tuple[str, int]:
+        """Stream one source body into MinIO; returns (new URL, bytes copied)."""
+        with self.session.get(source_url, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            content_type = response.headers.get('Content-Type', 'image/jpeg')
+            key = object_key(media_id, source_url, content_type)
+            body = _StreamReader(response.iter_content(STREAM_CHUNK_SIZE))
+            self.s3.upload_fileobj(
+                body,
+                self.client.bucket,
+                key,
+                ExtraArgs={'ContentType': content_type},
+                Config=self.transfer_config
+            )
+        return self.client.get_file_url(key), body.count
+
+    def _rows(self, source_filter: str) -> Iterator[Tuple[int, str]]:
+        """Matching rows in id order, fetched a page at a time."""
+        last_id = 0
+        while True:
+            page = self._execute(
+                text(
+                    f"SELECT id, external_resource_url FROM media WHERE ({source_filter}) AND id > :last_id "
+                    f"ORDER BY id LIMIT {PAGE_SIZE}"
+                ),
+                {'last_id': last_id}
+            )
+            if not page:
+                return
+            yield from page
+            last_id = page[-1][0]
+
+    def _flush(self, pending: List[Tuple[int, str, str]]) -> None:
+        """Point uploaded rows still at their source URL at the MinIO copies, batch_size rows per UPDATE."""
+        for start in range(0, len(pending), self.batch_size):
+            statement, params = update_from_values(
+                'media', ('id', 'source', 'url'), pending[start:start + self.batch_size],
+                set_clause='external_resource_url = v.url',
+                where='media.id = v.id AND media.external_resource_url = v.source'
+            )
+            self._execute(statement, params, fetch=False)
+
+    def _execute(self, statement, params: Dict, fetch: bool = True):
+        if self.connection is not None:
+            result = self.connection.execute(statement, params)
+            return result.all() if fetch else None
+        with engine.begin() as conn:
+            result = conn.execute(statement, params)
+            return result.all() if fetch else None
+
+    def _scope(self) -> str:
+        """Database and bucket a checkpoint belongs to."""
+        url = engine.url
+        return f"{url.host}:{url.port}/{url.database} -> {self.client.endpoint}/{self.client.bucket}"
+
+    def _load_checkpoint(self, scope: str) -> Dict[int, Tuple[str, str]]:
+        """
+        Uploads recorded by an earlier run for the same scope (failed rows are retried)
+
+        A checkpoint written for another database or bucket (or without a scope) is deleted.
+
+        Returns:
+            media id -> (source URL, uploaded URL)
+        """
+        done: Dict[int, Tuple[str, str]] = {}
+        if not os.path.exists(self.checkpoint_path):
+            return done
+        with open(self.checkpoint_path) as f:
+            written_for = _parse_line(f.readline()).get('scope')
+            if written_for == scope:
+                for line in f:
+                    entry = _parse_line(line)
+                    if 'url' in entry:
+                        done[entry['id']] = (entry['source'], entry['url'])
+        if written_for != scope:
+            logger.warning(f"Discarding {self.checkpoint_path}: written for {written_for!r}, not {scope!r}")
+            os.remove(self.checkpoint_path)
+        return done
+
+
+def _parse_line(line: str) -> Dict:
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        # Torn last line from a killed run (or an empty file)
+        return {}
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Copy externally hosted media into MinIO")
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--checkpoint', default=None, help="JSONL progress log (resumes from it if present)")
+    args = parser.parse_args()
+    uploader = BulkMediaUploader(workers=args.workers, batch_size=args.batch_size, checkpoint_path=args.checkpoint)
+    print(json.dumps(uploader.run(), indent=2))
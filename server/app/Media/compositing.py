@@ -0,0 +1,146 @@
+"""
+In-memory decode, compositing and encoding of media, kept free of torch
+
+Images are decoded straight from the downloaded buffers, the person is pasted
+onto the background in place and the result is encoded into a buffer that is
+uploaded as is, so an image's bytes are never duplicated along the way.
+"""
+import io
+import posixpath
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from app.common.async_minio_client import Buffer, BufferReader
+
+OUTPUT_FORMATS = {
+    '.png': ('PNG', 'image/png'),
+    '.webp': ('WEBP', 'image/webp'),
+}
+DEFAULT_OUTPUT_FORMAT = ('JPEG', 'image/jpeg')
+# Output rows resized per step by open_background
+RESIZE_BAND_ROWS = 256
+
+
+def pack_mask(mask: Image.Image) -> bytes:
+    """
+    Bit-pack a binary mask (one bit per pixel)
+
+    Args:
+        mask: 'L' image, non-zero where the person is
+
+    Returns:
+        Packed bits in row-major order; unpack_mask needs the mask's size to restore it
+    """
+    return np.packbits(np.asarray(mask) > 0).tobytes()
+
+
+def unpack_mask(data: bytes, size: Tuple[int, int]) -> Image.Image:
+    """
+    Inverse of pack_mask
+
+    Args:
+        data: Packed bits
+        size: (width, height) of the mask
+
+    Returns:
+        'L' image, 255 where the person is (backed by the unpacked array, not a copy of it)
+    """
+    width, height = size
+    pixels = np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=width * height)
+    np.multiply(pixels, 255, out=pixels)
+    return Image.fromarray(pixels.reshape(height, width), mode='L')
+
+
+def open_image(data: Buffer, fit: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """
+    Decode an RGB image straight from an in-memory buffer
+
+    Args:
+        data: Encoded image
+        fit: Size the caller will resize the image to. JPEGs are then decoded at the smallest
+            DCT scale (1/2, 1/4 or 1/8) still covering it, other formats reduced by an integer factor
+
+    Returns:
+        Loaded RGB image, at least fit in both dimensions when fit is given
+    """
+    image = Image.open(BufferReader(memoryview(data)))
+    if fit is not None:
+        image.draft('RGB', fit)
+    image.load()
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    if fit is not None:
+        factor = min(image.width // fit[0], image.height // fit[1])
+        if factor >= 2:
+            image = image.reduce(factor)
+    return image
+
+
+def open_background(data: Buffer, size: Tuple[int, int]) -> Image.Image:
+    """
+    Decode a background at (about) size and resize it to exactly size
+
+    A one-shot resize allocates a full-width intermediate as tall as the source; resizing a
+    band of rows at a time into the output keeps that intermediate to a band.
+
+    Args:
+        data: Encoded background
+        size: (width, height) to resize to
+
+    Returns:
+        RGB image of the given size
+    """
+    image = open_image(data, fit=size)
+    if image.size == size:
+        return image
+    resized = Image.new('RGB', size)
+    scale = image.height / size[1]
+    for top in range(0, size[1], RESIZE_BAND_ROWS):
+        bottom = min(top + RESIZE_BAND_ROWS, size[1])
+        # The filter still reads source rows just outside the box, so bands join seamlessly
+        band = image.resize((size[0], bottom - top), Image.BILINEAR, box=(0, top * scale, image.width, bottom * scale))
+        resized.paste(band, (0, top))
+    return resized
+
+
+def composite_onto(host: Image.Image, background: Image.Image, mask: Image.Image) -> Image.Image:
+    """
+    Place the person from the host image onto the background
+
+    Args:
+        host: RGB host image
+        background: RGB background; pasted into in place when it already has the host's size
+        mask: 'L' person mask of the host
+
+    Returns:
+        The composite (the background image itself, or its resized copy)
+    """
+    if background.size != host.size:
+        background = background.resize(host.size, Image.BILINEAR)
+    background.paste(host, (0, 0), mask)
+    return background
+
+
+def output_format(key: str) -> Tuple[str, str]:
+    """(Pillow format, content type) for an output key, by extension; JPEG unless .png/.webp."""
+    return OUTPUT_FORMATS.get(posixpath.splitext(key)[1].lower(), DEFAULT_OUTPUT_FORMAT)
+
+
+def encode(image: Image.Image, key: str, quality: int = 90) -> io.BytesIO:
+    """
+    Encode an image for an output key
+
+    Args:
+        image: Image to encode
+        key: Output object key, picks the format
+        quality: JPEG/WebP quality
+
+    Returns:
+        Buffer holding the encoded image; upload its getbuffer() to avoid copying it out
+    """
+    buffer = io.BytesIO()
+    pil_format, _ = output_format(key)
+    image.save(buffer, pil_format, **({} if pil_format == 'PNG' else {'quality': quality}))
+    return buffer
@@ -0,0 +1,250 @@
+"""
+Content-addressed media ingestion with hash dedup
+
+Rows stored before migration 011 are hashed into media_hashes by the backfill:
+    python -m app.Media.ingestion --batch-size 200
+"""
+import argparse
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import tempfile
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from app.common.batch_sql import values_list
+from app.common.image_derivatives import upload_image
+from app.common.minio_client import MinIOClient, media_url_service, minio_client
+from config.db import engine
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+# Uploads larger than this are spooled to a temporary file while being hashed
+SPOOL_MAX_BYTES = int(os.getenv('MEDIA_INGEST_SPOOL_MB', '16')) * 1024 * 1024
+
+
+def hash_stream(source: Union[bytes, BinaryIO], chunk_size: int = CHUNK_SIZE) -> Tuple[BinaryIO, str, int]:
+    """
+    Copy an upload into a spooled buffer, hashing it on the way
+
+    Args:
+        source: Bytes or a readable binary file object (e.g. UploadFile.file)
+        chunk_size: Read size
+
+    Returns:
+        (buffer positioned at the start, SHA-256 hex digest, size in bytes)
+    """
+    digest = hashlib.sha256()
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    size = 0
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+        spool.write(source)
+        size = len(source)
+    else:
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            spool.write(chunk)
+            size += len(chunk)
+    spool.seek(0)
+    return spool, digest.hexdigest(), size
+
+
+def content_key(digest: str, content_type: str) -> str:
+    """
+    Content-addressed object key
+
+    Args:
+        digest: SHA-256 hex digest of the content
+        content_type: MIME type, used for the extension
+
+    Returns:
+        Key such as sha256/3a/3a7bd3e2...jpg (two-character fan-out keeps listings small)
+    """
+    extension = mimetypes.guess_extension(content_type or '') or ''
+    if extension == '.jpe':
+        extension = '.jpg'
+    return f"sha256/{digest[:2]}/{digest}{extension}"
+
+
+class MediaIngestionService:
+    """Stores uploads once per unique content and returns the media row that holds them."""
+
+    def __init__(self, client: MinIOClient = minio_client):
+        self.client = client
+
+    def ingest(
+        self,
+        source: Union[bytes, BinaryIO],
+        content_type: str = 'application/octet-stream',
+        meta: Optional[Dict] = None
+    ) -> Tuple[Dict, bool]:
+        """
+        Ingest an upload
+
+        Args:
+            source: Bytes or a readable binary file object
+            content_type: MIME type of the upload
+            meta: Extra fields for media.meta (e.g. tags) when a new row is created
+
+        Returns:
+            (media row as a dict, True if it was created; False if identical content already existed)
+        """
+        spool, digest, size = hash_stream(source)
+        with spool:
+            existing = self._find_by_hash(digest)
+            if existing is not None:
+                logger.info(f"Upload matches media {existing['id']} ({digest[:12]}), skipping upload")
+                return existing, False
+
+            key = content_key(digest, content_type)
+            media_meta = {
+                'type': content_type.split('/', 1)[0],
+                'content_type': content_type,
+                'size': size,
+                'sha256': digest,
+            }
+            if content_type.startswith('image/'):
+                # Pillow needs the whole image anyway; variants are generated once per unique content
+                url, variant_meta = upload_image(spool.read(), key, content_type, self.client)
+                media_meta.update(variant_meta)
+            else:
+                self.client.client.upload_fileobj(
+                    spool, self.client.bucket, key, ExtraArgs={'ContentType': content_type}
+                )
+                url = self.client.get_file_url(key)
+            media_meta.update(meta or {})
+
+        try:
+            return self._insert(url, media_meta, digest, size), True
+        except IntegrityError:
+            # A concurrent ingest of the same content won the race; the object key is
+            # the same, so our upload only rewrote identical bytes
+            existing = self._find_by_hash(digest)
+            if existing is None:
+                raise
+            return existing, False
+
+    def backfill_hashes(self, limit: Optional[int] = None, batch_size: int = 200) -> Dict:
+        """
+        Hash the MinIO objects of media rows that have no media_hashes entry yet
+
+        Rows stored before content addressing (e.g. the 007/008 seed copied by migration 009)
+        otherwise never match a re-upload of their content. When several existing rows hold
+        the same content, the lowest id is indexed and the others are reported as duplicates.
+
+        Args:
+            limit: Max rows to hash
+            batch_size: Rows per batched INSERT into media_hashes
+
+        Returns:
+            {'hashed': rows indexed, 'duplicates': rows whose content another row already holds,
+             'skipped': rows not stored in this MinIO bucket or unreadable}
+        """
+        stats = {'hashed': 0, 'duplicates': 0, 'skipped': 0}
+        pending: List[Tuple[str, int, int]] = []
+        for media_id, url in self._unhashed_rows(limit):
+            key = media_url_service.key_for_url(url or '')
+            if key is None:
+                stats['skipped'] += 1
+                continue
+            try:
+                digest, size = self._hash_object(key)
+            except Exception as e:
+                logger.warning(f"Skipping media {media_id}: {e}")
+                stats['skipped'] += 1
+                continue
+            pending.append((digest, media_id, size))
+            if len(pending) >= batch_size:
+                self._record_hashes(pending, stats)
+                pending = []
+        self._record_hashes(pending, stats)
+        logger.info(f"Media hash backfill finished: {stats}")
+        return stats
+
+    def _hash_object(self, key: str) -> Tuple[str, int]:
+        """SHA-256 and size of a stored object, read in chunks."""
+        body = self.client.client.get_object(Bucket=self.client.bucket, Key=key)['Body']
+        digest = hashlib.sha256()
+        size = 0
+        while True:
+            chunk = body.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+        return digest.hexdigest(), size
+
+    def _record_hashes(self, pending: List[Tuple[str, int, int]], stats: Dict) -> None:
+        if pending:
+            inserted = self._insert_hashes(pending)
+            stats['hashed'] += inserted
+            stats['duplicates'] += len(pending) - inserted
+
+    def _unhashed_rows(self, limit: Optional[int]) -> List[Tuple[int, str]]:
+        query = (
+            "SELECT m.id, m.external_resource_url FROM media m "
+            "WHERE NOT EXISTS (SELECT 1 FROM media_hashes h WHERE h.media_id = m.id) ORDER BY m.id"
+        )
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        with engine.connect() as conn:
+            return conn.execute(text(query)).all()
+
+    def _insert_hashes(self, entries: List[Tuple[str, int, int]]) -> int:
+        """Insert (sha256, media id, size) rows in one statement; returns how many were new hashes."""
+        # Duplicates within one batch would make ON CONFLICT fail; the first (lowest id) row wins
+        unique = list({digest: (digest, media_id, size) for digest, media_id, size in reversed(entries)}.values())
+        values, params = values_list(('sha256', 'media_id', 'size'), unique)
+        with engine.begin() as conn:
+            return len(conn.execute(
+                text(
+                    f"INSERT INTO media_hashes (sha256, media_id, size) VALUES {values} "
+                    "ON CONFLICT (sha256) DO NOTHING RETURNING media_id"
+                ),
+                params
+            ).all())
+
+    def _find_by_hash(self, digest: str) -> Optional[Dict]:
+        with engine.connect() as conn:
+            row = conn.execute(
+                text(
+                    "SELECT m.id, m.external_resource_url, m.meta FROM media_hashes h "
+                    "JOIN media m ON m.id = h.media_id WHERE h.sha256 = :sha256"
+                ),
+                {"sha256": digest}
+            ).first()
+        return dict(row._mapping) if row else None
+
+    def _insert(self, url: str, meta: Dict, digest: str, size: int) -> Dict:
+        with engine.begin() as conn:
+            media_id = conn.execute(
+                text("INSERT INTO media (external_resource_url, meta) VALUES (:url, :meta) RETURNING id"),
+                {"url": url, "meta": json.dumps(meta)}
+            ).scalar_one()
+            conn.execute(
+                text("INSERT INTO media_hashes (sha256, media_id, size) VALUES (:sha256, :media_id, :size)"),
+                {"sha256": digest, "media_id": media_id, "size": size}
+            )
+        return {"id": media_id, "external_resource_url": url, "meta": meta}
+
+
+# Singleton instance
+media_ingestion_service = MediaIngestionService()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Hash existing media into media_hashes so re-uploads are deduplicated")
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=200, help="Rows per batched INSERT")
+    args = parser.parse_args()
+    print(json.dumps(media_ingestion_service.backfill_hashes(args.limit, args.batch_size), indent=2))
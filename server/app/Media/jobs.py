@@ -0,0 +1,288 @@
+"""Background media generation jobs, persisted in media_jobs"""
+import asyncio
+import json
+import logging
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from config.config import settings
+from config.db import engine
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+Runner = Callable[[List[Dict]], Awaitable[List[Dict]]]
+
+
+class QueueFull(Exception):
+    """Raised by submit when max_pending jobs are already waiting."""
+
+
+def media_backend():
+    """
+    Where media generation runs: the media worker process when MEDIA_WORKER_URL is set,
+    otherwise MediaService in this process
+    """
+    if settings.MEDIA_WORKER_URL:
+        from .worker_client import media_worker_client
+        return media_worker_client
+    # Imported on first use, so torch is only loaded once media generation is actually requested
+    from .service import media_service
+    return media_service
+
+
+async def generate_batch(pairs: List[Dict]) -> List[Dict]:
+    """Default runner: generate_batch on media_backend()."""
+    return await media_backend().generate_batch(pairs)
+
+
+class MediaJobQueue:
+    """
+    Media jobs queued in media_jobs by any process and claimed by the runners of every process
+
+    Runners claim the oldest queued job with FOR UPDATE SKIP LOCKED, so several processes
+    never claim the same one. A claim is a token plus a lease that is extended while the
+    job runs; once a lease expires (the process died or stopped) the job is claimed again.
+    """
+
+    def __init__(
+        self,
+        runner: Runner = generate_batch,
+        workers: int = settings.MEDIA_JOB_WORKERS,
+        max_pending: int = settings.MEDIA_JOB_MAX_PENDING,
+        poll_seconds: float = settings.MEDIA_JOB_POLL_SECONDS,
+        lease_seconds: float = settings.MEDIA_JOB_LEASE_SECONDS
+    ):
+        """
+        Args:
+            runner: Coroutine function executing one job's pairs
+            workers: Jobs this process runs concurrently
+            max_pending: Queued jobs allowed (across processes); submit raises QueueFull beyond that
+            poll_seconds: How often idle workers look for queued jobs (and retry after database errors)
+            lease_seconds: How long a claim lasts unless extended; extended every third of it while running
+        """
+        self.runner = runner
+        self.workers = workers
+        self.max_pending = max_pending
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self._tasks: List[asyncio.Task] = []
+        # Set by submit so this process's idle workers don't wait for the next poll
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def submit(self, pairs: List[Dict]) -> str:
+        """
+        Persist a queued job; whichever process's runner claims it first runs it
+
+        Args:
+            pairs: Dicts with host_key, background_key and optionally output_key
+
+        Returns:
+            Job id
+
+        Raises:
+            QueueFull: If max_pending jobs are already queued
+        """
+        job_id = uuid.uuid4().hex
+        if not await asyncio.to_thread(self._insert, job_id, pairs):
+            raise QueueFull(f"{self.max_pending} media jobs are already waiting")
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        """
+        A job's state
+
+        Args:
+            job_id: Id returned by submit
+
+        Returns:
+            Dict with job_id, status, timestamps and, once finished, results or error; None if unknown
+        """
+        with engine.connect() as conn:
+            row = conn.execute(
+                text(
+                    "SELECT id, status, result, error, created_at, started_at, finished_at "
+                    "FROM media_jobs WHERE id = :id"
+                ),
+                {"id": job_id}
+            ).first()
+        if row is None:
+            return None
+        job = {
+            'job_id': row.id,
+            'status': row.status,
+            'created_at': row.created_at,
+            'started_at': row.started_at,
+            'finished_at': row.finished_at,
+        }
+        if row.result is not None:
+            job['results'] = row.result
+        if row.error:
+            job['error'] = row.error
+        return job
+
+    async def start(self) -> None:
+        """Start the workers; they only touch the database from their loop, so this never fails."""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        # Jobs still running keep their claim until the lease runs out; then another runner takes them
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self._wakeup = None
+
+    async def _work(self) -> None:
+        while True:
+            claim_id = uuid.uuid4().hex
+            try:
+                job = await asyncio.to_thread(self._claim_next, claim_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # e.g. the database isn't up yet; the API keeps serving and this worker retries
+                logger.warning(f"Could not claim media jobs, retrying in {self.poll_seconds}s: {e}")
+                job = None
+            if job is None:
+                await self._idle()
+                continue
+
+            job_id, pairs = job
+            try:
+                await self._run(job_id, pairs, claim_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The result couldn't be recorded (e.g. the database is down). Keep this worker
+                # alive; the job stays running until its lease expires and it is claimed again
+                logger.error(f"Media job {job_id} could not be recorded: {e}")
+
+    async def _idle(self) -> None:
+        """Wait for the next poll, or less if this process submits a job meanwhile."""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _run(self, job_id: str, pairs: List[Dict], claim_id: str) -> None:
+        heartbeat = asyncio.get_running_loop().create_task(self._heartbeat(job_id, claim_id))
+        try:
+            results = await self.runner(pairs)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Media job {job_id} failed: {e}")
+            await self._record(job_id, claim_id, FAILED, None, str(e))
+            return
+        finally:
+            heartbeat.cancel()
+        try:
+            await self._record(job_id, claim_id, SUCCEEDED, results, None)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # e.g. results that don't serialize; record the job as failed rather than leave it running
+            logger.error(f"Media job {job_id} results could not be recorded: {e}")
+            await self._record(job_id, claim_id, FAILED, None, f"Results could not be recorded: {e}")
+
+    async def _record(self, job_id: str, claim_id: str, status: str, results: Optional[List[Dict]],
+                      error: Optional[str]) -> None:
+        if not await asyncio.to_thread(self._finish, job_id, claim_id, status, results, error):
+            logger.warning(f"Media job {job_id} was claimed by another runner; its {status} result is dropped")
+
+    async def _heartbeat(self, job_id: str, claim_id: str) -> None:
+        """Extend the claim while the job runs, so no other runner takes it over."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                if not await asyncio.to_thread(self._extend, job_id, claim_id):
+                    logger.warning(f"Lost the claim on media job {job_id}")
+                    return
+            except Exception as e:
+                logger.warning(f"Could not extend the claim on media job {job_id}: {e}")
+
+    def _insert(self, job_id: str, pairs: List[Dict]) -> bool:
+        """Insert a queued job unless max_pending jobs are already queued; False if full."""
+        with engine.begin() as conn:
+            inserted = conn.execute(
+                text(
+                    "INSERT INTO media_jobs (id, status, payload) "
+                    "SELECT :id, :queued, CAST(:payload AS json) "
+                    "WHERE (SELECT count(*) FROM media_jobs WHERE status = :queued) < :max_pending "
+                    "RETURNING id"
+                ),
+                {"id": job_id, "queued": QUEUED, "payload": json.dumps(pairs), "max_pending": self.max_pending}
+            ).first()
+        return inserted is not None
+
+    def _claim_next(self, claim_id: str) -> Optional[Tuple[str, List[Dict]]]:
+        """Claim the oldest queued job, or a running one whose lease expired; None if there is none."""
+        with engine.begin() as conn:
+            row = conn.execute(
+                text(
+                    "UPDATE media_jobs SET status = :running, started_at = now(), claim_id = :claim_id, "
+                    "claimed_until = now() + make_interval(secs => :lease) "
+                    "WHERE id = ("
+                    "  SELECT id FROM media_jobs "
+                    "  WHERE status = :queued OR (status = :running AND claimed_until < now()) "
+                    "  ORDER BY created_at LIMIT 1 FOR UPDATE SKIP LOCKED"
+                    ") RETURNING id, payload"
+                ),
+                {"running": RUNNING, "queued": QUEUED, "claim_id": claim_id, "lease": self.lease_seconds}
+            ).first()
+        return (row.id, row.payload) if row else None
+
+    def _extend(self, job_id: str, claim_id: str) -> bool:
+        """Push the lease back; False if the claim was lost."""
+        with engine.begin() as conn:
+            extended = conn.execute(
+                text(
+                    "UPDATE media_jobs SET claimed_until = now() + make_interval(secs => :lease) "
+                    "WHERE id = :id AND claim_id = :claim_id AND status = :running RETURNING id"
+                ),
+                {"id": job_id, "claim_id": claim_id, "running": RUNNING, "lease": self.lease_seconds}
+            ).first()
+        return extended is not None
+
+    def _finish(self, job_id: str, claim_id: str, status: str, results: Optional[List[Dict]],
+                error: Optional[str]) -> bool:
+        """Record the outcome if this claim still holds the job; False otherwise."""
+        with engine.begin() as conn:
+            finished = conn.execute(
+                text(
+                    "UPDATE media_jobs SET status = :status, result = :result, error = :error, "
+                    "finished_at = now(), claimed_until = NULL "
+                    "WHERE id = :id AND claim_id = :claim_id AND status = :running RETURNING id"
+                ),
+                {
+                    "id": job_id,
+                    "claim_id": claim_id,
+                    "running": RUNNING,
+                    "status": status,
+                    "result": json.dumps(results) if results is not None else None,
+                    "error": error,
+                }
+            ).first()
+        return finished is not None
+
+
+# Singleton instance
+media_job_queue = MediaJobQueue()
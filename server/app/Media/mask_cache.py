@@ -0,0 +1,130 @@
+"""Person masks cached by host image content and model version"""
+import hashlib
+import logging
+import os
+import struct
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from app.common.minio_client import MinIOClient, minio_client
+
+logger = logging.getLogger(__name__)
+
+# Stored object: big-endian width and height, then the pack_mask() bits
+HEADER = struct.Struct('>II')
+MASK_PREFIX = 'masks'
+
+Mask = Tuple[Tuple[int, int], bytes]
+
+
+def content_digest(data: bytes) -> str:
+    """SHA-256 hex digest of an encoded image."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def mask_key(digest: str, version: str) -> str:
+    """
+    Object key of a cached mask
+
+    Args:
+        digest: SHA-256 of the host image
+        version: SegmentationModel.version that produced the mask
+
+    Returns:
+        Key such as masks/mobilenet-onnx_int8@512/3a/3a7bd3e2....bin
+    """
+    return f"{MASK_PREFIX}/{version}/{digest[:2]}/{digest}.bin"
+
+
+class MaskCache:
+    """In-memory LRU of packed masks in front of their copies in MinIO."""
+
+    def __init__(self, client: MinIOClient = minio_client, max_bytes: int = int(os.getenv('MEDIA_MASK_CACHE_MB', '128')) * 1024 * 1024):
+        """
+        Args:
+            client: MinIO client holding the persistent copies
+            max_bytes: Memory budget of the LRU (packed masks are one bit per pixel)
+        """
+        self.client = client
+        self.max_bytes = max_bytes
+        self._masks: "OrderedDict[str, Mask]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: str, version: str) -> Optional[Mask]:
+        """
+        Cached mask of a host image
+
+        Args:
+            digest: SHA-256 of the host image
+            version: Model version the mask must come from
+
+        Returns:
+            ((width, height), packed bits), or None if neither memory nor MinIO has it
+        """
+        key = mask_key(digest, version)
+        with self._lock:
+            mask = self._masks.get(key)
+            if mask is not None:
+                self._masks.move_to_end(key)
+                self.hits += 1
+                return mask
+
+        try:
+            data = self.client.client.get_object(Bucket=self.client.bucket, Key=key)['Body'].read()
+        except Exception as e:
+            # Missing, or MinIO unreachable: either way the caller segments the image itself
+            if not (isinstance(e, ClientError) and e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey')):
+                logger.warning(f"Could not read cached mask {key}: {e}")
+            with self._lock:
+                self.misses += 1
+            return None
+        width, height = HEADER.unpack_from(data)
+        mask = ((width, height), data[HEADER.size:])
+        with self._lock:
+            self.hits += 1
+        self._remember(key, mask)
+        return mask
+
+    def put(self, digest: str, version: str, size: Tuple[int, int], packed: bytes) -> None:
+        """
+        Cache a mask in memory and MinIO
+
+        Args:
+            digest: SHA-256 of the host image
+            version: Model version that produced the mask
+            size: (width, height) of the mask
+            packed: pack_mask() bits
+        """
+        key = mask_key(digest, version)
+        self._remember(key, (tuple(size), packed))
+        try:
+            self.client.upload_file(HEADER.pack(*size) + packed, key, 'application/octet-stream')
+        except Exception as e:
+            # Still cached in memory; only other processes miss out
+            logger.warning(f"Could not store mask {key}: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._masks.clear()
+            self._bytes = 0
+
+    def _remember(self, key: str, mask: Mask) -> None:
+        with self._lock:
+            previous = self._masks.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[1])
+            self._masks[key] = mask
+            self._bytes += len(mask[1])
+            while self._bytes > self.max_bytes and len(self._masks) > 1:
+                _, (_, evicted) = self._masks.popitem(last=False)
+                self._bytes -= len(evicted)
+
+
+# Singleton instance
+mask_cache = MaskCache()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, JSON
+from sqlalchemy import Column, Integer, String, Text, JSON, BigInteger, DateTime, ForeignKey, func
 from sqlalchemy.orm import relationship
 from config.db import Base, engine
 
@@ -11,4 +11,31 @@ class Media(Base):
     meta = Column(JSON)
     
     # Relationships
-    posts = relationship("Post", back_populates="media")
\ No newline at end of file
+    posts = relationship("Post", back_populates="media")
+
+
+class MediaHash(Base):
+    """Content hash -> media row, so identical uploads reuse the stored object"""
+    __tablename__ = 'media_hashes'
+
+    sha256 = Column(String(64), primary_key=True)
+    media_id = Column(Integer, ForeignKey('media.id', ondelete='CASCADE'), nullable=False, index=True)
+    size = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+
+class MediaJob(Base):
+    """Queued media generation request and, once run, its results"""
+    __tablename__ = 'media_jobs'
+
+    id = Column(String(32), primary_key=True)
+    status = Column(String(16), nullable=False, index=True)
+    payload = Column(JSON, nullable=False)
+    result = Column(JSON)
+    error = Column(Text)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    # Runner holding the job while running, and until when (extended as it runs)
+    claim_id = Column(String(32))
+    claimed_until = Column(DateTime)
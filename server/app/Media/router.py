@@ -1,14 +1,107 @@
-from fastapi import APIRouter, Body
-from .service import MediaService
+import asyncio
+import logging
+from typing import List, Optional
+
+from fastapi import APIRouter, Body, File, HTTPException, UploadFile
+from pydantic import BaseModel
+from config.config import settings
+from .ingestion import media_ingestion_service
+from .jobs import QueueFull, media_backend, media_job_queue
+from .worker_client import DEMO_MEDIA_PATHS, MediaWorkerError, MediaWorkerUnavailable
+
+logger = logging.getLogger(__name__)
 
 media_router = APIRouter(prefix="/media", tags=["media"])
 
+class GeneratePair(BaseModel):
+  host_key: str
+  background_key: str
+  output_key: Optional[str] = None  # Defaults to generated/<uuid>.jpg
+
+class GenerateBatchRequest(BaseModel):
+  pairs: List[GeneratePair]
+
+def _check_batch_size(request: GenerateBatchRequest) -> None:
+  if len(request.pairs) > settings.MEDIA_BATCH_MAX_PAIRS:
+    raise HTTPException(status_code=413, detail=f"Batch is limited to {settings.MEDIA_BATCH_MAX_PAIRS} pairs")
+
+@media_router.on_event("startup")
+async def start_media_jobs():
+  await media_job_queue.start()
+  if settings.MEDIA_MODEL_WARMUP:
+    # In the background: importing torch and loading the model takes seconds
+    asyncio.get_running_loop().create_task(_warm_up_model())
+
+async def _warm_up_model():
+  try:
+    # In-process this imports torch and loads the model; with a media worker it checks the worker is up
+    await (await asyncio.to_thread(media_backend)).warm_up()
+  except Exception as e:
+    logger.warning(f"Media generation warm-up failed, media jobs will fail until it is available: {e}")
+
+@media_router.on_event("shutdown")
+async def stop_media_jobs():
+  await media_job_queue.stop()
+  if settings.MEDIA_WORKER_URL:
+    await media_backend().close()
+
 @media_router.post("/generate")
 async def generateMedia():
-  media_service = MediaService()  # Create an instance of ChatBotService
-  
-  media_service.generateMedia('abhi.jpg', 'frankie.jpg', 'output.jpg')
+  try:
+    await media_backend().generate_media(*DEMO_MEDIA_PATHS)
+  except MediaWorkerUnavailable as e:
+    raise HTTPException(status_code=503, detail=str(e))
+  except MediaWorkerError as e:
+    raise HTTPException(status_code=502, detail=str(e))
   
   return {"response": {}}
 
+@media_router.post("/generate/batch")
+async def generate_media_batch(request: GenerateBatchRequest):
+  """
+  Composite many host/background pairs stored in MinIO; results are written back to MinIO.
+
+  Returns one entry per pair, in request order, with its url or an error.
+  """
+  _check_batch_size(request)
+  try:
+    results = await media_backend().generate_batch([pair.model_dump() for pair in request.pairs])
+  except MediaWorkerUnavailable as e:
+    raise HTTPException(status_code=503, detail=str(e))
+  except MediaWorkerError as e:
+    raise HTTPException(status_code=502, detail=str(e))
+  return {"results": results}
+
+@media_router.post("/jobs", status_code=202)
+async def submit_media_job(request: GenerateBatchRequest):
+  """
+  Queue pairs for generation in the background; poll GET /media/jobs/{job_id} for the results.
+
+  Responds 503 with Retry-After when MEDIA_JOB_MAX_PENDING jobs are already waiting.
+  """
+  _check_batch_size(request)
+  try:
+    job_id = await media_job_queue.submit([pair.model_dump() for pair in request.pairs])
+  except QueueFull as e:
+    raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(settings.MEDIA_JOB_RETRY_AFTER_SECONDS)})
+  return {"job_id": job_id, "status": "queued", "status_url": f"/media/jobs/{job_id}"}
+
+@media_router.get("/jobs/{job_id}")
+async def get_media_job(job_id: str):
+  """Job status; finished jobs include results (one entry per pair, as /generate/batch returns) or error."""
+  job = await asyncio.to_thread(media_job_queue.status, job_id)
+  if job is None:
+    raise HTTPException(status_code=404, detail=f"Media job {job_id} not found")
+  return job
+
+@media_router.post("/upload")
+async def upload_media(file: UploadFile = File(...)):
+  """Store an upload once per unique content; identical uploads return the existing media row."""
+  media, created = await asyncio.to_thread(
+    media_ingestion_service.ingest,
+    file.file,
+    file.content_type or 'application/octet-stream',
+  )
+  return {"media": media, "created": created}
+
 __all__ = ["media_router"]
@@ -1,40 +1,321 @@
+import asyncio
+import io
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
 import torch
 from torchvision import models, transforms
 from PIL import Image
 
-class MediaService:
-  def __init__(self):
-    # Load a pre-trained DeepLabV3 model specifically tuned for segmentation
-    self.model = models.segmentation.deeplabv3_resnet101(pretrained=True) #try diff models
-    self.model.eval()
-    # Check if a GPU is available and move the model to GPU
-    if torch.cuda.is_available():
-      self.model = self.model.cuda()
+from app.common.async_minio_client import AsyncMinIOClient, async_minio_client
+from config.config import settings
+from .compositing import composite_onto, encode, open_background, open_image, output_format, pack_mask, unpack_mask
+from .mask_cache import Mask, MaskCache, content_digest, mask_cache
 
-  def generateMedia(self, host_image_path, background_image_path, output_image_path):
-    # Load and preprocess the host image
-    input_image = Image.open(host_image_path).convert("RGB")
-    preprocess = transforms.Compose([
-      transforms.ToTensor(),
-      transforms.Normalize(mean=[0.5, 0.5, 0.5], std=[0.229, 0.224, 0.225]),
-    ])
-    input_tensor = preprocess(input_image)
-    input_batch = input_tensor.unsqueeze(0)
-
-    # Use GPU if available for processing
+logger = logging.getLogger(__name__)
+
+# DeepLabV3 (Pascal VOC labels) uses class 15 for person
+PERSON_CLASS = 15
+
+preprocess = transforms.Compose([
+  transforms.ToTensor(),
+  transforms.Normalize(mean=[0.5, 0.5, 0.5], std=[0.229, 0.224, 0.225]),
+])
+
+# Segmentation backends (MEDIA_SEGMENTATION_BACKEND); all predict the Pascal VOC labels
+BACKENDS = {
+  "resnet101": models.segmentation.deeplabv3_resnet101,
+  "mobilenet": models.segmentation.deeplabv3_mobilenet_v3_large,
+  "lraspp": models.segmentation.lraspp_mobilenet_v3_large,
+}
+# How the backend runs (MEDIA_SEGMENTATION_RUNTIME): eager torch, the exported ONNX graph on
+# onnxruntime, or that graph with int8 dynamically quantized weights
+RUNTIMES = ("torch", "onnx", "onnx_int8")
+# Working images whose sizes round up to the same multiple of this share a padded batch
+SIZE_BUCKET = 64
+
+
+class _OutputOnly(torch.nn.Module):
+  """Segmentation model returning just the 'out' logits, so the ONNX graph has a single output."""
+
+  def __init__(self, model):
+    super().__init__()
+    self.model = model
+
+  def forward(self, x):
+    return self.model(x)['out']
+
+
+def forward_groups(sizes: List[tuple], batch_size: int, max_pixels: int) -> List[List[int]]:
+  """
+  Split images into forward passes of at most batch_size images and max_pixels padded pixels
+
+  Args:
+    sizes: (width, height) of each image, in order
+    batch_size: Max images per pass
+    max_pixels: Max of images x padded height x padded width per pass (an oversized image gets a pass of its own)
+
+  Returns:
+    Positions in sizes, one list per pass, in order
+  """
+  groups: List[List[int]] = []
+  group: List[int] = []
+  width = height = 0
+  for position, (image_width, image_height) in enumerate(sizes):
+    padded_width, padded_height = max(width, image_width), max(height, image_height)
+    if group and (len(group) >= batch_size or (len(group) + 1) * padded_width * padded_height > max_pixels):
+      groups.append(group)
+      group, padded_width, padded_height = [], image_width, image_height
+    group.append(position)
+    width, height = padded_width, padded_height
+  if group:
+    groups.append(group)
+  return groups
+
+
+class SegmentationModel:
+  """Process-wide segmentation model, loaded on first use (or by warm_up) and shared by all requests."""
+
+  def __init__(
+    self,
+    torch_threads: int = settings.MEDIA_TORCH_THREADS,
+    backend: str = settings.MEDIA_SEGMENTATION_BACKEND,
+    runtime: str = settings.MEDIA_SEGMENTATION_RUNTIME,
+    working_size: int = settings.MEDIA_SEGMENTATION_SIZE,
+    onnx_dir: str = settings.MEDIA_ONNX_DIR,
+  ):
+    """
+    Args:
+      torch_threads: Intra-op threads per inference (0 = library default)
+      backend: Key of BACKENDS
+      runtime: One of RUNTIMES
+      working_size: Longest edge images are downscaled to before inference (0 = original size)
+      onnx_dir: Where exported (and quantized) ONNX graphs are kept between runs
+    """
+    if backend not in BACKENDS:
+      raise ValueError(f"Unknown segmentation backend {backend!r}, expected one of {sorted(BACKENDS)}")
+    if runtime not in RUNTIMES:
+      raise ValueError(f"Unknown segmentation runtime {runtime!r}, expected one of {list(RUNTIMES)}")
+    self.torch_threads = torch_threads
+    self.backend = backend
+    self.runtime = runtime
+    self.working_size = working_size
+    self.onnx_dir = onnx_dir
+    self._model = None
+    self._lock = threading.Lock()
+
+  @property
+  def loaded(self) -> bool:
+    return self._model is not None
+
+  @property
+  def version(self) -> str:
+    """Identifies everything that changes the predicted masks, e.g. mobilenet-onnx_int8@512."""
+    return f"{self.backend}-{self.runtime}@{self.working_size or 'full'}"
+
+  def get(self):
+    """The loaded model; the first caller loads it, concurrent callers wait for that load."""
+    if self._model is None:
+      with self._lock:
+        if self._model is None:
+          self._model = self._load()
+    return self._model
+
+  def warm_up(self) -> None:
+    """Load the model and run one small inference so the first request doesn't pay for either."""
+    start = time.perf_counter()
+    self.predict(Image.new("RGB", (64, 64)))
+    logger.info(f"Segmentation model {self.version} warm in {time.perf_counter() - start:.1f}s")
+
+  def predict(self, image: Image.Image) -> np.ndarray:
+    """
+    Per-pixel class predictions for an RGB image.
+
+    Args:
+      image: RGB image
+
+    Returns:
+      (height, width) uint8 array of class ids, at the image's own resolution
+    """
+    classes = Image.fromarray(self._logits(self._working_image(image)).argmax(0).byte().cpu().numpy(), mode='L')
+    if classes.size != image.size:
+      classes = classes.resize(image.size, Image.NEAREST)
+    return np.asarray(classes)
+
+  def person_mask(self, image: Image.Image) -> Image.Image:
+    """
+    Mask of the people in an RGB image.
+
+    Args:
+      image: RGB image
+
+    Returns:
+      'L' image of the image's size, 255 where a person is
+    """
+    return self._mask_image(self._logits(self._working_image(image)).argmax(0), image.size)
+
+  def person_masks(
+    self,
+    images: List[Image.Image],
+    batch_size: int = settings.MEDIA_BATCH_SIZE,
+    max_pixels: int = settings.MEDIA_BATCH_MAX_PIXELS
+  ) -> List[Image.Image]:
+    """
+    Masks of the people in many RGB images, with similar-sized images sharing one forward pass.
+
+    Args:
+      images: RGB images
+      batch_size: Max images per forward pass
+      max_pixels: Max padded pixels per forward pass (images x height x width), which bounds its
+        memory; an image larger than this still runs, on its own
+
+    Returns:
+      One mask per image, as person_mask returns it
+    """
+    working = [self._working_image(image) for image in images]
+    buckets: Dict[tuple, List[int]] = {}
+    for index, image in enumerate(working):
+      key = (-(-image.width // SIZE_BUCKET), -(-image.height // SIZE_BUCKET))
+      buckets.setdefault(key, []).append(index)
+
+    masks: List[Optional[Image.Image]] = [None] * len(images)
+    for indices in buckets.values():
+      for group in forward_groups([working[index].size for index in indices], batch_size, max_pixels):
+        group = [indices[position] for position in group]
+        width = max(working[index].width for index in group)
+        height = max(working[index].height for index in group)
+        # Pad to the largest image of the group; each image's scores are cropped back out below
+        input_batch = torch.zeros(len(group), 3, height, width)
+        for row, index in enumerate(group):
+          tensor = preprocess(working[index])
+          input_batch[row, :, :tensor.shape[1], :tensor.shape[2]] = tensor
+        scores = self._forward(input_batch)
+        for row, index in enumerate(group):
+          classes = scores[row, :, :working[index].height, :working[index].width].argmax(0)
+          masks[index] = self._mask_image(classes, images[index].size)
+    return masks
+
+  def _mask_image(self, classes: torch.Tensor, size) -> Image.Image:
+    """Person mask from (height, width) class ids, upscaled to size."""
+    mask = Image.fromarray(((classes == PERSON_CLASS).byte() * 255).cpu().numpy(), mode='L')
+    if mask.size != size:
+      # Bilinear upscaling then thresholding gives smooth edges instead of nearest-neighbour blocks
+      mask = mask.resize(size, Image.BILINEAR).point(lambda value: 255 if value >= 128 else 0)
+    return mask
+
+  def _working_image(self, image: Image.Image) -> Image.Image:
+    """The image downscaled so its longest edge is working_size (never upscaled)."""
+    longest = max(image.size)
+    if not self.working_size or longest <= self.working_size:
+      return image
+    scale = self.working_size / longest
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(size, Image.BILINEAR)
+
+  def _logits(self, image: Image.Image) -> torch.Tensor:
+    """(classes, height, width) scores for an RGB image."""
+    return self._forward(preprocess(image).unsqueeze(0))[0]
+
+  def _forward(self, input_batch: torch.Tensor) -> torch.Tensor:
+    """(batch, classes, height, width) scores for a preprocessed batch."""
+    model = self.get()
+    if self.runtime != "torch":
+      return torch.from_numpy(model.run(None, {"input": input_batch.numpy()})[0])
     if torch.cuda.is_available():
       input_batch = input_batch.cuda()
+    with torch.inference_mode():
+      return model(input_batch)['out']
+
+  def _load(self):
+    start = time.perf_counter()
+    if self.torch_threads:
+      # Intra-op threads per inference; the executor bounds how many inferences run at once
+      torch.set_num_threads(self.torch_threads)
+    # Load a pre-trained model specifically tuned for segmentation
+    model = BACKENDS[self.backend](pretrained=True)
+    model.eval()
+    if self.runtime == "torch":
+      # Check if a GPU is available and move the model to GPU
+      if torch.cuda.is_available():
+        model = model.cuda()
+    else:
+      model = self._onnx_session(model)
+    logger.info(f"Loaded segmentation model {self.version} in {time.perf_counter() - start:.1f}s")
+    return model
 
-    # Predict the segmentation mask
-    with torch.no_grad():
-      output = self.model(input_batch)['out'][0]
-    output_predictions = output.argmax(0).byte().cpu().numpy()
+  def _onnx_session(self, model):
+    """onnxruntime session for the model, exporting (and quantizing) the graph on first use."""
+    try:
+      import onnxruntime
+      from onnxruntime.quantization import QuantType, quantize_dynamic
+    except ImportError as e:
+      raise RuntimeError(f"MEDIA_SEGMENTATION_RUNTIME={self.runtime} needs the onnxruntime package") from e
 
-    # Create a mask for the human class (DeepLabV3 uses class 15 for person)
-    human_mask = (output_predictions == 15)
+    os.makedirs(self.onnx_dir, exist_ok=True)
+    path = os.path.join(self.onnx_dir, f"{self.backend}.onnx")
+    if not os.path.exists(path):
+      exporting = f"{path}.{os.getpid()}.tmp"
+      torch.onnx.export(
+        _OutputOnly(model),
+        torch.zeros(1, 3, 520, 520),
+        exporting,
+        input_names=["input"],
+        output_names=["out"],
+        dynamic_axes={"input": {0: "batch", 2: "height", 3: "width"}, "out": {0: "batch", 2: "height", 3: "width"}},
+        opset_version=17,
+      )
+      # Another worker may be exporting too; whichever finishes last replaces an identical file
+      os.replace(exporting, path)
+      logger.info(f"Exported {self.backend} to {path}")
+    if self.runtime == "onnx_int8":
+      quantized = os.path.join(self.onnx_dir, f"{self.backend}.int8.onnx")
+      if not os.path.exists(quantized):
+        quantizing = f"{quantized}.{os.getpid()}.tmp"
+        quantize_dynamic(path, quantizing, weight_type=QuantType.QUInt8)
+        os.replace(quantizing, quantized)
+        logger.info(f"Quantized {self.backend} to {quantized}")
+      path = quantized
 
-    # Convert the binary mask to an image format
-    mask_image = Image.fromarray((human_mask * 255).astype('uint8'), mode='L')
+    options = onnxruntime.SessionOptions()
+    if self.torch_threads:
+      options.intra_op_num_threads = self.torch_threads
+    return onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+
+class MediaService:
+  def __init__(
+    self,
+    model: Optional[SegmentationModel] = None,
+    executor: Optional[ThreadPoolExecutor] = None,
+    compositor: Optional[ThreadPoolExecutor] = None,
+    storage: Optional[AsyncMinIOClient] = None,
+    masks: Optional[MaskCache] = None,
+  ):
+    self.model = model or segmentation_model
+    self.executor = executor or inference_executor
+    self.compositor = compositor or compositing_executor
+    self.storage = storage or async_minio_client
+    self.masks = masks or mask_cache
+
+  def generateMedia(self, host_image_path, background_image_path, output_image_path):
+    # Load the host image
+    with open(host_image_path, 'rb') as f:
+      host_data = f.read()
+    input_image = Image.open(io.BytesIO(host_data)).convert("RGB")
+
+    # Mask of the human class, predicted only if this image wasn't segmented before
+    digest, cached = self._lookup_mask(host_data)
+    if cached is not None:
+      mask_image = unpack_mask(cached[1], cached[0])
+    else:
+      mask_image = self.model.person_mask(input_image)
+      self.masks.put(digest, self.model.version, mask_image.size, pack_mask(mask_image))
 
     # Open and resize the background image to match the host image
     background_image = Image.open(background_image_path)
@@ -45,5 +326,111 @@ class MediaService:
 
     # Save the output image
     composite_image.save(output_image_path)
-    print(f"Generated media saved to {output_image_path}")
+    logger.info(f"Generated media saved to {output_image_path}")
+
+  async def generate_media(self, host_image_path, background_image_path, output_image_path):
+    """generateMedia on the inference executor, so the event loop keeps serving other requests."""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(
+      self.executor, self.generateMedia, host_image_path, background_image_path, output_image_path
+    )
+
+  async def generate_batch(self, pairs: List[Dict[str, Optional[str]]]) -> List[Dict]:
+    """
+    Composite many host/background pairs stored in MinIO, writing the results back to MinIO.
+
+    Everything stays in memory: objects are read into buffers, each host is decoded once for
+    the model and all its composites, hosts are segmented together (similar sizes share a
+    forward pass) and each composite is encoded into the buffer that gets uploaded.
+
+    Args:
+      pairs: Dicts with host_key, background_key and optionally output_key
+        (default generated/<uuid>.jpg; .png/.webp keys are encoded accordingly)
+
+    Returns:
+      One dict per pair, in order: the keys plus url, or error if that pair failed
+    """
+    loop = asyncio.get_running_loop()
+    results = [
+      {
+        "host_key": pair["host_key"],
+        "background_key": pair["background_key"],
+        "output_key": pair.get("output_key") or f"generated/{uuid.uuid4().hex}.jpg",
+      }
+      for pair in pairs
+    ]
+
+    # Each distinct object is downloaded once, however many pairs use it
+    keys = list({key for result in results for key in (result["host_key"], result["background_key"])})
+    downloads = await asyncio.gather(*(self.storage.download_buffer(key) for key in keys), return_exceptions=True)
+    objects = dict(zip(keys, downloads))
+    errors = {key: f"Could not read {key}: {data}" for key, data in objects.items() if isinstance(data, Exception)}
+
+    hosts = list(dict.fromkeys(result["host_key"] for result in results if result["host_key"] not in errors))
+    decoded = await asyncio.gather(
+      *(loop.run_in_executor(self.compositor, open_image, objects[key]) for key in hosts), return_exceptions=True
+    )
+    images = {}
+    for key, image in zip(hosts, decoded):
+      if isinstance(image, Exception):
+        errors[key] = f"Could not decode {key}: {image}"
+      else:
+        images[key] = image
+
+    lookups = await asyncio.gather(*(asyncio.to_thread(self._lookup_mask, objects[key]) for key in images))
+    digests = {key: digest for key, (digest, _) in zip(images, lookups)}
+    masks = {key: unpack_mask(cached[1], cached[0]) for key, (_, cached) in zip(images, lookups) if cached is not None}
+
+    # Only hosts not segmented before go through the model
+    missing = [key for key in images if key not in masks]
+    if missing:
+      segmented = await loop.run_in_executor(self.executor, self.model.person_masks, [images[key] for key in missing])
+      masks.update(zip(missing, segmented))
+      await asyncio.gather(*(
+        asyncio.to_thread(self.masks.put, digests[key], self.model.version, masks[key].size, pack_mask(masks[key]))
+        for key in missing
+      ))
+
+    async def finish(result: Dict) -> None:
+      for key in (result["host_key"], result["background_key"]):
+        if key in errors:
+          result["error"] = errors[key]
+          return
+      try:
+        output = await loop.run_in_executor(
+          self.compositor, self._render,
+          images[result["host_key"]], objects[result["background_key"]], masks[result["host_key"]], result["output_key"],
+        )
+        # Uploaded from the encoder's own buffer, not a copy of it
+        result["url"] = await self.storage.upload(
+          result["output_key"], output.getbuffer(), output_format(result["output_key"])[1]
+        )
+      except Exception as e:
+        logger.warning(f"Batch composite of {result['host_key']} failed: {e}")
+        result["error"] = str(e)
+
+    await asyncio.gather(*(finish(result) for result in results))
+    return results
+
+  def _render(self, host: Image.Image, background: bytearray, mask: Image.Image, output_key: str) -> io.BytesIO:
+    """Decode the background at (about) the host's size, paste the person onto it and encode."""
+    return encode(composite_onto(host, open_background(background, host.size), mask), output_key)
+
+  def _lookup_mask(self, host: bytes) -> Tuple[str, Optional[Mask]]:
+    """(content digest, cached mask or None) of an encoded host image."""
+    digest = content_digest(host)
+    return digest, self.masks.get(digest, self.model.version)
+
+  async def warm_up(self) -> None:
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(self.executor, self.model.warm_up)
+
 
+# Process-wide model and a small pool for inference (each inference already uses MEDIA_TORCH_THREADS cores)
+segmentation_model = SegmentationModel()
+inference_executor = ThreadPoolExecutor(max_workers=settings.MEDIA_INFERENCE_WORKERS, thread_name_prefix="inference")
+# Decoding, compositing and encoding of batch results; Pillow releases the GIL for all of them,
+# so threads run in parallel and share the decoded images and masks without copying them
+compositing_executor = ThreadPoolExecutor(max_workers=settings.MEDIA_COMPOSITE_WORKERS, thread_name_prefix="composite")
+# One service (and one loaded model) for all requests and jobs
+media_service = MediaService()
@@ -0,0 +1,59 @@
+"""
+Media worker: the one process that imports torch and holds the segmentation model
+
+The API forwards media generation here (MEDIA_WORKER_URL) and so starts, and
+stays, without torch. Needs requirements-media.txt on top of requirements.txt.
+
+  python -m app.Media.worker --socket /tmp/media-worker.sock   # MEDIA_WORKER_URL=unix:///tmp/media-worker.sock
+  python -m app.Media.worker --host 0.0.0.0 --port 8200        # MEDIA_WORKER_URL=http://media-worker:8200
+"""
+import argparse
+import logging
+from typing import Dict, List
+
+import uvicorn
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+from config.config import settings
+from .service import media_service
+from .worker_client import DEMO_MEDIA_PATHS
+
+logger = logging.getLogger(__name__)
+
+worker_app = FastAPI(title="media-worker")
+
+class BatchRequest(BaseModel):
+  pairs: List[Dict]
+
+@worker_app.on_event("startup")
+async def warm_up_model():
+  if settings.MEDIA_MODEL_WARMUP:
+    await media_service.warm_up()
+
+@worker_app.get("/health")
+async def health():
+  return {"status": "healthy", "model": media_service.model.version, "loaded": media_service.model.loaded}
+
+@worker_app.post("/generate/batch")
+async def generate_batch(request: BatchRequest):
+  return {"results": await media_service.generate_batch(request.pairs)}
+
+@worker_app.post("/generate")
+async def generate():
+  # Fixed demo files: the worker listens on the network and must not read or write paths it is sent
+  await media_service.generate_media(*DEMO_MEDIA_PATHS)
+  return {"response": {}}
+
+
+if __name__ == "__main__":
+  logging.basicConfig(level=logging.INFO)
+  parser = argparse.ArgumentParser(description="Serve media generation (torch) to the API")
+  parser.add_argument("--socket", default=None, help="unix socket path (instead of host/port)")
+  parser.add_argument("--host", default="127.0.0.1")
+  parser.add_argument("--port", type=int, default=8200)
+  args = parser.parse_args()
+  if args.socket:
+    uvicorn.run(worker_app, uds=args.socket)
+  else:
+    uvicorn.run(worker_app, host=args.host, port=args.port)
@@ -0,0 +1,96 @@
+"""Client of the media worker process (app/Media/worker.py), which owns torch and the model"""
+import logging
+from typing import Dict, List, Optional
+
+import httpx
+
+from config.config import settings
+
+logger = logging.getLogger(__name__)
+
+UNIX_SCHEME = 'unix://'
+
+# The only files POST /generate composites on the worker; it never takes paths from the network
+DEMO_MEDIA_PATHS = ('abhi.jpg', 'frankie.jpg', 'output.jpg')
+
+
+class MediaWorkerUnavailable(Exception):
+    """The media worker could not be reached."""
+
+
+class MediaWorkerError(Exception):
+    """The media worker answered with an error status."""
+
+
+class MediaWorkerClient:
+    """Same generate/warm-up interface as MediaService, served by the media worker over a socket."""
+
+    def __init__(self, url: str = settings.MEDIA_WORKER_URL, timeout: float = settings.MEDIA_WORKER_TIMEOUT_SECONDS):
+        """
+        Args:
+            url: http://host:port, or unix:///path/to/socket for a worker on the same host
+            timeout: Seconds to wait for one request (a batch includes its inference)
+        """
+        self.url = url
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            if self.url.startswith(UNIX_SCHEME):
+                transport = httpx.AsyncHTTPTransport(uds=self.url[len(UNIX_SCHEME):])
+                self._client = httpx.AsyncClient(transport=transport, base_url='http://media-worker', timeout=self.timeout)
+            else:
+                self._client = httpx.AsyncClient(base_url=self.url, timeout=self.timeout)
+        return self._client
+
+    async def generate_batch(self, pairs: List[Dict]) -> List[Dict]:
+        """
+        MediaService.generate_batch in the worker
+
+        Args:
+            pairs: Dicts with host_key, background_key and optionally output_key
+
+        Returns:
+            One dict per pair, in order: the keys plus url, or error if that pair failed
+        """
+        response = await self._post('/generate/batch', {'pairs': pairs})
+        return response['results']
+
+    async def generate_media(self, host_image_path, background_image_path, output_image_path) -> None:
+        """
+        MediaService.generate_media in the worker, for the legacy demo files only
+
+        Raises:
+            ValueError: If the paths aren't DEMO_MEDIA_PATHS (the worker reads no other local files)
+        """
+        if (host_image_path, background_image_path, output_image_path) != DEMO_MEDIA_PATHS:
+            raise ValueError(f"The media worker only generates the demo media {DEMO_MEDIA_PATHS}")
+        await self._request('POST', '/generate')
+
+    async def warm_up(self) -> None:
+        """The worker warms its own model at startup; this only checks it is reachable."""
+        response = await self._request('GET', '/health')
+        logger.info(f"Media worker at {self.url}: {response}")
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _post(self, path: str, body: Dict) -> Dict:
+        return await self._request('POST', path, json=body)
+
+    async def _request(self, method: str, path: str, **kwargs) -> Dict:
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.TransportError as e:
+            raise MediaWorkerUnavailable(f"Media worker at {self.url} is unavailable: {e}") from e
+        if response.is_error:
+            raise MediaWorkerError(f"Media worker at {self.url} failed {method} {path}: {response.status_code} {response.text}")
+        return response.json()
+
+
+# Singleton instance
+media_worker_client = MediaWorkerClient()
@@ -0,0 +1,84 @@
+"""Scheduled refresh of the post_feed materialized view"""
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from sqlalchemy import text
+
+from config.config import settings
+from config.db import engine
+from app.common.commit_hooks import on_commit
+from app.User.model import User
+from app.Media.model import Media
+from .model import Post
+
+logger = logging.getLogger(__name__)
+
+
+class PostFeedRefresher:
+    """Refreshes post_feed_mv when posts/media/users change, and at least every max_staleness seconds."""
+
+    def __init__(self, interval_seconds: int, max_staleness_seconds: int):
+        self.interval_seconds = interval_seconds
+        self.max_staleness_seconds = max_staleness_seconds
+        self._dirty = False
+        self._last_refresh = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+
+    def mark_dirty(self) -> None:
+        """Flag the view as stale; picked up on the next tick."""
+        self._dirty = True
+
+    def refresh(self) -> None:
+        """Refresh the view without blocking readers."""
+        start = time.monotonic()
+        self._dirty = False
+        with engine.begin() as conn:
+            conn.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY post_feed_mv"))
+        self._last_refresh = time.monotonic()
+        logger.info(f"Refreshed post_feed in {(self._last_refresh - start) * 1000:.0f}ms")
+
+    def _is_due(self) -> bool:
+        # Raw SQL writes bypass the ORM events, so also refresh on age
+        return self._dirty or time.monotonic() - self._last_refresh >= self.max_staleness_seconds
+
+    async def run(self) -> None:
+        """Background loop; refresh runs in a thread so the event loop stays free."""
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            if not self._is_due():
+                continue
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                self._dirty = True
+                logger.error(f"post_feed refresh failed: {str(e)}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def register_refresh_listeners(refresher: PostFeedRefresher) -> None:
+    """Mark the feed dirty once the ORM commits writes to the tables it is built from."""
+    # At flush the rows aren't visible to the refresh yet, which would then clear the flag without them
+    on_commit({model: lambda target: [True] for model in (Post, Media, User)},
+              lambda keys: refresher.mark_dirty())
+
+
+# Singleton instance
+post_feed_refresher = PostFeedRefresher(
+    interval_seconds=settings.POST_FEED_REFRESH_SECONDS,
+    max_staleness_seconds=settings.POST_FEED_MAX_STALENESS_SECONDS,
+)
+register_refresh_listeners(post_feed_refresher)
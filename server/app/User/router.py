@@ -1,18 +1,27 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from sqlalchemy.orm import Session
-from typing import List, Dict
+from typing import Dict, Optional
 
 from .service import UserService
+from config.config import settings
 from config.db import get_db
 
 user_router = APIRouter(prefix="/users", tags=["users"])
-user_service = UserService()
+user_service = UserService(count_cache_seconds=settings.USERS_COUNT_CACHE_SECONDS)
 
-@user_router.get("/", response_model=List[Dict])
-def get_all_users(db: Session = Depends(get_db)):
-    """Get all users from the database."""
-    users = user_service.get_all_users(db)
-    return users
+@user_router.get("/", response_model=Dict)
+def get_users(
+    after_id: Optional[int] = Query(None, description="next_after_id of the previous page"),
+    limit: int = Query(settings.USERS_PAGE_DEFAULT_LIMIT, ge=1, le=settings.USERS_PAGE_MAX_LIMIT),
+    fields: Optional[str] = Query(None, description="Comma-separated columns, e.g. id,name (id is always included)"),
+    db: Session = Depends(get_db),
+):
+    """Get one page of users, ordered by id, with an estimated total."""
+    selected = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    try:
+        return user_service.list_users(db, after_id=after_id, limit=limit, fields=selected)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @user_router.get("/{user_id}", response_model=Dict)
 def get_user(user_id: int, db: Session = Depends(get_db)):
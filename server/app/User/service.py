@@ -1,24 +1,68 @@
+import time
+from sqlalchemy import func, select, text
 from sqlalchemy.orm import Session
 from .model import User
-from typing import List, Dict
+from typing import Dict, List, Optional, Sequence
+
+# Columns /users/ can return; id is always included (it is the page cursor)
+USER_FIELDS = ("id", "name", "email", "phone", "longitude", "latitude")
 
 class UserService:
     """Service class for handling user operations."""
 
-    def get_all_users(self, db: Session) -> List[Dict]:
-        """Retrieve all users from the database."""
-        users = db.query(User).all()
-        return [
-            {
-                "id": user.id,
-                "name": user.name,
-                "email": user.email,
-                "phone": user.phone,
-                "longitude": user.longitude,
-                "latitude": user.latitude,
-            }
-            for user in users
-        ]
+    def __init__(self, count_cache_seconds: float = 300):
+        self.count_cache_seconds = count_cache_seconds
+        self._total_estimate: Optional[int] = None
+        self._total_estimated_at = 0.0
+
+    def list_users(self, db: Session, after_id: Optional[int] = None, limit: int = 100,
+                   fields: Optional[Sequence[str]] = None) -> Dict:
+        """
+        One keyset page of users, ordered by id, selecting only the requested columns
+
+        Args:
+            db: Database session
+            after_id: Return users with an id above this one (the previous page's next_after_id)
+            limit: Page size
+            fields: Columns to return (from USER_FIELDS); all of them when None
+
+        Returns:
+            {"items": [...], "next_after_id": id to pass for the next page or None on the last page,
+             "total_estimate": approximate number of users}
+
+        Raises:
+            ValueError: If fields names an unknown column
+        """
+        fields = self._columns(fields)
+        # Plain column rows (no ORM objects); one extra row tells whether another page follows
+        query = select(*(getattr(User, field) for field in fields)).order_by(User.id).limit(limit + 1)
+        if after_id is not None:
+            query = query.where(User.id > after_id)
+        rows = db.execute(query).all()
+
+        items = [dict(zip(fields, row)) for row in rows[:limit]]
+        return {
+            "items": items,
+            "next_after_id": items[-1]["id"] if len(rows) > limit else None,
+            "total_estimate": self.estimated_total(db),
+        }
+
+    def estimated_total(self, db: Session) -> int:
+        """
+        Approximate user count from the planner statistics, cached for count_cache_seconds
+
+        Falls back to COUNT(*) while the table has never been analyzed.
+        """
+        now = time.monotonic()
+        if self._total_estimate is None or now - self._total_estimated_at >= self.count_cache_seconds:
+            estimate = db.execute(
+                text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'users'::regclass")
+            ).scalar()
+            if estimate is None or estimate < 0:
+                estimate = db.execute(select(func.count()).select_from(User)).scalar()
+            self._total_estimate = int(estimate)
+            self._total_estimated_at = now
+        return self._total_estimate
 
     def get_user_by_id(self, user_id: int, db: Session) -> Dict:
         """Retrieve a specific user by ID."""
@@ -33,3 +77,11 @@ class UserService:
                 "latitude": user.latitude,
             }
         return None
+
+    def _columns(self, fields: Optional[Sequence[str]]) -> List[str]:
+        if not fields:
+            return list(USER_FIELDS)
+        unknown = sorted(set(fields) - set(USER_FIELDS))
+        if unknown:
+            raise ValueError(f"Unknown user fields: {', '.join(unknown)}. Available: {', '.join(USER_FIELDS)}")
+        return ["id"] + [field for field in USER_FIELDS if field in fields and field != "id"]
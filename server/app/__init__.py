@@ -1,3 +1,12 @@
-from .app import app
-
 __all__ = ["app"]
+
+
+def __getattr__(name):
+    # The FastAPI app is built on first access (uvicorn app:app), so scripts and the media
+    # worker can import app.* modules without loading the whole API
+    if name == "app":
+        from .app import app
+        # Importing the app.app submodule bound it here; keep the FastAPI instance instead
+        globals()["app"] = app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,8 +1,13 @@
 import os
+import time
+import asyncio
+import logging
 import operator
 import functools
+import threading
 from enum import Enum
 from config.config import settings  
+from config.db import engine
 
 from typing import Annotated, Sequence, TypedDict, List, Optional, Dict, Any
 
@@ -24,7 +29,17 @@ from langchain_community.tools.tavily_search import TavilySearchResults
 
 from langgraph.graph import StateGraph, END
 
-from app.common.minio_client import minio_client
+from app.common.minio_client import media_url_service
+from app.chatbot.media_utils import format_media_urls, wrap_plain_urls_as_images
+from app.chatbot.user_context import user_context_service
+from app.chatbot.parallel_executor import ParallelAgentExecutor
+from app.chatbot.metrics import chat_metrics
+from app.chatbot.model_tiers import FAST_TIER, LARGE_TIER, sql_escalation_reason, summary_escalation_reason
+from app.chatbot.schema_selector import ALL_TABLES, select_tables, describe_tables, estimate_tokens
+from app.chatbot.speculation import Speculation, local_prior
+from app.chatbot.session import CancelOnEvent, RunCancelled
+
+logger = logging.getLogger(__name__)
 
 members = ["Assistant", "SQL", "Recommender"]
 
@@ -35,33 +50,33 @@ AGENT_DESCRIPTIONS = {
     "Assistant": "General assistant for greetings, explanations, and non-database queries. Handles web search and calculations."
 }
 
-def format_media_urls(media_data: list) -> str:
-    """Format media/image data with MinIO URLs for frontend rendering.
-    
-    Args:
-        media_data: List of media records from database with external_resource_url
-        
-    Returns:
-        Formatted string with image URLs
-    """
-    if not media_data:
-        return "No images available."
-    
-    formatted = []
-    for item in media_data:
-        if isinstance(item, dict):
-            url = item.get('external_resource_url')
-            media_id = item.get('id')
-        else:
-            url = getattr(item, 'external_resource_url', None)
-            media_id = getattr(item, 'id', None)
-        
-        if url:
-            # Ensure URL is accessible (convert internal minio:9000 to localhost:9000 for dev)
-            public_url = url.replace('minio:9000', 'localhost:9000')
-            formatted.append(f"![Image {media_id}]({public_url})")
-    
-    return "\n".join(formatted)
+SQL_AGENT_PREFIX = """You are a helpful, friendly assistant with access to a database. Talk like a real person having a conversation!
+
+Available tables: %(tables)s
+
+**Schema Information**:
+%(schema)s
+
+**Your Mission**:
+1. Query the database to find what the user needs
+2. Respond in a warm, conversational way - like you're chatting with a friend!
+3. When posts or images are mentioned, query the post_feed view (it already has author, caption, media_id and tags)
+4. Use casual language, contractions, and be enthusiastic
+5. DON'T mention SQL queries, database operations, or technical stuff
+
+**Image Handling**:
+- Post images: SELECT media_id FROM post_feed - no JOINs needed; only JOIN posts/media/users for columns post_feed lacks
+- Write [[media:<media_id>]] where each post image should appear (e.g. [[media:17]]) - never copy media_url, the app turns references into images
+- User profiles have avatars: use users.avatar_url (avatars have no media id)
+
+**Tone Examples**:
+✅ "Hey! I found 5 awesome posts for you..."
+✅ "Sure thing! Alice has been posting some cool stuff lately..."
+✅ "Oh nice! Here are the places you might like..."
+❌ "Query executed successfully. Results: ..."
+❌ "The database contains the following records..."
+
+Remember: Be conversational, friendly, and helpful - not robotic!"""
 
 def get_minio_url(key: str) -> str:
     """Get public MinIO URL for a file key.
@@ -70,11 +85,9 @@ def get_minio_url(key: str) -> str:
         key: S3 object key (file path in MinIO)
         
     Returns:
-        Public URL accessible from frontend
+        Public (or presigned) URL accessible from frontend
     """
-    url = minio_client.get_file_url(key)
-    # Convert internal URL to public URL for development
-    return url.replace('minio:9000', 'localhost:9000')
+    return media_url_service.public_url(key)
 
 class AgentState(TypedDict):
   # The annotation tells the graph that new messages will always
@@ -94,6 +107,12 @@ class AgentState(TypedDict):
   agents_used: Annotated[Sequence[str], operator.add]
   # Chat history for conversation context
   chat_history: List[Dict[str, str]]
+  # Tables exposed to the SQL agent for this question
+  selected_tables: List[str]
+  # Worker started before classification finished (None when not speculating)
+  speculation: Optional[Speculation]
+  # Rendered user context profile, when the caller already has it (e.g. a WebSocket session)
+  user_profile: Optional[str]
 
 class FinalResponse(BaseModel):
 
@@ -119,61 +138,30 @@ class GraphService:
       
     print(settings.get_database_uri())
     
-    db = SQLDatabase.from_uri(settings.get_database_uri())
     # Get the prompt to use - you can modify this!
-    prompt = hub.pull("hwchase17/openai-functions-agent")
+    prompt = self._agent_prompt()
     os.environ["TAVILY_API_KEY"] = settings.TAVILY_API_KEY
 
     # Use temperature for more consistent responses
-    self.model = ChatOpenAI(model="gpt-4o", api_key=settings.OPENAI_API_KEY, temperature=0.3)
-    self.fast_model = ChatOpenAI(model="gpt-4o-mini", api_key=settings.OPENAI_API_KEY, temperature=0.2)
+    self.model = ChatOpenAI(model=settings.LARGE_MODEL, api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL, temperature=0.3)
+    self.fast_model = ChatOpenAI(model=settings.FAST_MODEL, api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL, temperature=0.2)
+    
+    # SQL and summarizer stages try the fast model first and escalate when its answer fails checks
+    self.model_tiers = (FAST_TIER, LARGE_TIER) if settings.MODEL_TIERING else (LARGE_TIER,)
+    self.tier_models = {FAST_TIER: self.fast_model, LARGE_TIER: self.model}
     
     # Max iterations to prevent infinite loops
     self.max_iterations = 5
     
     self.tools = load_tools(["serpapi", "llm-math"], self.model, serpapi_api_key=settings.SERPAPI_API_KEY)
     self.tools.append(TavilySearchResults(max_results=5))
-    self.chat_agent = AgentExecutor(agent= create_openai_tools_agent(self.model, self.tools, prompt), tools=self.tools)
+    # Parallel mode runs the tool calls of one agent step concurrently
+    executor_cls = ParallelAgentExecutor if settings.AGENT_PARALLEL_TOOLS else AgentExecutor
+    self.chat_agent = executor_cls(agent= create_openai_tools_agent(self.model, self.tools, prompt), tools=self.tools)
     
-    # Enhanced SQL agent with better instructions
-    self.sql_agent = create_sql_agent(
-        self.model, 
-        db=db, 
-        agent_type="openai-tools",
-        verbose=True,
-        prefix="""You are a helpful, friendly assistant with access to a database. Talk like a real person having a conversation!
-
-Available tables: users, posts, places, follows, media, timelines
-
-**Schema Information**:
-- posts table: id, user_id, media_id, caption, timestamp
-- media table: id, external_resource_url (image URLs), meta (JSON with tags)
-- users table: id, username, email, bio, avatar_url
-- places table: id, name, description, latitude, longitude, address, category
-- follows table: id, follower_id, following_id, timestamp
-- timelines table: id, user_id, post_id, timestamp
-
-**Your Mission**:
-1. Query the database to find what the user needs
-2. Respond in a warm, conversational way - like you're chatting with a friend!
-3. When posts or users are mentioned, JOIN with media table to get images
-4. Use casual language, contractions, and be enthusiastic
-5. DON'T mention SQL queries, database operations, or technical stuff
-
-**Image Handling**:
-- Posts have images: JOIN posts with media to get external_resource_url
-- User profiles have avatars: use users.avatar_url
-- Return image URLs in your response - they'll be formatted automatically
-
-**Tone Examples**:
-✅ "Hey! I found 5 awesome posts for you..."
-✅ "Sure thing! Alice has been posting some cool stuff lately..."
-✅ "Oh nice! Here are the places you might like..."
-❌ "Query executed successfully. Results: ..."
-❌ "The database contains the following records..."
-
-Remember: Be conversational, friendly, and helpful - not robotic!"""
-    )
+    # SQL agents are built per table subset chosen by the schema selector
+    self.db_engine = engine
+    self._sql_agents: Dict[tuple, Any] = {}
     
     # Create a fast classifier for initial routing (cheaper/faster than supervisor)
     self.classifier = self._create_classifier()
@@ -182,6 +170,141 @@ Remember: Be conversational, friendly, and helpful - not robotic!"""
     
     GraphService._initialized = True
 
+  @staticmethod
+  def _agent_prompt() -> ChatPromptTemplate:
+    """Pull the tools-agent prompt from the hub, or build the same prompt locally when offline."""
+    try:
+      return hub.pull("hwchase17/openai-functions-agent")
+    except Exception as e:
+      logger.warning(f"Could not pull agent prompt from hub, using local copy: {e}")
+      return ChatPromptTemplate.from_messages([
+        ("system", "You are a helpful assistant"),
+        MessagesPlaceholder("chat_history", optional=True),
+        ("human", "{input}"),
+        MessagesPlaceholder("agent_scratchpad"),
+      ])
+
+  def _get_sql_agent(self, tables: List[str], tier: str = LARGE_TIER):
+    """Return the SQL agent that can only see the given tables (built once per subset and tier)."""
+    key = (frozenset(tables), tier)
+    if key not in self._sql_agents:
+      table_list = sorted(key[0])
+      # view_support exposes the post_feed view alongside the tables
+      db = SQLDatabase(self.db_engine, include_tables=table_list, view_support=True)
+      agent = create_sql_agent(
+          self.tier_models[tier], 
+          db=db, 
+          agent_type="openai-tools",
+          verbose=True,
+          prefix=SQL_AGENT_PREFIX % {"tables": ", ".join(table_list), "schema": describe_tables(table_list)},
+          # Tool observations are needed to decide whether to escalate
+          agent_executor_kwargs={"return_intermediate_steps": True}
+      )
+      if settings.AGENT_PARALLEL_TOOLS:
+        agent = ParallelAgentExecutor.from_executor(agent)
+      self._sql_agents[key] = agent
+    return self._sql_agents[key]
+
+  def _run_tiered(self, stage: str, run, escalation_reason):
+    """Run a stage on each model tier in turn until one produces an acceptable result.
+    
+    Args:
+      stage: Metrics label ('sql', 'summarizer')
+      run: Callable taking a tier name and returning the stage result
+      escalation_reason: Callable returning why a result is unacceptable, or None
+      
+    Returns:
+      The first acceptable result (or the last tier's result)
+    """
+    for i, tier in enumerate(self.model_tiers):
+      is_last = i == len(self.model_tiers) - 1
+      start = time.perf_counter()
+      try:
+        result = run(tier)
+        reason = None if is_last else escalation_reason(result)
+      except RunCancelled:
+        raise
+      except Exception as e:
+        if is_last:
+          raise
+        reason = "exception"
+        logger.warning(f"{stage} failed on {tier} tier: {e}")
+      if self._record_tier_attempt(stage, tier, start, reason):
+        return result
+
+  async def _arun_tiered(self, stage: str, run, escalation_reason):
+    """Async variant of _run_tiered; run returns an awaitable."""
+    for i, tier in enumerate(self.model_tiers):
+      is_last = i == len(self.model_tiers) - 1
+      start = time.perf_counter()
+      try:
+        result = await run(tier)
+        reason = None if is_last else escalation_reason(result)
+      except RunCancelled:
+        raise
+      except Exception as e:
+        if is_last:
+          raise
+        reason = "exception"
+        logger.warning(f"{stage} failed on {tier} tier: {e}")
+      if self._record_tier_attempt(stage, tier, start, reason):
+        return result
+
+  def _record_tier_attempt(self, stage: str, tier: str, start: float, reason: Optional[str]) -> bool:
+    """Record one tier attempt in metrics; True if its result is accepted."""
+    chat_metrics.observe(f"latency_ms.{stage}.{tier}", (time.perf_counter() - start) * 1000)
+    if reason is None:
+      chat_metrics.increment(f"tier.{stage}.{tier}")
+      return True
+    chat_metrics.increment(f"escalation.{stage}.{reason}")
+    logger.info(f"Escalating {stage} from {tier} tier: {reason}")
+    return False
+
+  async def _answer_with_sql(self, query: str, user_id: int, tables: List[str], profile: Optional[str] = None) -> str:
+    """Run the tiered SQL agent on one question and format image URLs in its answer."""
+    # Detect if query involves images/media
+    needs_images = any(keyword in query.lower() for keyword in 
+                      ['post', 'photo', 'image', 'picture', 'media', 'avatar', 'profile'])
+    
+    # Add context to help SQL agent understand it should query the database
+    image_instruction = ""
+    if needs_images:
+      image_instruction = " For posts and their images, query the post_feed view and write [[media:<media_id>]] for each image instead of its URL; for profile pictures use users.avatar_url."
+    
+    # Pre-computed profile lets first-person questions skip lookup queries
+    if profile is None:
+      profile = await asyncio.to_thread(user_context_service.render, user_id)
+    profile_context = f"\n{profile}\nUse this profile directly when it already answers the question." if profile else ""
+    
+    enhanced_query = f"Answer this in a friendly, conversational way: {query}\n\nContext: You're helping user {user_id}.{profile_context} Query the database (users, posts, places, follows, media, timelines) to find what they're looking for. Be natural and casual in your response, like you're chatting with a friend.{image_instruction} Don't mention technical details like SQL queries or database operations - just give them the info they need in a warm, helpful way."
+    
+    async def run(tier):
+      # Building an agent reflects its tables, so keep that off the event loop
+      agent = await asyncio.to_thread(self._get_sql_agent, tables, tier)
+      return await agent.ainvoke(enhanced_query)
+    
+    result = await self._arun_tiered("sql", run, sql_escalation_reason)
+    output = result["output"]
+    
+    # Post-process output to ensure image URLs are in markdown format
+    if needs_images and 'http' in output:
+      output = wrap_plain_urls_as_images(output)
+    
+    return output
+
+  def _start_speculation(self, query: str, user_id: int, profile: Optional[str] = None) -> Optional[Speculation]:
+    """Start likely work while the classifier runs; returns the speculative SQL run, if any."""
+    # SQL and Recommender both read the profile, so warm it whatever the route
+    if profile is None:
+      asyncio.get_running_loop().run_in_executor(None, user_context_service.get_profile, user_id)
+    
+    agent = local_prior(query)
+    if agent != "SQL":
+      return None
+    tables = select_tables(query)
+    task = asyncio.create_task(self._answer_with_sql(query, user_id, tables, profile))
+    return Speculation(agent, query, tables, task)
+
   def _create_classifier(self):
     """Fast classifier to route queries directly without supervisor overhead."""
     classifier_prompt = ChatPromptTemplate.from_template(
@@ -237,6 +360,7 @@ Remember: Be conversational, friendly, and helpful - not robotic!"""
         - Don't list information in a dry, mechanical way
         
         **CRITICAL - Image Handling**:
+        - References like [[media:17]] are images: keep every one exactly as written, never replace them with URLs or wrap them in ![...](...)
         - If the Information Found already contains markdown images ![alt](url), use them EXACTLY as-is
         - DO NOT wrap existing markdown images with additional ![...](...) syntax
         - DO NOT modify URLs or alt text in existing images
@@ -255,11 +379,15 @@ Remember: Be conversational, friendly, and helpful - not robotic!"""
         Respond in a friendly, conversational way (preserve any existing markdown images exactly):
     ''')
 
-    summerizer_agent =  create_structured_output_runnable(
-        FinalResponse, self.model, response_gen_prompt
-    )
+    def run(tier):
+      summerizer_agent =  create_structured_output_runnable(
+          FinalResponse, self.tier_models[tier], response_gen_prompt
+      )
+      return summerizer_agent.invoke({"userRequest":userRequest, "finalState":finalState})
 
-    return summerizer_agent.invoke({"userRequest":userRequest, "finalState":finalState})
+    return self._run_tiered(
+      "summarizer", run, lambda summary: summary_escalation_reason(summary.response, str(finalState))
+    )
 
   def _create_supervisor(self):
     system_prompt = (
@@ -336,15 +464,16 @@ Remember: Be conversational, friendly, and helpful - not robotic!"""
           "messages": [HumanMessage(content=result["output"], name=name)],
           "agents_used": [name]
         }
+      except RunCancelled:
+        raise
       except Exception as e:
         return {
           "messages": [HumanMessage(content=f"Error: {str(e)}", name=name)],
           "agents_used": [name]
         }
     
-    def sql_agent_node(state, agent, name):
+    async def sql_agent_node(state, name):
       try:
-        # Enhance SQL agent with user context
         user_id = state.get('user_id', 1)
         query = state['messages'][-1].content
         
@@ -358,29 +487,13 @@ Remember: Be conversational, friendly, and helpful - not robotic!"""
             "agents_used": [name]
           }
         
-        # Detect if query involves images/media
-        needs_images = any(keyword in query.lower() for keyword in 
-                          ['post', 'photo', 'image', 'picture', 'media', 'avatar', 'profile'])
-        
-        # Add context to help SQL agent understand it should query the database
-        image_instruction = ""
-        if needs_images:
-          image_instruction = " When querying posts or users, make sure to JOIN with the media table and include external_resource_url field to get image URLs."
-        
-        enhanced_query = f"Answer this in a friendly, conversational way: {query}\n\nContext: You're helping user {user_id}. Query the database (users, posts, places, follows, media, timelines) to find what they're looking for. Be natural and casual in your response, like you're chatting with a friend.{image_instruction} Don't mention technical details like SQL queries or database operations - just give them the info they need in a warm, helpful way."
-        
-        result = agent.invoke(enhanced_query)
-        output = result["output"]
-        
-        # Post-process output to ensure image URLs are in markdown format
-        if needs_images and 'http' in output:
-          # Extract URLs and format them as markdown images
-          import re
-          urls = re.findall(r'(https?://[^\s<>"]+)', output)
-          for i, url in enumerate(urls, 1):
-            if not f'![]({url}' in output:  # Only add markdown if not already present
-              # Convert plain URLs to markdown image syntax
-              output = output.replace(url, f'![Image {i}]({url})')
+        # Reuse the run started before classification finished, if it was for this question
+        speculation = state.get('speculation')
+        if speculation is not None and speculation.usable_for(query):
+          output = await speculation.task
+        else:
+          tables = state.get('selected_tables') or ALL_TABLES
+          output = await self._answer_with_sql(query, user_id, tables, state.get('user_profile'))
         
         # Update cache
         cached_data[cache_key] = output
@@ -390,6 +503,8 @@ Remember: Be conversational, friendly, and helpful - not robotic!"""
           "cached_data": cached_data,
           "agents_used": [name]
         }
+      except RunCancelled:
+        raise
       except Exception as e:
         return {
           "messages": [HumanMessage(content=f"Database error: {str(e)}", name=name)],
@@ -409,13 +524,19 @@ Remember: Be conversational, friendly, and helpful - not robotic!"""
             break
         
         # Enhance recommender with user context
-        enhanced_query = f"Provide personalized recommendations for user {user_id}: {query}{sql_context}\nConsider their interests, past behavior, and preferences."
+        profile = state.get('user_profile')
+        if profile is None:
+          profile = user_context_service.render(user_id)
+        profile_context = f"\n{profile}" if profile else ""
+        enhanced_query = f"Provide personalized recommendations for user {user_id}: {query}{profile_context}{sql_context}\nConsider their interests, past behavior, and preferences."
         
         result = agent.invoke({"input": enhanced_query})
         return {
           "messages": [HumanMessage(content=result["output"], name=name)],
           "agents_used": [name]
         }
+      except RunCancelled:
+        raise
       except Exception as e:
         return {
           "messages": [HumanMessage(content=f"Error: {str(e)}", name=name)],
@@ -424,24 +545,48 @@ Remember: Be conversational, friendly, and helpful - not robotic!"""
 
     workflow = StateGraph(AgentState)
     workflow.add_node("Assistant", functools.partial(chat_agent_node, agent=self.chat_agent, name="Assistant"))
-    workflow.add_node("SQL", functools.partial(sql_agent_node, agent=self.sql_agent, name="SQL"))
+    workflow.add_node("SQL", functools.partial(sql_agent_node, name="SQL"))
     workflow.add_node("Recommender", functools.partial(recommender_agent_node, agent=self.chat_agent, name="Recommender"))
 
     workflow.add_node("supervisor", self.supervisor_agent)
     
     # Add classifier node for fast initial routing
-    def classifier_node(state):
-      query = state['messages'][0].content
-      initial_agent = self._classify_query(query)
+    async def classifier_node(state):
+      # Classify the current question (earlier messages are chat history)
+      query = state['messages'][-1].content
+      start = time.perf_counter()
+      initial_agent = await asyncio.to_thread(self._classify_query, query)
+      
+      speculation = state.get('speculation')
+      if speculation is not None:
+        speculation.resolve(initial_agent, (time.perf_counter() - start) * 1000)
       return {"next": initial_agent, "query_type": initial_agent.lower()}
     
     workflow.add_node("classifier", classifier_node)
     
+    # Narrow the SQL agent to the tables the question is about
+    def schema_selector_node(state):
+      query = state['messages'][-1].content
+      start = time.perf_counter()
+      tables = select_tables(query)
+      elapsed_ms = (time.perf_counter() - start) * 1000
+      
+      full_tokens = estimate_tokens(describe_tables(ALL_TABLES))
+      pruned_tokens = estimate_tokens(describe_tables(tables))
+      logger.info(
+        f"Schema pruning: {len(tables)}/{len(ALL_TABLES)} tables {tables}, "
+        f"schema prompt {full_tokens} -> {pruned_tokens} tokens, selected in {elapsed_ms:.2f}ms"
+      )
+      return {"selected_tables": tables}
+    
+    workflow.add_node("schema_selector", schema_selector_node)
+    workflow.add_edge("schema_selector", "SQL")
+    
     # Route from classifier to agents (skip supervisor for first step)
     workflow.add_conditional_edges(
       "classifier",
       lambda x: x["next"],
-      {"SQL": "SQL", "Recommender": "Recommender", "Assistant": "Assistant"}
+      {"SQL": "schema_selector", "Recommender": "Recommender", "Assistant": "Assistant"}
     )
     
     # Safety check: prevent infinite loops
@@ -465,6 +610,7 @@ Remember: Be conversational, friendly, and helpful - not robotic!"""
   
     # The supervisor populates the "next" field in the graph state
     conditional_map = {k: k for k in members}
+    conditional_map["SQL"] = "schema_selector"
     conditional_map["FINISH"] = END
   
     workflow.add_conditional_edges("supervisor", should_continue, conditional_map)
@@ -474,17 +620,49 @@ Remember: Be conversational, friendly, and helpful - not robotic!"""
 
     return workflow.compile(debug=False)
 
-  async def invoke(self, input_data, user_id: int, chat_history: List[Dict[str, str]] = None):
+  async def invoke(self, input_data, user_id: int, chat_history: List[Dict[str, str]] = None, cached_data: Optional[Dict[str, Any]] = None):
     """Invoke the graph workflow and return final response.
     
     Args:
       input_data: User query
       user_id: User identifier
       chat_history: Previous conversation messages for context
+      cached_data: SQL result cache to reuse (and fill) across questions
       
     Returns:
       Final response string
     """
+    answer = None
+    async for event in self.stream(input_data, user_id, chat_history, cached_data=cached_data):
+      if event["type"] == "answer":
+        answer = event["text"]
+    return answer
+
+  async def stream(
+    self,
+    input_data,
+    user_id: int,
+    chat_history: List[Dict[str, str]] = None,
+    cached_data: Optional[Dict[str, Any]] = None,
+    user_profile: Optional[str] = None,
+    cancel_event: Optional[threading.Event] = None,
+  ):
+    """Run the graph workflow, yielding progress events and then the final response.
+    
+    Args:
+      input_data: User query
+      user_id: User identifier
+      chat_history: Previous conversation messages for context
+      cached_data: SQL result cache to reuse (and fill) across questions
+      user_profile: Pre-rendered user context profile, skips the profile lookup
+      cancel_event: Once set, the run raises RunCancelled at the next chain, LLM or tool
+        start, including in the worker threads the nodes run in
+      
+    Yields:
+      {"type": "step", "node": ...} as each graph node finishes,
+      {"type": "partial", "agent": ..., "text": ...} for each worker answer,
+      then one {"type": "answer", "text": ...}
+    """
     if chat_history is None:
       chat_history = []
     
@@ -499,35 +677,59 @@ Remember: Be conversational, friendly, and helpful - not robotic!"""
     # Combine history with current question
     all_messages = history_messages + [HumanMessage(content=input_data)]
     
+    # Start the likely worker while the classifier makes its LLM call
+    speculation = self._start_speculation(input_data, user_id, user_profile) if settings.SPECULATIVE_ROUTING else None
+    
     initial_state = {
       "messages": all_messages,
       "user_id": user_id,
       "iteration_count": 0,
-      "cached_data": {},
+      "cached_data": cached_data if cached_data is not None else {},
       "agents_used": [],
-      "chat_history": chat_history
+      "chat_history": chat_history,
+      "speculation": speculation,
+      "user_profile": user_profile
     }
     
     graphSteps = []
+    config = {"recursion_limit": 10}
+    if cancel_event is not None:
+      config["callbacks"] = [CancelOnEvent(cancel_event)]
     
     try:
-      async for s in self.workflow.astream(initial_state, {"recursion_limit": 10}):
+      async for s in self.workflow.astream(initial_state, config):
         if "__end__" not in s:
           graphSteps.append(s)
           
+          for node, update in s.items():
+            yield {"type": "step", "node": node}
+            if node in members:
+              for msg in (update or {}).get("messages", []):
+                yield {"type": "partial", "agent": node, "text": msg.content}
+          
           # Increment iteration count
           if "supervisor" in s:
             initial_state["iteration_count"] = initial_state.get("iteration_count", 0) + 1
       
-      # Return final response
-      return self.summarize(input_data, graphSteps).response
+      # Return final response (summarizer is a blocking LLM call, keep it off the event loop)
+      if cancel_event is not None and cancel_event.is_set():
+        raise RunCancelled()
+      summary = await asyncio.to_thread(self.summarize, input_data, graphSteps)
+      yield {"type": "answer", "text": summary.response}
         
+    except RunCancelled:
+      raise
     except Exception as e:
       error_msg = f"Graph execution error: {str(e)}"
       print(error_msg)
       
       # If we have partial results, try to summarize them
       if graphSteps and "recursion" not in str(e).lower():
-        return self.summarize(input_data, graphSteps).response
-      
-      return f"I'm having trouble processing that request. Could you try rephrasing it or asking something simpler?"
+        summary = await asyncio.to_thread(self.summarize, input_data, graphSteps)
+        yield {"type": "answer", "text": summary.response}
+      else:
+        yield {"type": "answer", "text": f"I'm having trouble processing that request. Could you try rephrasing it or asking something simpler?"}
+    finally:
+      # Never leave a speculative run going once the request is done (or cancelled)
+      if speculation is not None:
+        speculation.cancel()
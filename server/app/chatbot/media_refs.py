@@ -0,0 +1,134 @@
+"""Compact [[media:N]] references in agent answers, resolved to public URLs server-side"""
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, event, text
+
+from config.config import settings
+from config.db import engine
+from app.Media.model import Media
+from app.common.image_derivatives import thumbnail_key
+from app.common.minio_client import media_url_service
+from app.chatbot.media_utils import MEDIA_REF_PATTERN, convert_minio_url_for_frontend, find_media_ids
+from app.chatbot.metrics import chat_metrics
+
+logger = logging.getLogger(__name__)
+
+class MediaResolver:
+  """Expands [[media:N]] placeholders into markdown images via a bulk, cached media lookup."""
+
+  def __init__(self, max_entries: int = settings.MEDIA_URL_CACHE_SIZE):
+    self.max_entries = max_entries
+    # id -> (stored external_resource_url, thumbnail key); public/presigned URLs come from
+    # media_url_service at lookup time, so expiring signatures are never cached here
+    self._urls: "OrderedDict[int, Tuple[str, Optional[str]]]" = OrderedDict()
+    self._lock = threading.Lock()
+
+  def lookup(self, media_ids: Iterable[int]) -> Dict[int, Tuple[str, Optional[str]]]:
+    """Public URLs for media ids; cache misses are fetched in one query.
+
+    Args:
+      media_ids: Media ids to resolve
+
+    Returns:
+      id -> (public URL, thumbnail URL or None) for every id that exists
+    """
+    media_ids = list(dict.fromkeys(media_ids))
+    found: Dict[int, Tuple[str, Optional[str]]] = {}
+    with self._lock:
+      for media_id in media_ids:
+        entry = self._urls.get(media_id)
+        if entry is not None:
+          self._urls.move_to_end(media_id)
+          found[media_id] = entry
+
+    missing = [media_id for media_id in media_ids if media_id not in found]
+    chat_metrics.increment("media_refs.cache_hits", len(found))
+    if missing:
+      try:
+        fetched = self._load_media(missing)
+      except Exception as e:
+        logger.warning(f"Could not resolve media ids {missing}: {e}")
+        fetched = {}
+
+      with self._lock:
+        for media_id, entry in fetched.items():
+          self._urls[media_id] = entry
+          self._urls.move_to_end(media_id)
+        while len(self._urls) > self.max_entries:
+          self._urls.popitem(last=False)
+      found.update(fetched)
+
+    return {
+      media_id: (convert_minio_url_for_frontend(url), media_url_service.public_url(thumb) if thumb else None)
+      for media_id, (url, thumb) in found.items()
+    }
+
+  def expand(self, answer: str) -> Tuple[str, List[Dict]]:
+    """Replace placeholders with markdown images.
+
+    Args:
+      answer: Agent/summarizer output that may contain [[media:N]]
+
+    Returns:
+      (text with placeholders expanded, image metadata for the referenced media)
+      Unknown ids are dropped from the text.
+    """
+    media_ids = find_media_ids(answer)
+    if not media_ids:
+      return answer, []
+
+    resolved = self.lookup(media_ids)
+    unknown = [media_id for media_id in media_ids if media_id not in resolved]
+    chat_metrics.increment("media_refs.resolved", len(media_ids) - len(unknown))
+    if unknown:
+      chat_metrics.increment("media_refs.unknown", len(unknown))
+      logger.info(f"Dropping references to unknown media ids: {unknown}")
+
+    images: List[Dict] = []
+    seen = set()
+
+    def replace(match: re.Match) -> str:
+      media_id = int(match.group('md_id') or match.group('id'))
+      if media_id not in resolved:
+        return ""
+      url, thumbnail_url = resolved[media_id]
+      alt = match.group('alt') or f"Image {media_id}"
+      if media_id not in seen:
+        seen.add(media_id)
+        images.append({"url": url, "alt": alt, "media_id": media_id, "thumbnail_url": thumbnail_url})
+      return f"![{alt}]({url})"
+
+    return MEDIA_REF_PATTERN.sub(replace, answer), images
+
+  def invalidate(self, media_id: int) -> None:
+    with self._lock:
+      self._urls.pop(media_id, None)
+
+  def _load_media(self, media_ids: List[int]) -> Dict[int, Tuple[str, Optional[str]]]:
+    query = text(
+      "SELECT id, external_resource_url, meta FROM media WHERE id IN :ids"
+    ).bindparams(bindparam("ids", expanding=True))
+    with engine.connect() as conn:
+      rows = conn.execute(query, {"ids": media_ids}).all()
+    return {
+      row.id: (row.external_resource_url, thumbnail_key(row.meta))
+      for row in rows if row.external_resource_url
+    }
+
+
+def register_invalidation_listeners(resolver: MediaResolver) -> None:
+  """Drop cached URLs when the ORM changes a media row."""
+  def _on_media(mapper, connection, target):
+    resolver.invalidate(target.id)
+
+  for event_name in ("after_update", "after_delete"):
+    event.listen(Media, event_name, _on_media)
+
+
+# Singleton instance
+media_resolver = MediaResolver()
+register_invalidation_listeners(media_resolver)
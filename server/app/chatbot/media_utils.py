@@ -1,4 +1,25 @@
 """Helper utilities for formatting responses with media URLs"""
+import re
+from typing import Dict, List
+
+from app.common.minio_client import media_url_service
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg')
+
+# The post-processor scans for URLs only (a literal-prefixed pattern the regex engine
+# can skip through quickly) and tells markdown images/links apart by their surroundings
+URL_PATTERN = re.compile(r'(https?://[^\s<>"()\[\]]+)')
+MARKDOWN_TOKEN_PATTERN = re.compile(r'!?\[[^\]]*\]\([^)\s]+\)')
+IMAGE_URL_PATTERN = re.compile(r'https?://[^\s<>"()]+(?:\.jpg|\.jpeg|\.png|\.gif|\.webp|\.svg)', re.IGNORECASE)
+
+# Agents write [[media:N]] instead of copying media URLs (resolved by app/chatbot/media_refs.py);
+# ![alt]([[media:N]]) keeps the model's alt text, a bare reference gets a generated one
+MEDIA_REF_MARKER = '[[media:'
+MEDIA_REF_PATTERN = re.compile(r'!\[(?P<alt>[^\]]*)\]\(\s*\[\[media:(?P<md_id>\d+)\]\]\s*\)|\[\[media:(?P<id>\d+)\]\]')
+
+# Sentence punctuation that ends up glued to bare URLs ("see http://.../a.jpg.")
+URL_TRAILING_PUNCTUATION = '.,;:!?\'*'
+
 
 def convert_minio_url_for_frontend(url: str, is_docker: bool = False) -> str:
     """
@@ -6,19 +27,25 @@ def convert_minio_url_for_frontend(url: str, is_docker: bool = False) -> str:
     
     Args:
         url: Original MinIO URL (e.g., http://minio:9000/media/image.jpg)
-        is_docker: If True, keeps minio:9000; if False, uses localhost:9000
+        is_docker: If True, keeps the internal URL; if False, returns the deployment's
+            public or presigned URL (see MediaURLService)
         
     Returns:
         Publicly accessible URL
     """
     if not url:
         return ""
+    if is_docker:
+        return url
     
-    # For frontend access, replace internal docker hostname with localhost
-    if not is_docker and 'minio:9000' in url:
-        return url.replace('minio:9000', 'localhost:9000')
-    
-    return url
+    # Media bucket objects: cached public/presigned URL for the object key
+    public_url = media_url_service.convert_url(url)
+    if public_url is url:
+        # Elsewhere on MinIO (MINIO_ENDPOINT): just swap in the public host
+        internal_host = media_url_service.client.endpoint
+        if internal_host in url:
+            return url.replace(internal_host, media_url_service.public_endpoint)
+    return public_url
 
 
 def extract_image_urls_from_text(text: str) -> list[str]:
@@ -31,9 +58,150 @@ def extract_image_urls_from_text(text: str) -> list[str]:
     Returns:
         List of extracted URLs
     """
-    import re
-    pattern = r'https?://[^\s<>"()]+(?:\.jpg|\.jpeg|\.png|\.gif|\.webp|\.svg)'
-    return re.findall(pattern, text, re.IGNORECASE)
+    return IMAGE_URL_PATTERN.findall(text)
+
+
+def find_media_ids(text: str) -> List[int]:
+    """Media ids referenced as [[media:N]] in text, in first-seen order."""
+    if MEDIA_REF_MARKER not in text:
+        return []
+    ids = (int(m.group('md_id') or m.group('id')) for m in MEDIA_REF_PATTERN.finditer(text))
+    return list(dict.fromkeys(ids))
+
+
+def is_image_url(url: str) -> bool:
+    """True if the URL path ends in an image extension (query string ignored)."""
+    return url.split('?', 1)[0].split('#', 1)[0].lower().endswith(IMAGE_EXTENSIONS)
+
+
+class ResponsePostProcessor:
+    """
+    Single-pass rewriter for answer text containing image markdown and URLs.
+
+    One scan with a precompiled pattern rewrites internal MinIO hosts,
+    optionally wraps bare URLs as markdown images, and collects image
+    metadata for the frontend. Text can be given whole (process) or as a
+    token stream (feed/close); streamed output is identical to the
+    whole-text output.
+    """
+
+    def __init__(self, convert_urls: bool = True, wrap_bare_urls: bool = False):
+        """
+        Args:
+            convert_urls: Rewrite MinIO URLs (MINIO_ENDPOINT) to client-facing ones in text and metadata
+            wrap_bare_urls: Rewrite bare URLs as ![Image N](url)
+        """
+        self.convert_urls = convert_urls
+        self.wrap_bare_urls = wrap_bare_urls
+        self.images: List[Dict[str, str]] = []
+        self._seen_urls = set()
+        self._wrapped = 0
+        self._pending = ''
+        self._output: List[str] = []
+
+    def feed(self, chunk: str) -> str:
+        """
+        Process the next piece of a streamed answer.
+
+        Returns:
+            Rewritten text that is final; a possibly incomplete URL or
+            markdown image at the end is held back until more text arrives
+        """
+        self._pending += chunk
+        cut = self._safe_cut(self._pending)
+        ready, self._pending = self._pending[:cut], self._pending[cut:]
+        return self._emit(ready)
+
+    def close(self) -> str:
+        """Flush held-back text at the end of the stream."""
+        ready, self._pending = self._pending, ''
+        return self._emit(ready)
+
+    def process(self, text: str) -> str:
+        """Rewrite a complete answer."""
+        ready, self._pending = self._pending + text, ''
+        return self._emit(ready)
+
+    @property
+    def text(self) -> str:
+        """All rewritten text emitted so far."""
+        return ''.join(self._output)
+
+    def result(self) -> dict:
+        return {
+            'text': self.text,
+            'images': self.images,
+            'has_images': len(self.images) > 0
+        }
+
+    def _safe_cut(self, buffer: str) -> int:
+        """Position up to which buffer can be rewritten without splitting a URL or markdown image."""
+        # The trailing word may be the start of a URL
+        cut = max(buffer.rfind(' '), buffer.rfind('\n'), buffer.rfind('\t')) + 1
+        # An unclosed [ may still become a markdown image or link (alt text can contain spaces)
+        opening = buffer.rfind('[', 0, cut)
+        if opening != -1 and ')' not in buffer[opening:]:
+            cut = opening - 1 if buffer[opening - 1:opening] == '!' else opening
+        # Don't cut through a token that straddles the cut (e.g. ![Post 1](url) ending the buffer)
+        for match in MARKDOWN_TOKEN_PATTERN.finditer(buffer):
+            if match.start() >= cut:
+                break
+            if cut < match.end():
+                cut = match.start()
+                break
+        return cut
+
+    def _emit(self, text: str) -> str:
+        if not text:
+            return ''
+        # split() does the scan and slicing in C: [text, url, text, url, ..., text]
+        parts = URL_PATTERN.split(text)
+        if len(parts) == 1:
+            self._output.append(text)
+            return text
+
+        # Hot loop (runs per URL on every answer): keep lookups local
+        convert = self.convert_urls and media_url_service.client.endpoint in text
+        to_public = convert_minio_url_for_frontend
+        wrap = self.wrap_bare_urls
+        seen, images = self._seen_urls, self.images
+        for i in range(1, len(parts), 2):
+            url = parts[i]
+            before = parts[i - 1]
+
+            # Inside ![alt](url) or [label](url): keep the markdown, only rewrite the host
+            if before.endswith('](') and parts[i + 1].startswith(')'):
+                opening = before.rfind('[')
+                if opening != -1:
+                    if convert:
+                        url = parts[i] = to_public(url)
+                    if opening > 0 and before[opening - 1] == '!' and url not in seen:
+                        seen.add(url)
+                        images.append({'url': url, 'alt': before[opening + 1:-2] or 'Image'})
+                    continue
+
+            # Bare URL; sentence punctuation after it stays outside the URL
+            core = url.rstrip(URL_TRAILING_PUNCTUATION)
+            trailing = url[len(core):]
+            if convert:
+                core = to_public(core)
+            if wrap:
+                self._wrapped += 1
+                alt = f'Image {self._wrapped}'
+                if core not in seen:
+                    seen.add(core)
+                    images.append({'url': core, 'alt': alt})
+                parts[i] = f'![{alt}]({core}){trailing}'
+            else:
+                if core not in seen and is_image_url(core):
+                    seen.add(core)
+                    images.append({'url': core, 'alt': 'Image'})
+                if convert:
+                    parts[i] = core + trailing
+
+        rewritten = ''.join(parts)
+        self._output.append(rewritten)
+        return rewritten
 
 
 def format_response_with_images(response_text: str, convert_urls: bool = True) -> dict:
@@ -42,50 +210,14 @@ def format_response_with_images(response_text: str, convert_urls: bool = True) -
     
     Args:
         response_text: Raw response text with potential markdown images
-        convert_urls: Whether to convert minio URLs to localhost
+        convert_urls: Whether to convert minio URLs to localhost (in text and images)
         
     Returns:
-        Dict with 'text' and 'images' fields
+        Dict with 'text', 'images' and 'has_images' fields
     """
-    import re
-    
-    # Extract markdown images: ![alt](url)
-    markdown_images = re.findall(r'!\[([^\]]*)\]\(([^)]+)\)', response_text)
-    
-    images = []
-    seen_urls = set()
-    
-    for alt_text, url in markdown_images:
-        if convert_urls:
-            url = convert_minio_url_for_frontend(url)
-        if url not in seen_urls:
-            images.append({
-                'url': url,
-                'alt': alt_text or 'Image'
-            })
-            seen_urls.add(url)
-    
-    # Also extract plain URLs that might not be in markdown (but exclude markdown syntax)
-    # Remove markdown images first to avoid re-matching
-    text_without_markdown = re.sub(r'!\[[^\]]*\]\([^)]+\)', '', response_text)
-    plain_urls = extract_image_urls_from_text(text_without_markdown)
-    
-    for url in plain_urls:
-        if convert_urls:
-            url = convert_minio_url_for_frontend(url)
-        # Avoid duplicates
-        if url not in seen_urls:
-            images.append({
-                'url': url,
-                'alt': 'Image'
-            })
-            seen_urls.add(url)
-    
-    return {
-        'text': response_text,
-        'images': images,
-        'has_images': len(images) > 0
-    }
+    processor = ResponsePostProcessor(convert_urls=convert_urls)
+    processor.process(response_text)
+    return processor.result()
 
 
 def create_markdown_image(url: str, alt_text: str = "Image") -> str:
@@ -125,3 +257,45 @@ def format_post_with_media(post_data: dict) -> str:
         result += f"\n{create_markdown_image(public_url, f'Post {post_id}')}"
     
     return result
+
+
+def format_media_urls(media_data: list) -> str:
+    """Format media/image data with MinIO URLs for frontend rendering.
+    
+    Args:
+        media_data: List of media records from database with external_resource_url
+        
+    Returns:
+        Formatted string with image URLs
+    """
+    if not media_data:
+        return "No images available."
+    
+    formatted = []
+    for item in media_data:
+        if isinstance(item, dict):
+            url = item.get('external_resource_url')
+            media_id = item.get('id')
+        else:
+            url = getattr(item, 'external_resource_url', None)
+            media_id = getattr(item, 'id', None)
+        
+        if url:
+            # Ensure URL is accessible (internal MinIO URL -> public or presigned URL)
+            public_url = convert_minio_url_for_frontend(url)
+            formatted.append(f"![Image {media_id}]({public_url})")
+    
+    return "\n".join(formatted)
+
+
+def wrap_plain_urls_as_images(text: str) -> str:
+    """
+    Turn plain URLs in an SQL agent answer into markdown images.
+    
+    Args:
+        text: Agent answer that may list media URLs
+        
+    Returns:
+        Text with each bare URL rewritten as ![Image N](url); existing markdown images are kept
+    """
+    return ResponsePostProcessor(convert_urls=False, wrap_bare_urls=True).process(text)
@@ -0,0 +1,41 @@
+"""In-process counters and timings for the chatbot pipeline"""
+import threading
+from collections import defaultdict
+from typing import Dict
+
+
+class ChatMetrics:
+    """Thread-safe counters and latency summaries, exposed at /chat-bot/metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._timings: Dict[str, Dict[str, float]] = {}
+
+    def increment(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, value_ms: float) -> None:
+        """Record a duration in milliseconds."""
+        with self._lock:
+            timing = self._timings.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            timing["count"] += 1
+            timing["total_ms"] += value_ms
+            timing["max_ms"] = max(timing["max_ms"], value_ms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            timings = {
+                name: {
+                    "count": t["count"],
+                    "avg_ms": round(t["total_ms"] / t["count"], 2),
+                    "max_ms": round(t["max_ms"], 2),
+                }
+                for name, t in self._timings.items()
+            }
+            return {"counters": dict(self._counters), "timings": timings}
+
+
+# Singleton instance
+chat_metrics = ChatMetrics()
@@ -0,0 +1,71 @@
+"""Escalation checks for running SQL and summarizer stages on a cheaper model first"""
+import re
+from typing import Any, Dict, Optional
+
+from .media_utils import extract_image_urls_from_text, find_media_ids
+
+FAST_TIER = "fast"
+LARGE_TIER = "large"
+
+# AgentExecutor's answer when it runs out of iterations
+ITERATION_LIMIT_OUTPUT = "Agent stopped due to iteration limit or time limit."
+
+GIVE_UP_PATTERN = re.compile(
+    r"\b(i (?:don'?t|do not) know|i (?:couldn'?t|could not|can'?t|cannot|was unable to|am unable to))\b",
+    re.IGNORECASE,
+)
+MARKDOWN_IMAGE_PATTERN = re.compile(r'!\[[^\]]*\]\(([^)]+)\)')
+DOUBLE_WRAPPED_IMAGE = re.compile(r'!\[[^\]]*\]\(\s*!\[')
+
+
+def validate_answer(text: str) -> Optional[str]:
+    """Return why an answer looks unusable, or None if it passes."""
+    if not text or not text.strip():
+        return "empty_answer"
+    if ITERATION_LIMIT_OUTPUT in text:
+        return "iteration_limit"
+    if GIVE_UP_PATTERN.search(text):
+        return "gave_up"
+    return None
+
+
+def sql_escalation_reason(result: Dict[str, Any]) -> Optional[str]:
+    """
+    Decide whether a fast-tier SQL agent run must be retried on the large model.
+
+    Args:
+        result: AgentExecutor output with intermediate_steps
+
+    Returns:
+        'tool_error', 'empty_result' or an answer validation reason; None to keep the result
+    """
+    steps = result.get("intermediate_steps") or []
+    for _action, observation in steps:
+        if str(observation).startswith("Error"):
+            return "tool_error"
+
+    query_results = [str(obs).strip() for action, obs in steps if action.tool == "sql_db_query"]
+    if query_results and all(obs in ("", "[]") for obs in query_results):
+        return "empty_result"
+
+    return validate_answer(result.get("output", ""))
+
+
+def summary_escalation_reason(summary: str, source: str) -> Optional[str]:
+    """
+    Decide whether a fast-tier summary must be regenerated on the large model.
+
+    A summary fails if it is unusable, double-wraps markdown images, or drops
+    every image (URL or [[media:N]] reference) the workers found.
+    """
+    reason = validate_answer(summary)
+    if reason:
+        return reason
+    if DOUBLE_WRAPPED_IMAGE.search(summary):
+        return "double_wrapped_image"
+
+    source_urls = set(MARKDOWN_IMAGE_PATTERN.findall(source)) | set(extract_image_urls_from_text(source))
+    source_urls |= {f"[[media:{media_id}]]" for media_id in find_media_ids(source)}
+    if source_urls and not any(url in summary for url in source_urls):
+        return "dropped_images"
+    return None
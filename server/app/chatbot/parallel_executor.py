@@ -0,0 +1,109 @@
+"""AgentExecutor mode that runs the tool calls of one agent step concurrently"""
+import asyncio
+import functools
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from langchain.agents import AgentExecutor
+from langchain_core.agents import AgentAction, AgentFinish, AgentStep
+from langchain_core.tools import BaseTool, StructuredTool, Tool
+
+from config.config import settings
+
+# Shared by every parallel executor so concurrent requests can't oversubscribe threads
+_tool_pool = ThreadPoolExecutor(max_workers=settings.AGENT_TOOL_WORKERS, thread_name_prefix="agent-tool")
+
+
+def _has_native_async(tool: BaseTool) -> bool:
+  """True if the tool implements _arun itself instead of deferring to a thread."""
+  if isinstance(tool, (Tool, StructuredTool)):
+    return tool.coroutine is not None
+  return type(tool)._arun is not BaseTool._arun
+
+
+class _PrefetchedTools(dict):
+  """Tool map of one agent step, with the tool calls already running for its actions."""
+
+  def __init__(self, tools: Dict[str, BaseTool]):
+    super().__init__(tools)
+    self.pending: Dict[int, Future] = {}
+
+
+class ParallelAgentExecutor(AgentExecutor):
+  """AgentExecutor that dispatches independent tool calls from the same step concurrently.
+
+  openai-tools agents can return several tool calls in one model turn; the
+  stock executor runs them one after another. Here sync execution fans them
+  out to a bounded thread pool and async execution gathers them on the loop
+  (sync-only tools go to the same pool). Observations are always returned in
+  the order the model issued the calls.
+  """
+
+  @classmethod
+  def from_executor(cls, executor: AgentExecutor) -> "ParallelAgentExecutor":
+    """Rebuild an existing executor (e.g. from create_sql_agent) in parallel mode."""
+    return cls(**{name: getattr(executor, name) for name in executor.__fields__})
+
+  def _iter_next_step(
+    self,
+    name_to_tool_map: Dict[str, BaseTool],
+    color_mapping: Dict[str, str],
+    inputs: Dict[str, str],
+    intermediate_steps: List[Tuple[AgentAction, str]],
+    run_manager=None,
+  ) -> Iterator[Union[AgentFinish, AgentAction, AgentStep]]:
+    # The stock step yields every action of the model turn before performing the first one, so
+    # each call starts in the pool as its action goes by; _perform_agent_action then waits on it
+    tools = _PrefetchedTools(name_to_tool_map)
+    perform = super()._perform_agent_action
+    for step in super()._iter_next_step(tools, color_mapping, inputs, intermediate_steps, run_manager):
+      if isinstance(step, AgentAction):
+        tools.pending[id(step)] = _tool_pool.submit(
+          copy_context().run, perform, name_to_tool_map, color_mapping, step, run_manager
+        )
+      yield step
+
+  def _perform_agent_action(
+    self,
+    name_to_tool_map: Dict[str, BaseTool],
+    color_mapping: Dict[str, str],
+    agent_action: AgentAction,
+    run_manager=None,
+  ) -> AgentStep:
+    # Called by the stock step in issue order, so observations line up with the model's tool calls
+    pending = getattr(name_to_tool_map, "pending", {}).pop(id(agent_action), None)
+    if pending is not None:
+      return pending.result()
+    return super()._perform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager)
+
+  async def _aperform_agent_action(
+    self,
+    name_to_tool_map: Dict[str, BaseTool],
+    color_mapping: Dict[str, str],
+    agent_action: AgentAction,
+    run_manager=None,
+  ) -> AgentStep:
+    # AgentExecutor._aiter_next_step already gathers these; only reroute sync-only tools
+    # (unknown tool names get the stock InvalidTool observation, which is async)
+    tool = name_to_tool_map.get(agent_action.tool)
+    if tool is None or _has_native_async(tool):
+      return await super()._aperform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager)
+
+    if run_manager:
+      await run_manager.on_agent_action(agent_action, verbose=self.verbose, color="green")
+    tool_run_kwargs = self.agent.tool_run_logging_kwargs()
+    if tool.return_direct:
+      tool_run_kwargs["llm_prefix"] = ""
+
+    run_tool = functools.partial(
+      tool.run,
+      agent_action.tool_input,
+      verbose=self.verbose,
+      color=color_mapping[agent_action.tool],
+      # Tracing and CancelOnEvent see the tool run like in the stock method
+      callbacks=run_manager.get_child() if run_manager else None,
+      **tool_run_kwargs,
+    )
+    observation = await asyncio.get_running_loop().run_in_executor(_tool_pool, copy_context().run, run_tool)
+    return AgentStep(action=agent_action, observation=observation)
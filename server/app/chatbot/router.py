@@ -1,22 +1,47 @@
-from fastapi import APIRouter, Query
+import asyncio
+import logging
+import threading
+
+import json
+
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List, Dict
+from typing import Any, Optional, List, Dict
+
+from config.config import settings
 
 from .service import ChatBotService
+from .session import ChatSession
+from .metrics import chat_metrics
 
 chat_bot_router = APIRouter(prefix="/chat-bot", tags=["chat-bot"])
 
 chat_bot_service = ChatBotService()  # Create an instance of ChatBotService
 
+logger = logging.getLogger(__name__)
+
 class AskRequest(BaseModel):
     question: str
     user_id: Optional[int] = None
     include_images: Optional[bool] = True  # New field for image metadata
     chat_history: Optional[List[Dict[str, str]]] = []  # Chat history for context
 
+class BatchAskItem(BaseModel):
+    question: str
+    user_id: Optional[int] = None
+
+class BatchAskRequest(BaseModel):
+    items: List[BatchAskItem]
+    include_images: Optional[bool] = False
+    concurrency: Optional[int] = None  # Capped at BATCH_ASK_CONCURRENCY
+
 class ImageMetadata(BaseModel):
     url: str
     alt: str
+    media_id: Optional[int] = None
+    # Smaller variant for previews; url stays the full-size image
+    thumbnail_url: Optional[str] = None
 
 class ChatResponse(BaseModel):
     text: str
@@ -68,4 +93,132 @@ async def ask_question_simple(request: AskRequest):
   
   return {"response": result.get("response", result.get("text", "")), "user_id": user_id}
 
+@chat_bot_router.post("/ask/batch")
+async def ask_question_batch(request: BatchAskRequest):
+  """
+  Ask many independent questions in one request (analytics and notification jobs).
+  
+  Questions run concurrently, bounded by BATCH_ASK_CONCURRENCY, and share the
+  classifier and the SQL agents (built once per table subset, with its schema
+  description in the prompt); identical (user_id, question) items are answered
+  once. Results stream back as NDJSON, one line per item as soon as it
+  completes (not in request order):
+  
+  {"index": 0, "user_id": 1, "question": "...", "response": "...", "response_time_ms": 812.4}
+  
+  A failed item produces a line with an "error" field instead of "response".
+  """
+  if len(request.items) > settings.BATCH_ASK_MAX_ITEMS:
+    raise HTTPException(status_code=413, detail=f"Batch is limited to {settings.BATCH_ASK_MAX_ITEMS} items")
+  
+  concurrency = min(request.concurrency or settings.BATCH_ASK_CONCURRENCY, settings.BATCH_ASK_CONCURRENCY)
+  items = [(item.user_id if item.user_id is not None else 1, item.question) for item in request.items]
+  
+  async def ndjson():
+    async for result in chat_bot_service.ask_batch(items, include_image_metadata=request.include_images, concurrency=max(concurrency, 1)):
+      yield json.dumps(result) + "\n"
+  
+  return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+async def _answer_over_websocket(websocket: WebSocket, session: ChatSession, question_id: int, question: str, include_images: bool, cancel_event: threading.Event):
+  """Stream one question's events to the client, tagged with its question_id."""
+  try:
+    async for event in chat_bot_service.stream_question(session, question, include_image_metadata=include_images, cancel_event=cancel_event):
+      await websocket.send_json({**event, "question_id": question_id})
+  except asyncio.CancelledError:
+    await websocket.send_json({"type": "cancelled", "question_id": question_id})
+    raise
+  except Exception as e:
+    logger.error(f"WebSocket question {question_id} failed for user {session.user_id}: {str(e)}")
+    await websocket.send_json({"type": "error", "question_id": question_id, "detail": "Internal Server Error"})
+
+@chat_bot_router.websocket("/ws")
+async def chat_websocket(websocket: WebSocket, user_id: int = 1):
+  """
+  Chat over a persistent connection.
+  
+  The connection keeps the conversation, the user context profile and the
+  SQL result cache in memory, so follow-up questions skip rebuilding them.
+  
+  Client messages:
+  - {"question": "...", "include_images": true}: ask; cancels any question still running
+  - {"type": "cancel"}: cancel the running question
+  
+  Cancelling stops the graph run at its next LLM, tool or chain start, in the
+  worker threads too; an LLM call or SQL query already in flight still finishes.
+  
+  Server messages (all but "session" carry question_id):
+  - {"type": "session", "user_id", "profile"} once after connecting
+  - {"type": "step", "node"} as each graph node finishes
+  - {"type": "partial", "agent", "text"} for each worker answer before summarization
+  - {"type": "answer", "text", "images", "has_images", "response_time_ms"}
+  - {"type": "cancelled"} / {"type": "error", "detail"} (no question_id for malformed messages)
+  """
+  await websocket.accept()
+  session = ChatSession(user_id)
+  await session.load_profile()
+  await websocket.send_json({"type": "session", "user_id": user_id, "profile": session.profile})
+  
+  current: Optional[asyncio.Task] = None
+  cancel_event = threading.Event()
+  try:
+    while True:
+      message = await _receive_message(websocket)
+      if not isinstance(message, dict):
+        await websocket.send_json({"type": "error", "detail": "Messages must be JSON objects sent as text frames"})
+        continue
+      
+      # A new question (or an explicit cancel) abandons the one in flight
+      _cancel(current, cancel_event)
+      if message.get("type") == "cancel" or not message.get("question"):
+        continue
+      
+      cancel_event = threading.Event()
+      current = asyncio.create_task(_answer_over_websocket(
+        websocket,
+        session,
+        session.next_question_id(),
+        message["question"],
+        message.get("include_images", True),
+        cancel_event,
+      ))
+  except WebSocketDisconnect:
+    logger.info(f"WebSocket closed for user {user_id}")
+  finally:
+    _cancel(current, cancel_event)
+
+async def _receive_message(websocket: WebSocket) -> Any:
+  """Next client message parsed as JSON, or None for a binary frame or invalid JSON."""
+  message = await websocket.receive()
+  if message["type"] == "websocket.disconnect":
+    raise WebSocketDisconnect(message.get("code", 1000))
+  if message.get("text") is None:
+    return None
+  try:
+    return json.loads(message["text"])
+  except ValueError:
+    return None
+
+def _cancel(current: Optional[asyncio.Task], cancel_event: threading.Event) -> None:
+  """Cancel a running question: the task, and through the event the graph work in its threads."""
+  if current is not None and not current.done():
+    cancel_event.set()
+    current.cancel()
+
+@chat_bot_router.get("/metrics")
+async def get_metrics():
+  """
+  Pipeline counters and timings since process start.
+  
+  Includes which model tier answered each stage (tier.<stage>.<tier>),
+  why fast-tier results were escalated (escalation.<stage>.<reason>),
+  and per-tier latency (latency_ms.<stage>.<tier>). Speculative routing reports
+  speculation.hit/miss, speculation.saved_ms and the derived speculation_hit_rate.
+  """
+  snapshot = chat_metrics.snapshot()
+  counters = snapshot["counters"]
+  resolved = counters.get("speculation.hit", 0) + counters.get("speculation.miss", 0)
+  snapshot["speculation_hit_rate"] = round(counters.get("speculation.hit", 0) / resolved, 3) if resolved else None
+  return snapshot
+
 __all__ = ["chat_bot_router"]
@@ -0,0 +1,169 @@
+"""Question-driven table selection for the SQL agent"""
+import re
+import logging
+from typing import Dict, List, Set
+
+from sqlalchemy import inspect
+
+from config.db import Base
+# Import models to register them with SQLAlchemy metadata
+from app.User.model import User
+from app.Post.model import Post
+from app.Media.model import Media
+from app.Timeline.model import Timeline
+from app.Follow.model import Follow
+from app.Places.model import Place
+
+logger = logging.getLogger(__name__)
+
+# Tables the SQL agent may see (plus FEED_VIEW). Anything else in the metadata is internal
+# bookkeeping (media_hashes, media_jobs, ...) and never reaches the agent
+AGENT_TABLES = ("users", "posts", "media", "places", "follow", "timelines")
+
+# Column words that say nothing about which table a question is about
+GENERIC_WORDS = {"id", "url", "meta", "start", "end", "external", "resource", "source", "destination"}
+
+# Everyday words users type that never appear in the model definitions
+SYNONYMS = {
+    "users": ["who", "people", "person", "profile", "bio", "avatar", "me", "my", "someone", "everyone"],
+    "posts": ["caption", "posted", "shared", "feed", "content"],
+    "media": ["photo", "image", "picture", "pic", "tag", "portrait"],
+    "follow": ["follower", "following", "friend", "connection"],
+    "places": ["place", "location", "where", "visit", "visited", "spot", "category", "address"],
+    "timelines": ["trip", "went", "been", "visit", "visited", "history", "activity"],
+}
+
+# Links the foreign keys don't express (timelines.places_id is a JSON array of place ids)
+IMPLICIT_REFERENCES = {
+    "timelines": ["places"],
+}
+
+# Denormalized posts + users + media view (migration 010); primary source for post/image questions
+FEED_VIEW = "post_feed"
+FEED_SOURCES = {"posts", "media"}
+
+# Prompt descriptions of the live schema (models omit columns added by later migrations)
+TABLE_SCHEMAS = {
+    FEED_VIEW: "post_feed view (USE FIRST for posts and images, one row per post, indexed on user_id and created_at): post_id, user_id, author_name, author_avatar_url, caption, created_at, updated_at, media_id, media_url, tags (text array)",
+    "users": "users table: id, name, email, phone, latitude, longitude, bio, avatar_url",
+    "posts": "posts table: id, user_id, media_id, caption, created_at, updated_at",
+    "media": "media table: id, external_resource_url (image URLs), meta (JSON with tags, width, height)",
+    "places": "places table: id, title, category, description, address, latitude, longitude",
+    "follow": "follow table: id, source_user_id (the follower), destination_user_id (the followed user), created_at",
+    "timelines": "timelines table: id, user_id, start_timestamp, end_timestamp, places_id (JSON array of place ids)",
+}
+
+
+def _singular(word: str) -> str:
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _agent_tables():
+    return [table for table in Base.metadata.sorted_tables if table.name in AGENT_TABLES]
+
+
+def _build_keyword_map() -> Dict[str, Set[str]]:
+    """Map keywords to table names from table, column and relationship names."""
+    keyword_map: Dict[str, Set[str]] = {}
+
+    def add(word: str, table: str) -> None:
+        word = _singular(word.lower())
+        if word and word not in GENERIC_WORDS:
+            keyword_map.setdefault(word, set()).add(table)
+
+    for table in _agent_tables():
+        add(table.name, table.name)
+        for column in table.columns:
+            if column.foreign_keys or column.name.endswith("_id"):
+                continue
+            for part in column.name.split("_"):
+                add(part, table.name)
+
+    for mapper in Base.registry.mappers:
+        for relationship in inspect(mapper).relationships:
+            target = relationship.mapper.local_table.name
+            if target not in AGENT_TABLES:
+                continue
+            for part in relationship.key.split("_"):
+                add(part, target)
+
+    for table, words in SYNONYMS.items():
+        for word in words:
+            add(word, table)
+
+    return keyword_map
+
+
+def _build_references() -> Dict[str, Set[str]]:
+    """Tables each table points at through foreign keys (plus implicit links)."""
+    references: Dict[str, Set[str]] = {}
+    for table in _agent_tables():
+        refs = references.setdefault(table.name, set())
+        for fk in table.foreign_keys:
+            if fk.column.table.name != table.name and fk.column.table.name in AGENT_TABLES:
+                refs.add(fk.column.table.name)
+    for table, targets in IMPLICIT_REFERENCES.items():
+        references.setdefault(table, set()).update(targets)
+    return references
+
+
+KEYWORD_MAP = _build_keyword_map()
+REFERENCES = _build_references()
+ALL_TABLES = sorted(AGENT_TABLES + (FEED_VIEW,))
+
+
+def match_tables(question: str) -> Set[str]:
+    """Tables whose keywords appear in the question (no neighbours, no fallback)."""
+    matched: Set[str] = set()
+    for token in re.findall(r"[a-z]+", question.lower()):
+        matched.update(KEYWORD_MAP.get(_singular(token), ()))
+    return matched
+
+
+def select_tables(question: str) -> List[str]:
+    """
+    Pick the tables a question needs, plus their foreign-key neighbours.
+
+    Neighbours are the tables a selected table references, and bridge
+    tables that reference two or more selected tables (e.g. posts joins
+    users and media).
+
+    Args:
+        question: User question
+
+    Returns:
+        Sorted table names; every table when no keyword matches
+    """
+    selected = match_tables(question)
+    if not selected:
+        return list(ALL_TABLES)
+
+    bridges = {t for t, refs in REFERENCES.items() if t not in selected and len(refs & selected) >= 2}
+    selected |= bridges
+
+    for table in list(selected):
+        selected.update(REFERENCES.get(table, ()))
+
+    if selected & FEED_SOURCES:
+        selected.add(FEED_VIEW)
+
+    return sorted(selected)
+
+
+def describe_tables(tables: List[str]) -> str:
+    """Schema lines for the selected tables, for the agent prompt (post_feed first)."""
+    ordered = sorted(tables, key=lambda t: t != FEED_VIEW)
+    return "\n".join(f"- {TABLE_SCHEMAS[t]}" for t in ordered if t in TABLE_SCHEMAS)
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate prompt token count (tiktoken when available, else chars/4)."""
+    try:
+        import tiktoken
+        return len(tiktoken.get_encoding("cl100k_base").encode(text))
+    except Exception:
+        return len(text) // 4
@@ -1,7 +1,14 @@
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+import asyncio
 import logging
+import threading
+import time
+from config.config import settings
 from .graph import GraphService
-from .media_utils import format_response_with_images
+from .media_refs import media_resolver
+from .media_utils import ResponsePostProcessor, find_media_ids, format_response_with_images
+from .metrics import chat_metrics
+from .session import ChatSession
 
 logger = logging.getLogger(__name__)
 
@@ -40,19 +47,144 @@ class ChatBotService:
       response_time = time.time() - start_time
       logger.info(f"Question processed in {response_time:.2f}s for user {user_id}")
       
-      if include_image_metadata:
-        # Return structured response with separate image array for frontend
-        result = format_response_with_images(output, convert_urls=True)
-        result['response_time_ms'] = round(response_time * 1000, 2)
-        return result
-      else:
-        # Return simple text response (backward compatible)
-        return {
-          "response": output,
-          "response_time_ms": round(response_time * 1000, 2)
-        }
+      # Structured response with separate image array for frontend, or simple text (backward compatible)
+      result = await self._format_answer(output, include_image_metadata)
+      result['response_time_ms'] = round(response_time * 1000, 2)
+      return result
     except Exception as e:
       logger.error(f"Error processing question for user {user_id}: {str(e)}")
       raise
 
+  async def stream_question(self, session: ChatSession, question: str, include_image_metadata: bool = True, cancel_event: Optional[threading.Event] = None) -> AsyncIterator[dict]:
+    """Answer a question within a WebSocket session, yielding progress events.
+    
+    Reuses the session's conversation, user context profile and SQL result
+    cache instead of rebuilding them for every question.
+    
+    Args:
+      session: Per-connection chat state
+      question: User's question
+      include_image_metadata: If True, the final answer carries a separate image array
+      cancel_event: Set it to stop the graph run, including the LLM and SQL work in its threads
+      
+    Yields:
+      Graph 'step' and 'partial' events, then one 'answer' event
+    """
+    logger.info(f"Streaming question for user {session.user_id}: {question[:50]}...")
+    start_time = time.time()
+    results = []
+    
+    async for event in self.graphService.stream(
+      question,
+      session.user_id,
+      session.history,
+      cached_data=session.cached_data,
+      user_profile=session.profile_text,
+      cancel_event=cancel_event,
+    ):
+      if event["type"] == "partial":
+        results.append({"agent": event["agent"], "text": event["text"]})
+        # Same reference expansion and host rewrite as the final answer so clients can render partial images
+        text = await self._expand_media_refs(event["text"])
+        event = {**event, "text": ResponsePostProcessor().process(text)}
+      if event["type"] != "answer":
+        yield event
+        continue
+      
+      output = event["text"]
+      response_time = time.time() - start_time
+      logger.info(f"Question streamed in {response_time:.2f}s for user {session.user_id}")
+      session.record(question, output, results)
+      
+      answer = await self._format_answer(output, include_image_metadata, text_key="text")
+      answer["type"] = "answer"
+      answer["response_time_ms"] = round(response_time * 1000, 2)
+      yield answer
 
+  async def ask_batch(self, items: List[Tuple[int, str]], include_image_metadata: bool = False, concurrency: Optional[int] = None) -> AsyncIterator[dict]:
+    """Answer many independent questions concurrently, yielding each result as it completes.
+    
+    Identical (user_id, question) pairs are answered once. The classifier and
+    the SQL agents (one per table subset) are shared through the GraphService
+    instance; a failing item (including formatting its answer) only fails that item.
+    
+    Args:
+      items: (user_id, question) pairs
+      include_image_metadata: If True, each result carries a separate image array
+      concurrency: Max questions in flight (defaults to BATCH_ASK_CONCURRENCY)
+      
+    Yields:
+      One result dict per item, tagged with its index in `items`, in completion order
+    """
+    limit = asyncio.Semaphore(concurrency or settings.BATCH_ASK_CONCURRENCY)
+    
+    # Duplicate questions (e.g. the same digest question per user) run once
+    indexes_by_item: Dict[Tuple[int, str], List[int]] = {}
+    for index, item in enumerate(items):
+      indexes_by_item.setdefault(item, []).append(index)
+    
+    logger.info(f"Processing batch of {len(items)} questions ({len(indexes_by_item)} unique)")
+    chat_metrics.increment("batch.items", len(items))
+    
+    async def answer(item: Tuple[int, str]) -> Tuple[Tuple[int, str], dict]:
+      user_id, question = item
+      async with limit:
+        start_time = time.time()
+        try:
+          output = await self.graphService.invoke(question, user_id)
+          response_time = time.time() - start_time
+          result = await self._format_answer(output, include_image_metadata)
+        except Exception as e:
+          logger.error(f"Batch question failed for user {user_id}: {str(e)}")
+          chat_metrics.increment("batch.errors")
+          return item, {"error": "Internal Server Error"}
+      
+      result['response_time_ms'] = round(response_time * 1000, 2)
+      return item, result
+    
+    tasks = [asyncio.create_task(answer(item)) for item in indexes_by_item]
+    try:
+      for next_done in asyncio.as_completed(tasks):
+        (user_id, question), result = await next_done
+        for index in indexes_by_item[(user_id, question)]:
+          yield {"index": index, "user_id": user_id, "question": question, **result}
+    finally:
+      # Client went away or the stream was closed early: stop the remaining work
+      for task in tasks:
+        task.cancel()
+
+  async def _expand_media_refs(self, output: str) -> str:
+    """Replace [[media:N]] references in an answer with markdown images."""
+    text, _ = await self._resolve_media_refs(output)
+    return text
+
+  async def _resolve_media_refs(self, output: str) -> Tuple[str, List[Dict]]:
+    if not find_media_ids(output):
+      return output, []
+    # One bulk (usually cached) media lookup; keep the DB call off the event loop
+    return await asyncio.to_thread(media_resolver.expand, output)
+
+  async def _format_answer(self, output: str, include_image_metadata: bool, text_key: str = "response") -> dict:
+    """Expand media references and shape the answer for the client.
+    
+    Args:
+      output: Final graph answer
+      include_image_metadata: If True, returns text plus a separate image array
+      text_key: Key for the plain text answer when image metadata is off
+      
+    Returns:
+      format_response_with_images() result, or {text_key: text}
+    """
+    text, media_images = await self._resolve_media_refs(output)
+    if not include_image_metadata:
+      return {text_key: text}
+    
+    result = format_response_with_images(text, convert_urls=True)
+    # Images that came from a reference also carry their media id and thumbnail
+    by_url = {image["url"]: image for image in media_images}
+    for image in result["images"]:
+      media_image = by_url.get(image["url"])
+      if media_image:
+        image["media_id"] = media_image["media_id"]
+        image["thumbnail_url"] = media_image["thumbnail_url"]
+    return result
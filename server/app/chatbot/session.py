@@ -0,0 +1,68 @@
+"""Per-connection chat state for the WebSocket endpoint"""
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from .user_context import user_context_service
+
+# Same window the chat-app sends with each HTTP request
+HISTORY_LIMIT = 10
+
+
+class RunCancelled(Exception):
+  """Raised inside a graph run whose question was cancelled."""
+
+
+class CancelOnEvent(BaseCallbackHandler):
+  """
+  Stops a graph run once its event is set.
+  
+  Graph nodes run LLM calls and tools in worker threads, which cancelling the
+  asyncio task doesn't reach. Passed as a run callback, this raises RunCancelled
+  at the next chain, LLM or tool start in any of them; a call already in flight
+  still finishes.
+  """
+  raise_error = True
+
+  def __init__(self, event: threading.Event):
+    self.event = event
+
+  def _check(self, *args, **kwargs) -> None:
+    if self.event.is_set():
+      raise RunCancelled()
+
+  on_chain_start = on_llm_start = on_chat_model_start = on_tool_start = _check
+
+
+class ChatSession:
+  """Conversation state kept in memory for the lifetime of one WebSocket connection."""
+
+  def __init__(self, user_id: int, history_limit: int = HISTORY_LIMIT):
+    self.user_id = user_id
+    self.history_limit = history_limit
+    self.history: List[Dict[str, str]] = []
+    # SQL answers keyed by question; survives across questions on this connection
+    self.cached_data: Dict[str, Any] = {}
+    self.profile: Optional[Dict[str, Any]] = None
+    self.profile_text: Optional[str] = None
+    # Worker answers behind the most recent response
+    self.last_results: List[Dict[str, str]] = []
+    self.question_count = 0
+
+  async def load_profile(self) -> None:
+    """Fetch the user context profile once per connection."""
+    self.profile = await asyncio.to_thread(user_context_service.get_profile, self.user_id)
+    self.profile_text = user_context_service.render(self.user_id) if self.profile else ""
+
+  def next_question_id(self) -> int:
+    self.question_count += 1
+    return self.question_count
+
+  def record(self, question: str, answer: str, results: List[Dict[str, str]]) -> None:
+    """Append a finished exchange to the conversation."""
+    self.history.append({"role": "user", "content": question})
+    self.history.append({"role": "assistant", "content": answer})
+    self.history = self.history[-self.history_limit:]
+    self.last_results = results
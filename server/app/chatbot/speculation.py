@@ -0,0 +1,67 @@
+"""Speculative worker start while the classifier is still running"""
+import asyncio
+import re
+import time
+import logging
+from typing import List
+
+from .metrics import chat_metrics
+from .schema_selector import match_tables
+
+logger = logging.getLogger(__name__)
+
+RECOMMEND_PATTERN = re.compile(r"\b(recommend\w*|suggest\w*|should i|where should|what should|ideas? for)\b")
+GREETING_PATTERN = re.compile(r"^\s*(hi|hello|hey|thanks|thank you|good (morning|afternoon|evening))\b")
+ASSISTANT_PATTERN = re.compile(r"\b(weather|news|search|calculate|convert|explain)\b|\d+\s*[-+*/^]\s*\d+")
+
+
+def local_prior(query: str) -> str:
+    """
+    Guess the classifier's route without an LLM call.
+
+    Mirrors the classifier categories: recommendation phrasing goes to
+    Recommender, greetings/maths/web lookups to Assistant, anything that
+    mentions app data to SQL.
+    """
+    q = query.lower()
+    if RECOMMEND_PATTERN.search(q):
+        return "Recommender"
+    if GREETING_PATTERN.search(q) or ASSISTANT_PATTERN.search(q):
+        return "Assistant"
+    if match_tables(q):
+        return "SQL"
+    return "Assistant"
+
+
+class Speculation:
+    """A worker started on the local prior before the classifier has picked the route."""
+
+    def __init__(self, agent: str, query: str, tables: List[str], task: asyncio.Task):
+        self.agent = agent
+        self.query = query
+        self.tables = tables
+        self.task = task
+        self.started_at = time.perf_counter()
+        # Retrieve the result/exception so cancelled or failed runs don't log "never retrieved"
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        chat_metrics.increment("speculation.started")
+
+    def usable_for(self, query: str) -> bool:
+        return query == self.query and not self.task.cancelled()
+
+    def resolve(self, classified_agent: str, classify_ms: float) -> None:
+        """Keep the speculative run if the classifier agrees, otherwise cancel it."""
+        if classified_agent == self.agent:
+            # The worker ran during the classifier call instead of after it
+            overlap_ms = min(classify_ms, (time.perf_counter() - self.started_at) * 1000)
+            chat_metrics.increment("speculation.hit")
+            chat_metrics.observe("speculation.saved_ms", overlap_ms)
+            logger.info(f"Speculation hit ({self.agent}), saved ~{overlap_ms:.0f}ms")
+        else:
+            chat_metrics.increment("speculation.miss")
+            logger.info(f"Speculation miss: guessed {self.agent}, classifier chose {classified_agent}")
+            self.cancel()
+
+    def cancel(self) -> None:
+        if not self.task.done():
+            self.task.cancel()
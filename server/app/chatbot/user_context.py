@@ -0,0 +1,203 @@
+"""Pre-computed per-user context profiles for agent prompts"""
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+
+from config.db import engine
+from app.common.commit_hooks import on_commit
+from app.User.model import User
+from app.Post.model import Post
+from app.Media.model import Media
+from app.Follow.model import Follow
+from app.Timeline.model import Timeline
+
+logger = logging.getLogger(__name__)
+
+# Profiles are invalidated on committed ORM writes; the TTL covers raw SQL writes (migrations, psql)
+PROFILE_TTL_SECONDS = 300
+TOP_TAGS_LIMIT = 5
+RECENT_PLACES_LIMIT = 5
+RECENT_TIMELINES_LIMIT = 10
+# Invalidation key standing for every cached profile
+ALL_USERS = "*"
+
+
+class UserContextService:
+  """Builds a compact profile per user and caches it until the user's rows change."""
+
+  def __init__(self, ttl_seconds: int = PROFILE_TTL_SECONDS):
+    self.ttl_seconds = ttl_seconds
+    self._profiles: Dict[int, tuple] = {}
+    # Bumped by invalidate/invalidate_all, so a load that raced an invalidation isn't cached
+    self._generations: Dict[int, int] = {}
+    self._epoch = 0
+    self._lock = threading.Lock()
+
+  def get_profile(self, user_id: int) -> Optional[Dict[str, Any]]:
+    """Return the cached profile for a user, loading it on a miss.
+
+    Args:
+      user_id: User identifier
+
+    Returns:
+      Profile dict, or None if the user does not exist or loading failed
+    """
+    now = time.monotonic()
+    with self._lock:
+      entry = self._profiles.get(user_id)
+      generation = (self._epoch, self._generations.get(user_id, 0))
+    if entry is not None and now - entry[0] < self.ttl_seconds:
+      return entry[1]
+
+    try:
+      profile = self._load_profile(user_id)
+    except Exception as e:
+      logger.warning(f"Could not load context profile for user {user_id}: {e}")
+      return None
+
+    with self._lock:
+      if (self._epoch, self._generations.get(user_id, 0)) == generation:
+        self._profiles[user_id] = (now, profile)
+    return profile
+
+  def render(self, user_id: int) -> str:
+    """Render a user's profile as a short prompt block ('' if unavailable)."""
+    profile = self.get_profile(user_id)
+    if not profile:
+      return ""
+
+    parts = [f"name={profile['name']}"]
+    if profile.get('location'):
+      parts.append(f"location=(lat {profile['location'][0]}, lon {profile['location'][1]})")
+    if profile.get('bio'):
+      parts.append(f"bio={profile['bio']}")
+    parts.append(f"following={profile['following_count']}")
+    parts.append(f"followers={profile['follower_count']}")
+    parts.append(f"posts={profile['post_count']}")
+    if profile.get('top_tags'):
+      parts.append(f"top media tags={', '.join(profile['top_tags'])}")
+    if profile.get('recent_places'):
+      parts.append(f"recent places={', '.join(profile['recent_places'])}")
+
+    return f"User profile (user {user_id}): " + "; ".join(parts)
+
+  def invalidate(self, user_id: Optional[int]) -> None:
+    """Drop the cached profile for a user."""
+    if user_id is None:
+      return
+    with self._lock:
+      self._profiles.pop(user_id, None)
+      self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+  def invalidate_all(self) -> None:
+    """Drop every cached profile."""
+    with self._lock:
+      self._profiles.clear()
+      self._epoch += 1
+
+  def _load_profile(self, user_id: int) -> Optional[Dict[str, Any]]:
+    """Query the profile fields for a single user."""
+    with engine.connect() as conn:
+      user = conn.execute(
+        text("SELECT id, name, latitude, longitude, bio FROM users WHERE id = :uid"),
+        {"uid": user_id}
+      ).first()
+      if user is None:
+        return None
+
+      counts = conn.execute(
+        text(
+          "SELECT "
+          "(SELECT COUNT(*) FROM follow WHERE source_user_id = :uid) AS following_count, "
+          "(SELECT COUNT(*) FROM follow WHERE destination_user_id = :uid) AS follower_count, "
+          "(SELECT COUNT(*) FROM posts WHERE user_id = :uid) AS post_count"
+        ),
+        {"uid": user_id}
+      ).first()
+
+      top_tags = conn.execute(
+        text(
+          "SELECT tag, COUNT(*) AS n "
+          "FROM posts p JOIN media m ON m.id = p.media_id, "
+          "json_array_elements_text(m.meta -> 'tags') AS tag "
+          "WHERE p.user_id = :uid "
+          "GROUP BY tag ORDER BY n DESC, tag LIMIT :limit"
+        ),
+        {"uid": user_id, "limit": TOP_TAGS_LIMIT}
+      ).all()
+
+      timelines = conn.execute(
+        text(
+          "SELECT places_id FROM timelines WHERE user_id = :uid "
+          "ORDER BY end_timestamp DESC NULLS LAST LIMIT :limit"
+        ),
+        {"uid": user_id, "limit": RECENT_TIMELINES_LIMIT}
+      ).all()
+
+      place_ids = _recent_place_ids([row[0] for row in timelines], RECENT_PLACES_LIMIT)
+      recent_places = []
+      if place_ids:
+        titles = dict(conn.execute(
+          text("SELECT id, title FROM places WHERE id = ANY(:ids)"),
+          {"ids": place_ids}
+        ).all())
+        recent_places = [titles[pid] for pid in place_ids if titles.get(pid)]
+
+    location = None
+    if user.latitude is not None and user.longitude is not None:
+      location = (user.latitude, user.longitude)
+
+    return {
+      "id": user.id,
+      "name": user.name,
+      "location": location,
+      "bio": user.bio,
+      "following_count": counts.following_count,
+      "follower_count": counts.follower_count,
+      "post_count": counts.post_count,
+      "top_tags": [row[0] for row in top_tags],
+      "recent_places": recent_places,
+    }
+
+
+def _recent_place_ids(places_columns: List[Any], limit: int) -> List[int]:
+  """Flatten timelines.places_id arrays (newest first) into distinct place ids."""
+  seen = []
+  for places in places_columns:
+    for pid in places or []:
+      try:
+        pid = int(pid)
+      except (TypeError, ValueError):
+        continue
+      if pid not in seen:
+        seen.append(pid)
+        if len(seen) >= limit:
+          return seen
+  return seen
+
+
+def register_invalidation_listeners(service: UserContextService) -> None:
+  """Invalidate cached profiles once the ORM commits writes to rows they depend on."""
+  def _apply(user_ids):
+    if ALL_USERS in user_ids:
+      service.invalidate_all()
+      return
+    for user_id in user_ids:
+      service.invalidate(user_id)
+
+  on_commit({
+    User: lambda user: [user.id],
+    Post: lambda post: [post.user_id],
+    Timeline: lambda timeline: [timeline.user_id],
+    Follow: lambda follow: [follow.source_user_id, follow.destination_user_id],
+    # Tags feed every profile whose posts use this media; media writes are rare
+    Media: lambda media: [ALL_USERS],
+  }, _apply)
+
+
+# Singleton instance
+user_context_service = UserContextService()
+register_invalidation_listeners(user_context_service)
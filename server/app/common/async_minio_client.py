@@ -0,0 +1,288 @@
+"""Async MinIO access: pooled boto3 connections driven from a bounded thread pool"""
+import asyncio
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.client import Config
+from botocore.exceptions import ClientError
+
+from app.common.minio_client import MinIOClient, minio_client
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# delete_objects accepts at most this many keys per request
+DELETE_BATCH_SIZE = 1000
+# Read size for download_buffer
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class BufferReader(io.RawIOBase):
+    """
+    Read-only file object over an in-memory buffer.
+
+    Multipart uploads read the payload part by part through this instead of
+    copying the whole buffer into a BytesIO first.
+    """
+
+    def __init__(self, data: Buffer):
+        self._view = memoryview(data).cast('B')
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        chunk = self._view[self._position:self._position + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else min(self._position + size, len(self._view))
+        chunk = self._view[self._position:end].tobytes()
+        self._position = end
+        return chunk
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._view)}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+
+class AsyncMinIOClient:
+    """
+    Async counterpart of MinIOClient for request handlers and bulk jobs.
+
+    boto3 clients are thread-safe, so one client with a connection pool of
+    MINIO_MAX_CONNECTIONS is shared by a thread pool of the same size, which
+    also caps the requests the batched helpers have in flight.
+    """
+
+    def __init__(
+        self,
+        base: MinIOClient = minio_client,
+        max_connections: Optional[int] = None,
+        multipart_threshold: Optional[int] = None,
+        multipart_chunksize: Optional[int] = None,
+        multipart_concurrency: Optional[int] = None
+    ):
+        self.base = base
+        self.bucket = base.bucket
+        self.max_connections = max_connections or int(os.getenv('MINIO_MAX_CONNECTIONS', '32'))
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold or int(os.getenv('MINIO_MULTIPART_THRESHOLD_MB', '16')) * MB,
+            multipart_chunksize=multipart_chunksize or int(os.getenv('MINIO_MULTIPART_CHUNK_MB', '8')) * MB,
+            max_concurrency=multipart_concurrency or int(os.getenv('MINIO_MULTIPART_CONCURRENCY', '4')),
+            # Parts are uploaded from threads of the transfer manager
+            use_threads=True
+        )
+
+        protocol = 'https' if base.secure else 'http'
+        self.client = boto3.client(
+            's3',
+            endpoint_url=f"{protocol}://{base.endpoint}",
+            aws_access_key_id=base.access_key,
+            aws_secret_access_key=base.secret_key,
+            config=Config(
+                signature_version='s3v4',
+                max_pool_connections=self.max_connections,
+                tcp_keepalive=True,
+                retries={'max_attempts': 3, 'mode': 'standard'}
+            ),
+            region_name='us-east-1'
+        )
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def upload(
+        self,
+        key: str,
+        data: Union[Buffer, io.IOBase],
+        content_type: str = 'application/octet-stream'
+    ) -> str:
+        """
+        Upload an object; payloads above the multipart threshold are sent as concurrent parts
+
+        Args:
+            key: S3 object key (path)
+            data: Bytes-like buffer or readable binary file object (read in parts, not copied whole)
+            content_type: MIME type
+
+        Returns:
+            Internal URL of the object (same format as MinIOClient.upload_file)
+        """
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            if len(data) < self.transfer_config.multipart_threshold:
+                # Small payloads: one put_object, without spinning up a transfer manager
+                await self._run(
+                    self.client.put_object,
+                    Bucket=self.bucket,
+                    Key=key,
+                    Body=data if isinstance(data, bytes) else BufferReader(data),
+                    ContentType=content_type
+                )
+                return self.base.get_file_url(key)
+            data = BufferReader(data)
+
+        await self._run(
+            self.client.upload_fileobj,
+            data,
+            self.bucket,
+            key,
+            ExtraArgs={'ContentType': content_type},
+            Config=self.transfer_config
+        )
+        return self.base.get_file_url(key)
+
+    async def download(self, key: str) -> bytes:
+        """
+        Read a whole object
+
+        Args:
+            key: S3 object key
+
+        Returns:
+            Object bytes
+        """
+        def read() -> bytes:
+            return self.client.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+        return await self._run(read)
+
+    async def download_buffer(self, key: str) -> bytearray:
+        """
+        Read a whole object into one buffer sized from its Content-Length
+
+        Body.read() collects the response in chunks and joins them, so the object is briefly
+        held twice; here each chunk is copied straight into its place in the buffer.
+
+        Args:
+            key: S3 object key
+
+        Returns:
+            Object bytes
+        """
+        def read() -> bytearray:
+            response = self.client.get_object(Bucket=self.bucket, Key=key)
+            buffer = bytearray(response['ContentLength'])
+            view = memoryview(buffer)
+            position = 0
+            for chunk in response['Body'].iter_chunks(DOWNLOAD_CHUNK_SIZE):
+                view[position:position + len(chunk)] = chunk
+                position += len(chunk)
+            if position != len(buffer):
+                raise IOError(f"Read {position} of {len(buffer)} bytes of {key}")
+            return buffer
+        return await self._run(read)
+
+    async def exists(self, key: str) -> bool:
+        """
+        Check if an object exists
+
+        Args:
+            key: S3 object key
+
+        Returns:
+            True if the object exists; errors other than "not found" are raised
+        """
+        try:
+            await self._run(self.client.head_object, Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    async def delete(self, key: str) -> None:
+        await self._run(self.client.delete_object, Bucket=self.bucket, Key=key)
+
+    async def exists_many(self, keys: Iterable[str]) -> Dict[str, bool]:
+        """
+        Check many keys concurrently
+
+        Args:
+            keys: S3 object keys
+
+        Returns:
+            key -> exists
+        """
+        keys = list(dict.fromkeys(keys))
+        results = await asyncio.gather(*(self.exists(key) for key in keys))
+        return dict(zip(keys, results))
+
+    async def delete_many(self, keys: Iterable[str]) -> List[str]:
+        """
+        Delete many keys with batched delete_objects requests (up to 1000 keys each)
+
+        Args:
+            keys: S3 object keys
+
+        Returns:
+            Keys that could not be deleted
+        """
+        keys = list(dict.fromkeys(keys))
+        batches = [keys[i:i + DELETE_BATCH_SIZE] for i in range(0, len(keys), DELETE_BATCH_SIZE)]
+
+        async def delete_batch(batch: List[str]) -> List[str]:
+            response = await self._run(
+                self.client.delete_objects,
+                Bucket=self.bucket,
+                Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+            )
+            return [error['Key'] for error in response.get('Errors', [])]
+
+        failed = []
+        for errors in await asyncio.gather(*(delete_batch(batch) for batch in batches)):
+            failed.extend(errors)
+        if failed:
+            logger.warning(f"Failed to delete {len(failed)} of {len(keys)} objects")
+        return failed
+
+    async def upload_many(
+        self,
+        items: Iterable[Tuple[str, Union[Buffer, io.IOBase], str]]
+    ) -> Dict[str, Union[str, Exception]]:
+        """
+        Upload many objects concurrently
+
+        Args:
+            items: (key, data, content_type) tuples
+
+        Returns:
+            key -> internal URL, or the exception that upload raised
+        """
+        items = list(items)
+        results = await asyncio.gather(
+            *(self.upload(key, data, content_type) for key, data, content_type in items),
+            return_exceptions=True
+        )
+        return {key: result for (key, _, _), result in zip(items, results)}
+
+    def close(self) -> None:
+        """Stop the worker threads (the client can't be used afterwards)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def _run(self, fn, *args, **kwargs):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_connections, thread_name_prefix='minio')
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(*args, **kwargs))
+
+
+# Singleton instance
+async_minio_client = AsyncMinIOClient()
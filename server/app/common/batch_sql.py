@@ -0,0 +1,52 @@
+"""Batched statements: the values of many rows in one INSERT or UPDATE"""
+from typing import Dict, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.sql.elements import TextClause
+
+
+def values_list(columns: Sequence[str], rows: Sequence[Sequence]) -> Tuple[str, Dict]:
+    """
+    A VALUES list binding a batch of rows
+
+    Args:
+        columns: Column names, used to name the parameters
+        rows: One tuple per row, in columns order
+
+    Returns:
+        ("(:a_0, :b_0), (:a_1, :b_1), ...", params); parameters are named <column>_<row index>
+    """
+    values = ', '.join(
+        '(' + ', '.join(f":{column}_{i}" for column in columns) + ')' for i in range(len(rows))
+    )
+    params = {f"{column}_{i}": value for i, row in enumerate(rows) for column, value in zip(columns, row)}
+    return values, params
+
+
+def update_from_values(
+    table: str,
+    columns: Sequence[str],
+    rows: Sequence[Sequence],
+    set_clause: str,
+    where: str
+) -> Tuple[TextClause, Dict]:
+    """
+    One UPDATE ... FROM (VALUES ...) statement for a batch of rows
+
+    Args:
+        table: Table to update
+        columns: Names of the VALUES columns, referenced as v.<name> in set_clause and where
+        rows: One tuple per row, in columns order
+        set_clause: Assignments, e.g. "external_resource_url = v.url"
+        where: Join (and guard) condition, e.g. "media.id = v.id"
+
+    Returns:
+        (statement, params) to execute; parameters are named <column>_<row index>
+    """
+    values, params = values_list(columns, rows)
+    statement = text(
+        f"UPDATE {table} SET {set_clause} "
+        f"FROM (VALUES {values}) AS v({', '.join(columns)}) "
+        f"WHERE {where}"
+    )
+    return statement, params
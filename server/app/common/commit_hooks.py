@@ -0,0 +1,41 @@
+"""Run cache invalidations once ORM writes are committed, not when they are flushed"""
+import itertools
+from typing import Any, Callable, Dict, Hashable, Iterable, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+def on_commit(collectors: Dict[type, Callable[[Any], Iterable[Hashable]]],
+              apply: Callable[[Set[Hashable]], None]) -> None:
+    """
+    Call apply(keys) after every commit whose flushes wrote objects of the given models
+
+    Mapper events fire at flush, while the rows are still invisible to other connections;
+    a reload then would cache the old row. The keys are gathered at flush instead (the
+    objects are expired or detached after the commit) and applied once it has committed.
+
+    Args:
+        collectors: Model -> function of a new, changed or deleted object returning the keys it affects
+        apply: Called with the set of keys after the commit
+    """
+    # Session.info key of this listener's pending keys
+    name = object()
+
+    def _collect(session, flush_context):
+        for obj in itertools.chain(session.new, session.dirty, session.deleted):
+            collect = collectors.get(type(obj))
+            if collect is not None:
+                session.info.setdefault(name, set()).update(collect(obj))
+
+    def _apply(session):
+        keys = session.info.pop(name, None)
+        if keys:
+            apply(keys)
+
+    def _discard(session):
+        session.info.pop(name, None)
+
+    event.listen(Session, "after_flush", _collect)
+    event.listen(Session, "after_commit", _apply)
+    event.listen(Session, "after_rollback", _discard)
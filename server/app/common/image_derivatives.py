@@ -0,0 +1,220 @@
+"""Resized image variants (thumbnails/previews) generated on upload or by backfill"""
+import argparse
+import io
+import json
+import logging
+import os
+import posixpath
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+from sqlalchemy import text
+
+from app.common.batch_sql import update_from_values
+from app.common.minio_client import MinIOClient, media_url_service, minio_client
+from config.db import engine
+
+logger = logging.getLogger(__name__)
+
+# Variant name -> longest edge in pixels, largest first (each one is resized from the previous)
+VARIANTS: Dict[str, int] = {
+    'preview': int(os.getenv('IMAGE_PREVIEW_SIZE', '960')),
+    'thumb': int(os.getenv('IMAGE_THUMBNAIL_SIZE', '320')),
+}
+DERIVATIVE_FORMAT = os.getenv('IMAGE_DERIVATIVE_FORMAT', 'webp').lower()
+DERIVATIVE_QUALITY = int(os.getenv('IMAGE_DERIVATIVE_QUALITY', '80'))
+
+EXIF_ORIENTATION = 0x0112
+
+FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+
+def derivative_key(key: str, variant: str, fmt: str = DERIVATIVE_FORMAT) -> str:
+    """
+    Deterministic object key of a variant
+
+    Args:
+        key: Key of the original (e.g. photos/media_1.jpg)
+        variant: Variant name (e.g. thumb)
+        fmt: 'webp' or 'jpeg'
+
+    Returns:
+        Key such as derivatives/thumb/photos/media_1.webp
+    """
+    stem, _ = posixpath.splitext(key)
+    return f"derivatives/{variant}/{stem}.{'jpg' if fmt == 'jpeg' else fmt}"
+
+
+def generate_derivatives(
+    data: bytes,
+    variants: Dict[str, int] = VARIANTS,
+    fmt: str = DERIVATIVE_FORMAT,
+    quality: int = DERIVATIVE_QUALITY
+) -> Tuple[Tuple[int, int], Dict[str, dict]]:
+    """
+    Produce resized variants of an image
+
+    Args:
+        data: Encoded original image
+        variants: Variant name -> longest edge, largest first
+        fmt: Output format, 'webp' or 'jpeg'
+        quality: Encoder quality
+
+    Returns:
+        ((original width, original height), variant name -> {'data', 'width', 'height', 'content_type'})
+        Variants at least as large as the original are skipped.
+    """
+    pil_format, content_type = FORMATS[fmt]
+    image = Image.open(io.BytesIO(data))
+    # Size as displayed: EXIF orientations 5-8 are rotated by 90 degrees
+    original_size = image.size[::-1] if image.getexif().get(EXIF_ORIENTATION, 1) >= 5 else image.size
+
+    # JPEG can decode at 1/2, 1/4 or 1/8 scale; ask for the smallest scale that still covers the largest variant
+    largest = max(variants.values())
+    image.draft('RGB', (largest, largest))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    if pil_format == 'JPEG' and image.mode == 'RGBA':
+        image = image.convert('RGB')
+
+    results = {}
+    for name, edge in sorted(variants.items(), key=lambda item: -item[1]):
+        if max(original_size) <= edge:
+            continue
+        image.thumbnail((edge, edge), Image.LANCZOS)
+        buffer = io.BytesIO()
+        if pil_format == 'WEBP':
+            image.save(buffer, pil_format, quality=quality, method=4)
+        else:
+            image.save(buffer, pil_format, quality=quality, optimize=True, progressive=True)
+        results[name] = {
+            'data': buffer.getvalue(),
+            'width': image.width,
+            'height': image.height,
+            'content_type': content_type,
+        }
+    return original_size, results
+
+
+def store_derivatives(data: bytes, key: str, client: MinIOClient = minio_client) -> dict:
+    """
+    Generate and upload the variants of an image already stored (or about to be stored) at key
+
+    Args:
+        data: Encoded original image
+        key: Object key of the original
+        client: MinIO client to upload with
+
+    Returns:
+        meta fields: 'width', 'height' and 'variants' (name -> {'key', 'width', 'height', 'format'})
+    """
+    (width, height), derivatives = generate_derivatives(data)
+    variants = {}
+    for name, derivative in derivatives.items():
+        variant_key = derivative_key(key, name)
+        client.upload_file(derivative['data'], variant_key, derivative['content_type'])
+        variants[name] = {
+            'key': variant_key,
+            'width': derivative['width'],
+            'height': derivative['height'],
+            'format': DERIVATIVE_FORMAT,
+        }
+    return {'width': width, 'height': height, 'variants': variants}
+
+
+def upload_image(
+    data: bytes,
+    key: str,
+    content_type: str = 'image/jpeg',
+    client: MinIOClient = minio_client
+) -> Tuple[str, dict]:
+    """
+    Upload an image together with its resized variants
+
+    Args:
+        data: Encoded image
+        key: S3 object key for the original
+        content_type: MIME type of the original
+        client: MinIO client to upload with
+
+    Returns:
+        (URL of the original, meta fields to merge into media.meta)
+    """
+    url = client.upload_file(data, key, content_type)
+    try:
+        meta = store_derivatives(data, key, client)
+    except Exception as e:
+        # The original is usable without variants; backfill can retry later
+        logger.warning(f"Could not generate variants for {key}: {e}")
+        meta = {}
+    return url, meta
+
+
+def thumbnail_key(meta: Optional[dict]) -> Optional[str]:
+    """Key of the smallest stored variant recorded in media.meta, if any."""
+    variants = (meta or {}).get('variants') or {}
+    if not variants:
+        return None
+    return min(variants.values(), key=lambda variant: variant['width'] * variant['height'])['key']
+
+
+def backfill(limit: Optional[int] = None, client: MinIOClient = minio_client, batch_size: int = 200) -> int:
+    """
+    Generate variants for MinIO-hosted media rows that don't have them yet
+
+    Args:
+        limit: Max rows to process
+        client: MinIO client to read originals and upload variants with
+        batch_size: Rows per batched UPDATE of media.meta
+
+    Returns:
+        Number of media rows updated
+    """
+    query = "SELECT id, external_resource_url, meta FROM media WHERE meta IS NULL OR (meta::jsonb -> 'variants') IS NULL ORDER BY id"
+    if limit:
+        query += f" LIMIT {int(limit)}"
+    with engine.connect() as conn:
+        rows = conn.execute(text(query)).all()
+
+    updated = 0
+    pending: List[Tuple[int, str]] = []
+    for row in rows:
+        key = media_url_service.key_for_url(row.external_resource_url or '')
+        if key is None:
+            continue
+        try:
+            data = client.client.get_object(Bucket=client.bucket, Key=key)['Body'].read()
+            meta = {**(row.meta or {}), **store_derivatives(data, key, client)}
+        except Exception as e:
+            logger.warning(f"Skipping media {row.id}: {e}")
+            continue
+        pending.append((row.id, json.dumps(meta)))
+        logger.info(f"Generated {len(meta['variants'])} variants for media {row.id}")
+        if len(pending) >= batch_size:
+            updated += _update_meta(pending)
+            pending = []
+    return updated + _update_meta(pending)
+
+
+def _update_meta(pending: List[Tuple[int, str]]) -> int:
+    """Write (media id, meta JSON) pairs in one UPDATE; returns how many were written."""
+    if pending:
+        statement, params = update_from_values(
+            'media', ('id', 'meta'), pending, set_clause='meta = CAST(v.meta AS json)', where='media.id = v.id'
+        )
+        with engine.begin() as conn:
+            conn.execute(statement, params)
+    return len(pending)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Generate thumbnail/preview variants for existing media")
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=200, help="Rows per batched UPDATE")
+    args = parser.parse_args()
+    print(f"Updated {backfill(args.limit, batch_size=args.batch_size)} media rows")
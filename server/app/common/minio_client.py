@@ -1,9 +1,15 @@
 """MinIO S3 storage utilities"""
 import os
 import io
+import threading
+import time
 import boto3
 from botocore.client import Config
-from typing import Optional
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import quote, unquote
+
+# Cache expiry of public (unsigned) URLs
+NEVER_EXPIRES = float('inf')
 
 
 class MinIOClient:
@@ -27,6 +33,12 @@ class MinIOClient:
             region_name='us-east-1'
         )
     
+    @property
+    def internal_url_prefix(self) -> str:
+        """Prefix of the URLs upload_file() returns (and the media table stores)."""
+        protocol = 'https' if self.secure else 'http'
+        return f"{protocol}://{self.endpoint}/{self.bucket}/"
+    
     def upload_file(
         self, 
         file_data: bytes, 
@@ -51,21 +63,19 @@ class MinIOClient:
             ContentType=content_type
         )
         
-        protocol = 'https' if self.secure else 'http'
-        return f"{protocol}://{self.endpoint}/{self.bucket}/{key}"
+        return f"{self.internal_url_prefix}{key}"
     
     def get_file_url(self, key: str) -> str:
         """
-        Get public URL for a file
+        Get the internal (in-cluster) URL for a file
         
         Args:
             key: S3 object key
             
         Returns:
-            Public URL
+            URL on MINIO_ENDPOINT; use media_url_service for URLs handed to clients
         """
-        protocol = 'https' if self.secure else 'http'
-        return f"{protocol}://{self.endpoint}/{self.bucket}/{key}"
+        return f"{self.internal_url_prefix}{key}"
     
     def delete_file(self, key: str) -> None:
         """
@@ -93,5 +103,166 @@ class MinIOClient:
             return False
 
 
-# Singleton instance
+class MediaURLService:
+    """
+    Client-facing URLs for bucket objects.
+    
+    MINIO_URL_MODE selects how URLs are built for this deployment:
+    - 'public': MINIO_PUBLIC_BASE_URL + key (anonymous-download bucket or a CDN in front of it)
+    - 'presigned': S3v4 presigned GET URLs signed for MINIO_PUBLIC_ENDPOINT
+    
+    URLs are cached per key; presigned entries are re-signed once less than
+    a tenth of their lifetime is left, so a cached URL is never handed out
+    close to expiry.
+    """
+    
+    def __init__(
+        self,
+        client: MinIOClient,
+        mode: Optional[str] = None,
+        public_base_url: Optional[str] = None,
+        public_endpoint: Optional[str] = None,
+        expires_in: Optional[int] = None,
+        max_entries: Optional[int] = None
+    ):
+        self.client = client
+        self.mode = (mode or os.getenv('MINIO_URL_MODE', 'public')).lower()
+        if self.mode not in ('public', 'presigned'):
+            raise ValueError(f"MINIO_URL_MODE must be 'public' or 'presigned', got '{self.mode}'")
+        
+        protocol = 'https' if client.secure else 'http'
+        self.public_endpoint = public_endpoint or os.getenv('MINIO_PUBLIC_ENDPOINT', 'localhost:9000')
+        base = public_base_url or os.getenv('MINIO_PUBLIC_BASE_URL') or f"{protocol}://{self.public_endpoint}/{client.bucket}"
+        self.public_base_url = base.rstrip('/')
+        self.expires_in = expires_in or int(os.getenv('MINIO_PRESIGN_EXPIRES', '3600'))
+        self.max_entries = max_entries or int(os.getenv('MINIO_URL_CACHE_SIZE', '10000'))
+        # Re-sign before handing out a URL with less than this many seconds left
+        self.refresh_margin = self.expires_in / 10
+        
+        # key -> (url, reuse until); dicts keep insertion order, so the first entry is the oldest
+        self._urls: Dict[str, Tuple[str, float]] = {}
+        # Stored internal URL -> (client URL, reuse until), so hot-path conversions skip key parsing
+        self._converted: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+        self._signer = None
+    
+    def public_url(self, key: str) -> str:
+        """
+        Client-facing URL for one object key
+        
+        Args:
+            key: S3 object key
+            
+        Returns:
+            Public or presigned URL
+        """
+        cached = self._urls.get(key)
+        if cached is not None and cached[1] > time.time():
+            return cached[0]
+        return self.public_urls([key])[key]
+    
+    def public_urls(self, keys: Iterable[str]) -> Dict[str, str]:
+        """
+        Client-facing URLs for many keys at once
+        
+        Args:
+            keys: S3 object keys
+            
+        Returns:
+            key -> URL; only keys without a fresh cached URL are signed/formatted
+        """
+        now = time.time()
+        urls = {}
+        missing = []
+        for key in keys:
+            cached = self._urls.get(key)
+            if cached is not None and cached[1] > now:
+                urls[key] = cached[0]
+            elif key not in urls:
+                missing.append(key)
+        if not missing:
+            return urls
+        
+        if self.mode == 'presigned':
+            reuse_until = now + self.expires_in - self.refresh_margin
+            fresh = {key: self._presign(key) for key in missing}
+        else:
+            reuse_until = NEVER_EXPIRES
+            fresh = {key: f"{self.public_base_url}/{quote(key)}" for key in missing}
+        
+        with self._lock:
+            for key, url in fresh.items():
+                self._urls.pop(key, None)
+                self._urls[key] = (url, reuse_until)
+            if len(self._urls) > self.max_entries:
+                self._evict(now)
+        urls.update(fresh)
+        return urls
+    
+    def key_for_url(self, url: str) -> Optional[str]:
+        """Object key behind an internal URL from upload_file()/get_file_url(), or None."""
+        prefix = self.client.internal_url_prefix
+        # URLs with a query string are already signed (or otherwise specific): leave them alone
+        if not url.startswith(prefix) or '?' in url:
+            return None
+        return unquote(url[len(prefix):])
+    
+    def convert_url(self, url: str) -> str:
+        """Client-facing URL for a stored internal URL; other URLs are returned unchanged."""
+        cached = self._converted.get(url)
+        # Hot path: public URLs never expire, so skip the clock for them
+        if cached is not None and (cached[1] == NEVER_EXPIRES or cached[1] > time.time()):
+            return cached[0]
+        key = self.key_for_url(url)
+        if key is None:
+            return url
+        public_url = self.public_url(key)
+        self._converted[url] = self._urls.get(key, (public_url, 0.0))
+        return public_url
+    
+    def convert_urls(self, urls: Iterable[str]) -> Dict[str, str]:
+        """Bulk convert_url(): stored URL -> client-facing URL."""
+        keys = {url: self.key_for_url(url) for url in urls}
+        public = self.public_urls(key for key in keys.values() if key is not None)
+        return {url: url if key is None else public[key] for url, key in keys.items()}
+    
+    def invalidate(self, key: str) -> None:
+        """Forget the cached URL for a key (e.g. after the object is replaced or deleted)."""
+        with self._lock:
+            self._urls.pop(key, None)
+            self._converted.clear()
+    
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then the oldest ones, leaving headroom so a full cache isn't scanned on every insert."""
+        expired = [key for key, (_, reuse_until) in self._urls.items() if reuse_until <= now]
+        for key in expired:
+            del self._urls[key]
+        overflow = len(self._urls) - int(self.max_entries * 0.9)
+        if overflow > 0:
+            for key in list(self._urls)[:overflow]:
+                del self._urls[key]
+        self._converted.clear()
+    
+    def _presign(self, key: str) -> str:
+        if self._signer is None:
+            # Signatures cover the host, so sign for the endpoint browsers actually reach;
+            # generating a presigned URL is local and never calls MinIO
+            protocol = 'https' if self.client.secure else 'http'
+            self._signer = boto3.client(
+                's3',
+                endpoint_url=f"{protocol}://{self.public_endpoint}",
+                aws_access_key_id=self.client.access_key,
+                aws_secret_access_key=self.client.secret_key,
+                config=Config(signature_version='s3v4', s3={'addressing_style': 'path'}),
+                region_name='us-east-1'
+            )
+        return self._signer.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.client.bucket, 'Key': key},
+            ExpiresIn=self.expires_in
+        )
+
+
+# Singleton instances
 minio_client = MinIOClient()
+media_url_service = MediaURLService(minio_client)
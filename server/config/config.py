@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -8,6 +10,8 @@ class Settings(BaseSettings):
   POSTGRES_PORT: str = "65432"  # Default value
   
   OPENAI_API_KEY: str
+  # Point the chat models at an OpenAI-compatible server (e.g. tests/load/stub_llm.py)
+  OPENAI_BASE_URL: Optional[str] = None
   TAVILY_API_KEY: str
   SERPAPI_API_KEY: str
   
@@ -17,6 +21,92 @@ class Settings(BaseSettings):
   MINIO_SECRET_KEY: str = "password"
   MINIO_BUCKET: str = "media"
   MINIO_SECURE: bool = False
+  # Client-facing media URLs: "public" (MINIO_PUBLIC_BASE_URL + key) or "presigned" (signed for MINIO_PUBLIC_ENDPOINT)
+  MINIO_URL_MODE: str = "public"
+  MINIO_PUBLIC_ENDPOINT: str = "localhost:9000"
+  MINIO_PUBLIC_BASE_URL: Optional[str] = None
+  MINIO_PRESIGN_EXPIRES: int = 3600
+  MINIO_URL_CACHE_SIZE: int = 10000
+  # AsyncMinIOClient: pooled connections (= worker threads) and multipart upload tuning
+  MINIO_MAX_CONNECTIONS: int = 32
+  MINIO_MULTIPART_THRESHOLD_MB: int = 16
+  MINIO_MULTIPART_CHUNK_MB: int = 8
+  MINIO_MULTIPART_CONCURRENCY: int = 4
+
+  # Image variants stored next to each upload (longest edge in px) and their encoding
+  IMAGE_PREVIEW_SIZE: int = 960
+  IMAGE_THUMBNAIL_SIZE: int = 320
+  IMAGE_DERIVATIVE_FORMAT: str = "webp"
+  IMAGE_DERIVATIVE_QUALITY: int = 80
+
+  # Media ingestion: uploads above this size are hashed into a temp file instead of memory
+  MEDIA_INGEST_SPOOL_MB: int = 16
+
+  # Bulk copy of external media into MinIO (migration 009 / scripts/upload-media)
+  MEDIA_UPLOAD_WORKERS: int = 16
+  MEDIA_UPLOAD_CHECKPOINT: str = "media_upload_checkpoint.jsonl"
+
+  # Segmentation model: torch intra-op threads per inference (0 = torch default), concurrent
+  # inferences, and whether the media router loads the model at startup
+  MEDIA_TORCH_THREADS: int = 4
+  MEDIA_INFERENCE_WORKERS: int = 1
+  MEDIA_MODEL_WARMUP: bool = True
+  # Segmentation backend (resnet101 | mobilenet | lraspp), runtime (torch | onnx | onnx_int8, the ONNX
+  # ones need onnxruntime), longest edge images are downscaled to before inference (0 = original size)
+  # and where exported ONNX graphs are cached
+  MEDIA_SEGMENTATION_BACKEND: str = "resnet101"
+  MEDIA_SEGMENTATION_RUNTIME: str = "torch"
+  MEDIA_SEGMENTATION_SIZE: int = 0
+  MEDIA_ONNX_DIR: str = "models/onnx"
+  # Batch compositing: images per forward pass, pairs per request and compositing threads.
+  # A pass also holds at most MEDIA_BATCH_MAX_PIXELS padded pixels, so full-resolution photos
+  # (MEDIA_SEGMENTATION_SIZE=0) aren't stacked into one huge CPU tensor
+  MEDIA_BATCH_SIZE: int = 8
+  MEDIA_BATCH_MAX_PIXELS: int = 4_194_304
+  MEDIA_BATCH_MAX_PAIRS: int = 64
+  MEDIA_COMPOSITE_WORKERS: int = 2
+  # Person masks cached per host image content and model version: in-memory LRU budget (MinIO keeps them all)
+  MEDIA_MASK_CACHE_MB: int = 128
+  # Background media jobs: concurrent jobs per process, queued jobs allowed (503 beyond that) and the
+  # Retry-After sent then, how often idle runners look for queued jobs, and how long a claim lasts
+  # without being extended (a job whose runner died is claimed again after that)
+  MEDIA_JOB_WORKERS: int = 1
+  MEDIA_JOB_MAX_PENDING: int = 32
+  MEDIA_JOB_RETRY_AFTER_SECONDS: int = 10
+  MEDIA_JOB_POLL_SECONDS: float = 2
+  MEDIA_JOB_LEASE_SECONDS: int = 60
+  # Media worker process (python -m app.Media.worker) that owns torch: http://host:port or
+  # unix:///path.sock. Empty runs media generation inside the API process instead
+  MEDIA_WORKER_URL: str = ""
+  MEDIA_WORKER_TIMEOUT_SECONDS: float = 300
+
+  # Model tiers: SQL and summarizer stages try FAST_MODEL first and escalate to LARGE_MODEL
+  LARGE_MODEL: str = "gpt-4o"
+  FAST_MODEL: str = "gpt-4o-mini"
+  MODEL_TIERING: bool = True
+
+  # Start the likely worker (from a local keyword prior) while the classifier runs
+  SPECULATIVE_ROUTING: bool = True
+
+  # Run tool calls from the same agent step concurrently (bounded thread pool)
+  AGENT_PARALLEL_TOOLS: bool = True
+  AGENT_TOOL_WORKERS: int = 8
+
+  # /chat-bot/ask/batch: questions answered concurrently per request, and max items per request
+  BATCH_ASK_CONCURRENCY: int = 8
+  BATCH_ASK_MAX_ITEMS: int = 1000
+
+  # [[media:N]] references: media id -> public URL entries kept in memory
+  MEDIA_URL_CACHE_SIZE: int = 10000
+
+  # post_feed materialized view refresh (seconds)
+  POST_FEED_REFRESH_SECONDS: int = 30
+  POST_FEED_MAX_STALENESS_SECONDS: int = 600
+
+  # /users/ keyset pages: default and largest page size, and how long the estimated total is reused
+  USERS_PAGE_DEFAULT_LIMIT: int = 100
+  USERS_PAGE_MAX_LIMIT: int = 1000
+  USERS_COUNT_CACHE_SECONDS: int = 300
 
   def get_database_uri(self) -> str:
     return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
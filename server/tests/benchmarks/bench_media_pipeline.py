@@ -0,0 +1,159 @@
+"""
+Peak memory and latency of one composite job, MinIO to MinIO
+
+Compares the previous path (Body.read() downloads, full-size decodes,
+Image.composite into a third image, getvalue() before the upload) with the
+in-memory pipeline MediaService.generate_batch uses now (download_buffer,
+draft/reduce decoding, paste in place, upload from the encoder's buffer).
+Segmentation is left out: both paths get the same person mask, as they do
+on a mask cache hit.
+
+Every job runs in a freshly forked process whose peak RSS (VmHWM) is reset
+before the job; its peak is that high-water mark minus the RSS before the
+job, so earlier jobs' freed memory can't hide it. Linux only.
+
+    STUB_S3_LATENCY_MS=0 uvicorn --app-dir tests/benchmarks s3_stub:app --port 9100
+    python tests/benchmarks/bench_media_pipeline.py --endpoint localhost:9100 --host-size 4032x3024 --background-size 6000x4000
+"""
+
+import argparse
+import asyncio
+import io
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+
+def status_kb(field: str) -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise KeyError(field)
+
+
+def reset_peak_rss() -> None:
+    # Writing 5 resets VmHWM to the current RSS (Linux 4.0+)
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+
+
+def synthetic_jpeg(size) -> bytes:
+    """Photo-like JPEG (smooth regions and detail) of the given size."""
+    image = Image.effect_mandelbrot((size[0] // 4, size[1] // 4), (-2, -1.5, 1, 1.5), 60).convert("RGB")
+    image = image.resize(size, Image.BICUBIC)
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def person_mask(size):
+    mask = Image.new("L", size, 0)
+    ImageDraw.Draw(mask).ellipse((size[0] // 4, size[1] // 8, size[0] * 3 // 4, size[1]), fill=255)
+    return mask
+
+
+def previous_job(clients, host_key, background_key, output_key, packed, size):
+    """Pre-pipeline path: what generate_batch's process-pool compositing did per pair."""
+    from app.Media.compositing import unpack_mask
+
+    sync_client, _ = clients
+    host = sync_client.client.get_object(Bucket=sync_client.bucket, Key=host_key)["Body"].read()
+    background = sync_client.client.get_object(Bucket=sync_client.bucket, Key=background_key)["Body"].read()
+    host_image = Image.open(io.BytesIO(host)).convert("RGB")
+    background_image = Image.open(io.BytesIO(background)).convert("RGB").resize(host_image.size, Image.BILINEAR)
+    output = io.BytesIO()
+    Image.composite(host_image, background_image, unpack_mask(packed, size)).save(output, "JPEG", quality=90)
+    sync_client.upload_file(output.getvalue(), output_key, "image/jpeg")
+
+
+def pipeline_job(clients, host_key, background_key, output_key, packed, size):
+    """The in-memory pipeline of MediaService.generate_batch."""
+    from app.Media.compositing import composite_onto, encode, open_background, open_image, unpack_mask
+
+    _, async_client = clients
+
+    async def run():
+        host, background = await asyncio.gather(
+            async_client.download_buffer(host_key), async_client.download_buffer(background_key)
+        )
+        host_image = open_image(host)
+        output = encode(composite_onto(host_image, open_background(background, host_image.size), unpack_mask(packed, size)), output_key)
+        await async_client.upload(output_key, output.getbuffer(), "image/jpeg")
+
+    asyncio.run(run())
+
+
+def measure(job, clients, *args):
+    """Run one job in a forked child; returns (peak MB above the child's starting RSS, seconds)."""
+    def child(connection):
+        reset_peak_rss()
+        before = status_kb("VmRSS")
+        start = time.perf_counter()
+        job(clients, *args)
+        elapsed = time.perf_counter() - start
+        connection.send(((status_kb("VmHWM") - before) / 1024, elapsed))
+
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=child, args=(sender,))
+    process.start()
+    result = receiver.recv()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory per composite job: previous path vs in-memory pipeline")
+    parser.add_argument("--endpoint", default=os.getenv("MINIO_ENDPOINT", "localhost:9000"), help="host:port of MinIO or tests/benchmarks/s3_stub.py")
+    parser.add_argument("--bucket", default=os.getenv("MINIO_BUCKET", "media"))
+    parser.add_argument("--host-size", default="4032x3024", help="WxH of the host photo")
+    parser.add_argument("--background-size", default="6000x4000", help="WxH of the background photo")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ["MINIO_ENDPOINT"] = args.endpoint
+    os.environ["MINIO_BUCKET"] = args.bucket
+    from app.common.async_minio_client import AsyncMinIOClient
+    from app.common.minio_client import MinIOClient
+    from app.Media.compositing import pack_mask
+
+    host_size = tuple(int(v) for v in args.host_size.split("x"))
+    background_size = tuple(int(v) for v in args.background_size.split("x"))
+    sync_client = MinIOClient()
+    prefix = f"bench/{uuid.uuid4().hex[:8]}"
+    host_key, background_key = f"{prefix}/host.jpg", f"{prefix}/background.jpg"
+    host_data, background_data = synthetic_jpeg(host_size), synthetic_jpeg(background_size)
+    sync_client.upload_file(host_data, host_key, "image/jpeg")
+    sync_client.upload_file(background_data, background_key, "image/jpeg")
+    packed = pack_mask(person_mask(host_size))
+    print(f"host {args.host_size} ({len(host_data) / 1e6:.1f} MB), background {args.background_size} ({len(background_data) / 1e6:.1f} MB)")
+
+    results = {}
+    for name, job in (("previous", previous_job), ("pipeline", pipeline_job)):
+        runs = []
+        for i in range(args.repeats):
+            # Fresh clients per child: boto3 connections must not be shared across a fork
+            clients = (MinIOClient(), AsyncMinIOClient(MinIOClient(), max_connections=4))
+            runs.append(measure(job, clients, host_key, background_key, f"{prefix}/{name}-{i}.jpg", packed, host_size))
+        results[name] = (statistics.median(peak for peak, _ in runs), statistics.median(elapsed for _, elapsed in runs))
+
+    print(f"\n{'path':<12}{'peak MB':>10}{'seconds':>10}")
+    for name, (peak, elapsed) in results.items():
+        print(f"{name:<12}{peak:>10.1f}{elapsed:>10.3f}")
+    print(f"\npeak memory {results['previous'][0] / results['pipeline'][0]:.1f}x lower, "
+          f"{results['previous'][1] / results['pipeline'][1]:.1f}x faster")
+
+    for key in [host_key, background_key] + [f"{prefix}/{name}-{i}.jpg" for name in results for i in range(args.repeats)]:
+        sync_client.delete_file(key)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Startup time and memory of the API with media generation in or out of process
+
+Each scenario imports its modules in a fresh interpreter and reports the
+import time, the resident memory afterwards and whether torch got loaded:
+
+- api: app.app with MEDIA_WORKER_URL set (media generation goes to the worker)
+- api + media in-process: app.app and app.Media.service, i.e. the API before the split
+- media worker: app.Media.worker
+
+app.app connects to the database while importing, so run this where the
+API runs. Scenarios needing torch are skipped where it isn't installed:
+
+    docker compose exec media-worker python tests/benchmarks/bench_media_worker.py
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SERVER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+SCENARIOS = {
+    "api": ["app.app"],
+    "api + media in-process": ["app.app", "app.Media.service"],
+    "media worker": ["app.Media.worker"],
+}
+
+PROBE = """
+import importlib, json, sys, time
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+seconds = time.perf_counter() - start
+with open("/proc/self/status") as f:
+    rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+print(json.dumps({"seconds": seconds, "rss_mb": rss_kb / 1024, "torch": "torch" in sys.modules}))
+"""
+
+
+def probe(modules, env):
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, *modules], cwd=SERVER_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time and memory of the API with and without torch")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--worker-url", default=os.getenv("MEDIA_WORKER_URL") or "http://media-worker:8200")
+    args = parser.parse_args()
+
+    env = {**os.environ, "MEDIA_WORKER_URL": args.worker_url, "MEDIA_MODEL_WARMUP": "false"}
+    print(f"\n{'scenario':<26}{'import s':>10}{'RSS MB':>10}{'torch':>8}")
+    for name, modules in SCENARIOS.items():
+        runs = [probe(modules, env) for _ in range(args.repeats)]
+        failed = next((run for run in runs if "error" in run), None)
+        if failed:
+            print(f"{name:<26}skipped: {failed['error']}")
+            continue
+        seconds = statistics.median(run["seconds"] for run in runs)
+        rss = statistics.median(run["rss_mb"] for run in runs)
+        print(f"{name:<26}{seconds:>10.2f}{rss:>10.0f}{'yes' if runs[0]['torch'] else 'no':>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark the synchronous MinIOClient against AsyncMinIOClient
+
+Times the same workloads through both clients:
+
+- exists / upload / delete of many small objects: one blocking call per key
+  vs the batched async helpers (exists_many, upload_many, delete_many)
+- one large upload: single-part put_object from a BytesIO copy vs a
+  concurrent multipart upload read straight from the buffer
+
+Run against the docker-compose MinIO, or the in-memory stand-in:
+    STUB_S3_LATENCY_MS=5 uvicorn --app-dir tests/benchmarks s3_stub:app --port 9100
+    python tests/benchmarks/bench_minio.py --endpoint localhost:9100 --keys 200 --size-mb 64
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from app.common.async_minio_client import MB, AsyncMinIOClient  # noqa: E402
+from app.common.minio_client import MinIOClient  # noqa: E402
+
+
+def make_clients(endpoint: str, bucket: str, connections: int, chunk_mb: int):
+    # The module-level singletons read MINIO_ENDPOINT at import; point fresh clients at the target instead
+    os.environ["MINIO_ENDPOINT"] = endpoint
+    os.environ["MINIO_BUCKET"] = bucket
+    sync_client = MinIOClient()
+    async_client = AsyncMinIOClient(
+        sync_client,
+        max_connections=connections,
+        multipart_threshold=chunk_mb * MB,
+        multipart_chunksize=chunk_mb * MB,
+        multipart_concurrency=min(connections, 8),
+    )
+    return sync_client, async_client
+
+
+def timed(fn: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run(args) -> Dict[str, Dict[str, float]]:
+    sync_client, async_client = make_clients(args.endpoint, args.bucket, args.connections, args.chunk_mb)
+    prefix = f"bench/{uuid.uuid4().hex[:8]}"
+    keys: List[str] = [f"{prefix}/object-{i:05d}.bin" for i in range(args.keys)]
+    small = os.urandom(args.object_kb * 1024)
+    large = os.urandom(args.size_mb * MB)
+    results = {}
+
+    # Separate key sets so both sides upload, check and delete the same number of objects
+    sync_keys = [f"{key}.sync" for key in keys]
+    async_keys = [f"{key}.async" for key in keys]
+
+    results["upload"] = {
+        "sync": timed(lambda: [sync_client.upload_file(small, key) for key in sync_keys]),
+        "async": timed(lambda: asyncio.run(async_client.upload_many((key, small, "application/octet-stream") for key in async_keys))),
+    }
+    results["exists"] = {
+        "sync": timed(lambda: [sync_client.file_exists(key) for key in sync_keys]),
+        "async": timed(lambda: asyncio.run(async_client.exists_many(async_keys))),
+    }
+    results["delete"] = {
+        "sync": timed(lambda: [sync_client.delete_file(key) for key in sync_keys]),
+        "async": timed(lambda: asyncio.run(async_client.delete_many(async_keys))),
+    }
+    results[f"upload {args.size_mb}MB"] = {
+        "sync": timed(lambda: sync_client.upload_file(large, f"{prefix}/large.sync")),
+        "async": timed(lambda: asyncio.run(async_client.upload(f"{prefix}/large.async", large))),
+    }
+
+    sync_client.delete_file(f"{prefix}/large.sync")
+    asyncio.run(async_client.delete(f"{prefix}/large.async"))
+    async_client.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sync vs async MinIO clients")
+    parser.add_argument("--endpoint", default=os.getenv("MINIO_ENDPOINT", "localhost:9000"), help="host:port of MinIO or tests/benchmarks/s3_stub.py")
+    parser.add_argument("--bucket", default=os.getenv("MINIO_BUCKET", "media"))
+    parser.add_argument("--keys", type=int, default=200, help="small objects per batched operation")
+    parser.add_argument("--object-kb", type=int, default=64, help="size of each small object")
+    parser.add_argument("--size-mb", type=int, default=64, help="size of the large upload")
+    parser.add_argument("--chunk-mb", type=int, default=8, help="multipart threshold and part size")
+    parser.add_argument("--connections", type=int, default=32, help="async client connection pool size")
+    args = parser.parse_args()
+
+    results = run(args)
+    print(f"\n{'operation':<16}{'sync s':>10}{'async s':>10}{'speedup':>10}")
+    for name, timing in results.items():
+        print(f"{name:<16}{timing['sync']:>10.3f}{timing['async']:>10.3f}{timing['sync'] / timing['async']:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
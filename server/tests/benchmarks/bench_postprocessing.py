@@ -0,0 +1,209 @@
+"""
+Micro-benchmarks for the chatbot response post-processing hot paths
+
+Every chat response goes through app/chatbot/media_utils.py
+(format_response_with_images, extract_image_urls_from_text,
+convert_minio_url_for_frontend, format_media_urls and the SQL answer
+URL rewrite), and streamed answers go through ResponsePostProcessor.feed. These benchmarks run them on generated responses of
+realistic shapes, up to hundreds of image URLs.
+
+Timings are normalized by a fixed calibration workload measured in the
+same process, so the committed baseline (baseline.json) is comparable
+across machines. A benchmark regresses when its normalized score is more
+than `threshold` above the baseline.
+
+    python tests/benchmarks/bench_postprocessing.py                    # report vs baseline
+    python tests/benchmarks/bench_postprocessing.py --check            # exit 1 on regression
+    python tests/benchmarks/bench_postprocessing.py --update-baseline  # after an intended change
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import timeit
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from app.chatbot.media_utils import (  # noqa: E402
+    ResponsePostProcessor,
+    convert_minio_url_for_frontend,
+    extract_image_urls_from_text,
+    format_media_urls,
+    format_response_with_images,
+    wrap_plain_urls_as_images,
+)
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_THRESHOLD = float(os.getenv("BENCH_THRESHOLD", "0.35"))
+
+NAMES = ["Alice Johnson", "Bob Smith", "Carol White", "David Brown", "Eve Davis"]
+CAPTIONS = [
+    "Sunset at the pier, best evening of the summer!",
+    "Coffee and a good book. Perfect Sunday.",
+    "Hiked up to the lookout this morning, the view was unreal",
+    "New mural downtown - who painted this?",
+]
+
+
+def media_url(i: int) -> str:
+    return f"http://minio:9000/media/posts/{i:05d}-{i * 7919 % 100000:05d}.jpg"
+
+
+def plain_sql_answer(images: int) -> str:
+    """SQL agent answer listing posts with bare media URLs (input of the URL rewrite)."""
+    lines = ["Hey! I found some cool posts for you:\n"]
+    for i in range(images):
+        lines.append(f"{i + 1}. {NAMES[i % len(NAMES)]} posted \"{CAPTIONS[i % len(CAPTIONS)]}\" - {media_url(i)}")
+    lines.append("\nPretty great, right? Let me know if you want to see more!")
+    return "\n".join(lines)
+
+
+def markdown_summary(images: int) -> str:
+    """Summarizer output: markdown images plus a few trailing plain URLs and an avatar."""
+    lines = ["Hey! Here's what everyone has been sharing lately:\n"]
+    for i in range(images):
+        lines.append(f"**{NAMES[i % len(NAMES)]}**: {CAPTIONS[i % len(CAPTIONS)]}\n![Post {i + 1}]({media_url(i)})\n")
+    lines.append(f"You can also check out {media_url(images)} and {media_url(images + 1)}.")
+    lines.append("Alice's avatar: http://minio:9000/media/avatars/alice.png")
+    return "\n".join(lines)
+
+
+def media_rows(count: int) -> List[dict]:
+    return [{"id": i, "external_resource_url": media_url(i)} for i in range(count)]
+
+
+def stream_tokens(text: str, size: int = 16) -> List[str]:
+    """Split text into fixed-size chunks standing in for streamed model tokens."""
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def process_stream(chunks: List[str]) -> str:
+    processor = ResponsePostProcessor(wrap_bare_urls=True)
+    return "".join(processor.feed(chunk) for chunk in chunks) + processor.close()
+
+
+def calibration_workload() -> None:
+    """Fixed string/regex work that scales with the machine like the benchmarks do."""
+    text = plain_sql_answer(40)
+    urls = re.findall(r'https?://[^\s<>"]+', text)
+    for url in urls:
+        text = text.replace(url, url.upper())
+    "".join(sorted(text.split()))
+
+
+def benchmarks() -> Dict[str, Callable[[], object]]:
+    """Name -> zero-argument callable; inputs are built once, outside the timed call."""
+    cases = {}
+    for size in (5, 50, 300):
+        summary = markdown_summary(size)
+        answer = plain_sql_answer(size)
+        cases[f"format_response_with_images[{size}]"] = lambda s=summary: format_response_with_images(s)
+        cases[f"extract_image_urls_from_text[{size}]"] = lambda s=summary: extract_image_urls_from_text(s)
+        cases[f"wrap_plain_urls_as_images[{size}]"] = lambda s=answer: wrap_plain_urls_as_images(s)
+
+    chunks = stream_tokens(plain_sql_answer(300))
+    cases["ResponsePostProcessor.feed[300]"] = lambda: process_stream(chunks)
+
+    urls = [media_url(i) for i in range(300)]
+    cases["convert_minio_url_for_frontend[300]"] = lambda: [convert_minio_url_for_frontend(u) for u in urls]
+    rows = media_rows(300)
+    cases["format_media_urls[300]"] = lambda: format_media_urls(rows)
+    return cases
+
+
+def loop_count(fn: Callable[[], object], min_time: float) -> int:
+    """Calls per sample so that one sample runs for at least min_time seconds."""
+    timer = timeit.Timer(fn)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    return number
+
+
+def run(names: Optional[List[str]] = None, repeat: int = 9, min_time: float = 0.02) -> Dict[str, dict]:
+    """
+    Time each benchmark against the calibration workload.
+
+    Each sample times the benchmark and the calibration workload back to back;
+    'score' is the median of those paired ratios, so machine speed and load
+    drift cancel out. 'us' is the best observed time per call.
+    """
+    calibration = timeit.Timer(calibration_workload)
+    calibration_number = loop_count(calibration_workload, min_time)
+
+    results = {}
+    for name, fn in benchmarks().items():
+        if names and not any(n in name for n in names):
+            continue
+        timer = timeit.Timer(fn)
+        number = loop_count(fn, min_time)
+        ratios, best = [], float("inf")
+        for _ in range(repeat):
+            seconds = timer.timeit(number) / number
+            reference = calibration.timeit(calibration_number) / calibration_number
+            ratios.append(seconds / reference)
+            best = min(best, seconds)
+        results[name] = {"us": round(best * 1e6, 2), "score": round(statistics.median(ratios), 4)}
+    return results
+
+
+def load_baseline(path: str = BASELINE_PATH) -> Dict[str, dict]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)["benchmarks"]
+
+
+def regressions(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[Tuple[str, float]]:
+    """Benchmarks whose normalized score exceeds the baseline by more than threshold."""
+    slower = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base and result["score"] > base["score"] * (1 + threshold):
+            slower.append((name, result["score"] / base["score"]))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chatbot post-processing")
+    parser.add_argument("-k", dest="names", action="append", help="only run benchmarks containing this text")
+    parser.add_argument("--repeat", type=int, default=9)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown vs baseline (0.35 = 35%%)")
+    parser.add_argument("--check", action="store_true", help="exit 1 if any benchmark regressed")
+    parser.add_argument("--update-baseline", action="store_true", help=f"write results to {os.path.basename(BASELINE_PATH)}")
+    args = parser.parse_args()
+
+    results = run(args.names, repeat=args.repeat)
+    baseline = load_baseline()
+    if args.update_baseline:
+        # Median of three runs so a single noisy run doesn't set the bar
+        runs = [results] + [run(args.names, repeat=args.repeat) for _ in range(2)]
+        results = {name: sorted((r[name] for r in runs), key=lambda r: r["score"])[1] for name in results}
+
+    print(f"{'benchmark':<42}{'us/call':>12}{'score':>10}{'baseline':>10}{'ratio':>8}")
+    for name, result in results.items():
+        base = baseline.get(name, {}).get("score")
+        ratio = f"{result['score'] / base:.2f}" if base else "-"
+        print(f"{name:<42}{result['us']:>12}{result['score']:>10}{str(base or '-'):>10}{ratio:>8}")
+
+    if args.update_baseline:
+        merged = {**baseline, **results}
+        with open(BASELINE_PATH, "w") as f:
+            json.dump({"unit": "calibration workload time", "benchmarks": merged}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nBaseline written to {BASELINE_PATH}")
+        return
+
+    slower = regressions(results, baseline, args.threshold)
+    for name, ratio in slower:
+        print(f"REGRESSION: {name} is {ratio:.2f}x its baseline (allowed {1 + args.threshold:.2f}x)")
+    if args.check and slower:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
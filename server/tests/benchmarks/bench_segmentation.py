@@ -0,0 +1,122 @@
+"""
+Requests per second of the segmentation model on CPU
+
+Compares the old per-request pattern (new MediaService, so a fresh
+DeepLabV3 load, for every request) with the shared, warmed-up model served
+from the bounded inference executor, at a given client concurrency, and
+per-image person masks against person_masks batches (MediaService.generate_batch).
+
+    python tests/benchmarks/bench_segmentation.py --requests 20 --concurrency 4 --threads 4 --workers 1
+    python tests/benchmarks/bench_segmentation.py --cold-requests 0   # skip the slow per-request baseline
+    python tests/benchmarks/bench_segmentation.py --cold-requests 0 --batch-size 8
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import torch  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from app.Media.service import SegmentationModel  # noqa: E402
+
+
+def synthetic_image(size: int) -> Image.Image:
+    """Deterministic RGB test image (content doesn't change DeepLabV3's cost)."""
+    return Image.effect_mandelbrot((size, size), (-2, -1.5, 1, 1.5), 100).convert("RGB")
+
+
+def cold(image: Image.Image, requests: int, threads: int) -> dict:
+    """Old behaviour: every request constructs the service and loads the model."""
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(requests):
+        request_start = time.perf_counter()
+        SegmentationModel(torch_threads=threads).predict(image)
+        latencies.append(time.perf_counter() - request_start)
+    return report(requests, time.perf_counter() - start, latencies)
+
+
+async def warm(image: Image.Image, requests: int, concurrency: int, threads: int, workers: int) -> dict:
+    """Shared model, warmed up once, inference on a bounded executor."""
+    model = SegmentationModel(torch_threads=threads)
+    model.warm_up()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    loop = asyncio.get_running_loop()
+    limit = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def request():
+        async with limit:
+            request_start = time.perf_counter()
+            await loop.run_in_executor(executor, model.predict, image)
+            latencies.append(time.perf_counter() - request_start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(request() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    executor.shutdown()
+    return report(requests, elapsed, latencies)
+
+
+def batched(image: Image.Image, requests: int, threads: int, batch_size: int) -> dict:
+    """person_masks over batches of batch_size images: one forward pass per batch."""
+    model = SegmentationModel(torch_threads=threads)
+    model.warm_up()
+    images = [image] * requests
+    latencies = []
+    start = time.perf_counter()
+    for first in range(0, requests, batch_size):
+        batch_start = time.perf_counter()
+        model.person_masks(images[first:first + batch_size], batch_size=batch_size)
+        latencies.append(time.perf_counter() - batch_start)
+    return report(requests, time.perf_counter() - start, latencies)
+
+
+def report(requests: int, elapsed: float, latencies: list) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": requests,
+        "rps": round(requests / elapsed, 3),
+        "p50_s": round(statistics.median(latencies), 3),
+        "max_s": round(latencies[-1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark segmentation throughput on CPU")
+    parser.add_argument("--requests", type=int, default=20, help="requests against the shared model")
+    parser.add_argument("--cold-requests", type=int, default=2, help="requests with a model load each (0 to skip)")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent client requests")
+    parser.add_argument("--threads", type=int, default=4, help="torch intra-op threads (MEDIA_TORCH_THREADS)")
+    parser.add_argument("--workers", type=int, default=1, help="inference executor size (MEDIA_INFERENCE_WORKERS)")
+    parser.add_argument("--size", type=int, default=520, help="square input size in pixels")
+    parser.add_argument("--batch-size", type=int, default=0, help="also time person_masks batches of this size (p50/max are per batch)")
+    args = parser.parse_args()
+
+    if torch.cuda.is_available():
+        print("CUDA is available; results below include GPU inference")
+    image = synthetic_image(args.size)
+
+    results = {}
+    if args.cold_requests:
+        results["model per request"] = cold(image, args.cold_requests, args.threads)
+    results[f"shared model ({args.workers} worker x {args.threads} threads)"] = asyncio.run(
+        warm(image, args.requests, args.concurrency, args.threads, args.workers)
+    )
+    if args.batch_size:
+        results[f"batches of {args.batch_size} ({args.threads} threads)"] = batched(image, args.requests, args.threads, args.batch_size)
+
+    print(f"\n{'mode':<42}{'requests':>10}{'req/s':>10}{'p50 s':>10}{'max s':>10}")
+    for name, result in results.items():
+        print(f"{name:<42}{result['requests']:>10}{result['rps']:>10}{result['p50_s']:>10}{result['max_s']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Latency and mask quality of the segmentation backends on CPU
+
+Runs every backend:runtime:working-size configuration over the same images
+and reports the median person_mask latency and the mask IoU against the
+current production model (full-precision DeepLabV3-ResNet101 at the
+original resolution). ONNX runtimes need onnxruntime and are skipped
+without it; their exported graphs are cached in MEDIA_ONNX_DIR.
+
+    python tests/benchmarks/bench_segmentation_backends.py --images assets/pic.jpg --repeats 3
+    python tests/benchmarks/bench_segmentation_backends.py --configs mobilenet:onnx_int8:512 lraspp:torch:384
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import numpy as np  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from app.Media.service import SegmentationModel  # noqa: E402
+
+REFERENCE = "resnet101:torch:0"
+DEFAULT_CONFIGS = [
+    "resnet101:torch:520",
+    "mobilenet:torch:520",
+    "mobilenet:onnx:520",
+    "mobilenet:onnx_int8:520",
+    "lraspp:torch:520",
+    "lraspp:onnx_int8:520",
+]
+
+
+def load_model(config: str, threads: int) -> SegmentationModel:
+    backend, runtime, size = config.split(":")
+    model = SegmentationModel(torch_threads=threads, backend=backend, runtime=runtime, working_size=int(size))
+    model.warm_up()
+    return model
+
+
+def iou(a: np.ndarray, b: np.ndarray) -> float:
+    union = np.logical_or(a, b).sum()
+    # Two empty masks agree perfectly
+    return float(np.logical_and(a, b).sum() / union) if union else 1.0
+
+
+def run(model: SegmentationModel, images: List[Image.Image], repeats: int):
+    """Median latency per image and the masks of the last repeat."""
+    latencies, masks = [], []
+    for image in images:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            mask = model.person_mask(image)
+            latencies.append(time.perf_counter() - start)
+        masks.append(np.asarray(mask) > 0)
+    return statistics.median(latencies), masks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare segmentation backends against the full-size ResNet101")
+    parser.add_argument("--images", nargs="+", default=["assets/pic.jpg"], help="photos with people in them")
+    parser.add_argument("--configs", nargs="+", default=DEFAULT_CONFIGS, help="backend:runtime:working-size")
+    parser.add_argument("--repeats", type=int, default=3, help="timed inferences per image")
+    parser.add_argument("--threads", type=int, default=4, help="intra-op threads (MEDIA_TORCH_THREADS)")
+    args = parser.parse_args()
+
+    images = [Image.open(path).convert("RGB") for path in args.images]
+    reference_latency, reference_masks = run(load_model(REFERENCE, args.threads), images, args.repeats)
+
+    print(f"\n{'configuration':<28}{'p50 s':>10}{'speedup':>10}{'IoU':>8}")
+    print(f"{REFERENCE:<28}{reference_latency:>10.3f}{1:>9.1f}x{1:>8.3f}")
+    for config in args.configs:
+        try:
+            model = load_model(config, args.threads)
+        except RuntimeError as e:
+            print(f"{config:<28}skipped: {e}")
+            continue
+        latency, masks = run(model, images, args.repeats)
+        mean_iou = statistics.mean(iou(mask, reference) for mask, reference in zip(masks, reference_masks))
+        print(f"{config:<28}{latency:>10.3f}{reference_latency / latency:>9.1f}x{mean_iou:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
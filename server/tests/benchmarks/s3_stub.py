@@ -0,0 +1,103 @@
+"""
+Minimal in-memory S3 stand-in for the MinIO client benchmarks
+
+Implements just what app/common/minio_client.py and async_minio_client.py
+call (path-style put/get/head/delete object, multi-object delete and
+multipart uploads), with a fixed per-request delay standing in for the
+network hop to MinIO. Signatures are not checked.
+
+Run:
+    STUB_S3_LATENCY_MS=5 uvicorn --app-dir tests/benchmarks s3_stub:app --port 9100
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import uuid
+from typing import Dict, List
+
+from fastapi import FastAPI, Request, Response
+
+LATENCY_MS = float(os.getenv("STUB_S3_LATENCY_MS", "5"))
+
+app = FastAPI(title="s3-stub")
+
+objects: Dict[str, bytes] = {}
+uploads: Dict[str, Dict[int, bytes]] = {}
+
+XML = "application/xml"
+DELETE_KEY_PATTERN = re.compile(r"<Key>(.*?)</Key>", re.DOTALL)
+
+
+def _etag(data: bytes) -> str:
+    return f'"{hashlib.md5(data).hexdigest()}"'
+
+
+def _not_found(key: str) -> Response:
+    body = f"<Error><Code>NoSuchKey</Code><Message>Not found</Message><Key>{key}</Key></Error>"
+    return Response(body, status_code=404, media_type=XML)
+
+
+@app.middleware("http")
+async def network_delay(request: Request, call_next):
+    await asyncio.sleep(LATENCY_MS / 1000)
+    return await call_next(request)
+
+
+@app.put("/{bucket}/{key:path}")
+async def put_object(bucket: str, key: str, request: Request):
+    body = await request.body()
+    upload_id = request.query_params.get("uploadId")
+    if upload_id:
+        uploads[upload_id][int(request.query_params["partNumber"])] = body
+    else:
+        objects[f"{bucket}/{key}"] = body
+    return Response(headers={"ETag": _etag(body)})
+
+
+@app.get("/{bucket}/{key:path}")
+async def get_object(bucket: str, key: str):
+    data = objects.get(f"{bucket}/{key}")
+    if data is None:
+        return _not_found(key)
+    return Response(data, media_type="application/octet-stream", headers={"ETag": _etag(data)})
+
+
+@app.head("/{bucket}/{key:path}")
+async def head_object(bucket: str, key: str):
+    data = objects.get(f"{bucket}/{key}")
+    if data is None:
+        return Response(status_code=404)
+    return Response(headers={"Content-Length": str(len(data)), "ETag": _etag(data)})
+
+
+@app.delete("/{bucket}/{key:path}")
+async def delete_object(bucket: str, key: str):
+    objects.pop(f"{bucket}/{key}", None)
+    return Response(status_code=204)
+
+
+@app.post("/{bucket}")
+async def delete_objects(bucket: str, request: Request):
+    keys: List[str] = DELETE_KEY_PATTERN.findall((await request.body()).decode())
+    for key in keys:
+        objects.pop(f"{bucket}/{key}", None)
+    return Response("<DeleteResult></DeleteResult>", media_type=XML)
+
+
+@app.post("/{bucket}/{key:path}")
+async def multipart(bucket: str, key: str, request: Request):
+    if "uploads" in request.query_params:
+        upload_id = uuid.uuid4().hex
+        uploads[upload_id] = {}
+        body = (f"<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>"
+                f"<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>")
+        return Response(body, media_type=XML)
+
+    parts = uploads.pop(request.query_params["uploadId"])
+    data = b"".join(parts[number] for number in sorted(parts))
+    objects[f"{bucket}/{key}"] = data
+    body = (f"<CompleteMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>"
+            f"<ETag>{_etag(data)}</ETag></CompleteMultipartUploadResult>")
+    return Response(body, media_type=XML)
@@ -0,0 +1,232 @@
+"""
+Load generator for the chatbot API
+
+Drives /chat-bot/ask, /chat-bot/ask/simple and /users/ with async httpx at a
+fixed concurrency and a weighted endpoint mix, then reports throughput,
+p50/p95/p99 latency and error rate per endpoint. Results are written as JSON
+so runs can be compared over time (--compare).
+
+Example (API started with OPENAI_BASE_URL pointing at tests/load/stub_llm.py):
+    python tests/load/loadtest.py --concurrency 16 --duration 60 --mix ask=6,simple=3,users=1
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+DEFAULT_QUESTIONS = [
+    "Who are my followers?",
+    "Who do I follow?",
+    "Show me my recent posts with their images",
+    "What places have I visited?",
+    "Show me posts with photos from the people I follow",
+    "What's in my bio?",
+    "Can you recommend places to visit?",
+    "Suggest some people I should follow",
+    "Hello!",
+    "What is 12 * 7?",
+]
+
+ENDPOINTS = {
+    "ask": ("POST", "/chat-bot/ask"),
+    "simple": ("POST", "/chat-bot/ask/simple"),
+    # The chat-app's page load: its first dropdown page (later pages only load on demand)
+    "users": ("GET", "/users/?fields=id,name&limit=100"),
+}
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Parse 'ask=6,simple=3,users=1' into endpoint weights."""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint '{name}' (choose from {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def parse_user_ids(value: str) -> List[int]:
+    """Parse '1-10' or '1,2,5' into user ids."""
+    if "-" in value:
+        start, end = value.split("-", 1)
+        return list(range(int(start), int(end) + 1))
+    return [int(v) for v in value.split(",")]
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Linear-interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = (len(sorted_values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(samples: List[dict], elapsed_s: float) -> dict:
+    """Aggregate (latency_ms, ok) samples into the per-endpoint report."""
+    latencies = sorted(s["latency_ms"] for s in samples if s["ok"])
+    errors = sum(1 for s in samples if not s["ok"])
+    error_statuses = Counter(str(s["status"]) for s in samples if not s["ok"])
+    total = len(samples)
+
+    def rounded(value):
+        return round(value, 2) if value is not None else None
+
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "throughput_rps": round(total / elapsed_s, 2) if elapsed_s else 0.0,
+        "mean_ms": rounded(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": rounded(percentile(latencies, 50)),
+        "p95_ms": rounded(percentile(latencies, 95)),
+        "p99_ms": rounded(percentile(latencies, 99)),
+        "max_ms": rounded(latencies[-1]) if latencies else None,
+        "error_statuses": dict(error_statuses),
+    }
+
+
+def build_request(endpoint: str, questions: List[str], user_ids: List[int], rng: random.Random) -> dict:
+    method, path = ENDPOINTS[endpoint]
+    if method == "GET":
+        return {"method": method, "url": path}
+    payload = {"question": rng.choice(questions), "user_id": rng.choice(user_ids)}
+    if endpoint == "ask":
+        payload["include_images"] = True
+    return {"method": method, "url": path, "json": payload}
+
+
+async def worker(client: httpx.AsyncClient, mix: Dict[str, float], questions: List[str],
+                 user_ids: List[int], samples: Dict[str, List[dict]], deadline: float, budget: dict, seed: int):
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        if budget["remaining"] is not None:
+            if budget["remaining"] <= 0:
+                return
+            budget["remaining"] -= 1
+
+        endpoint = rng.choices(names, weights)[0]
+        request = build_request(endpoint, questions, user_ids, rng)
+        start = time.perf_counter()
+        try:
+            response = await client.request(**request)
+            ok = response.status_code < 400
+            status = response.status_code
+        except httpx.HTTPError as e:
+            ok, status = False, type(e).__name__
+        samples[endpoint].append({"latency_ms": (time.perf_counter() - start) * 1000, "ok": ok, "status": status})
+
+
+async def run(args) -> dict:
+    mix = parse_mix(args.mix)
+    user_ids = parse_user_ids(args.user_ids)
+    questions = DEFAULT_QUESTIONS
+    if args.questions:
+        with open(args.questions) as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    samples: Dict[str, List[dict]] = {name: [] for name in mix}
+    budget = {"remaining": args.requests}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        deadline = start + args.duration if args.duration else float("inf")
+        await asyncio.gather(*(
+            worker(client, mix, questions, user_ids, samples, deadline, budget, args.seed + i)
+            for i in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+
+    all_samples = [s for endpoint_samples in samples.values() for s in endpoint_samples]
+    return {
+        "meta": {
+            "started_at": started_at.isoformat(),
+            "elapsed_s": round(elapsed, 2),
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "mix": mix,
+            "user_ids": args.user_ids,
+            "question_count": len(questions),
+            "git_commit": _git_commit(),
+        },
+        "endpoints": {name: summarize(endpoint_samples, elapsed) for name, endpoint_samples in samples.items()},
+        "total": summarize(all_samples, elapsed),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: dict, baseline: Optional[dict] = None) -> None:
+    columns = ["requests", "error_rate", "throughput_rps", "p50_ms", "p95_ms", "p99_ms"]
+    print(f"\n{'endpoint':<10}" + "".join(f"{c:>16}" for c in columns))
+    rows = {**report["endpoints"], "total": report["total"]}
+    for name, stats in rows.items():
+        print(f"{name:<10}" + "".join(f"{str(stats[c]):>16}" for c in columns))
+        if baseline:
+            base = baseline["endpoints"].get(name) if name != "total" else baseline.get("total")
+            if base:
+                deltas = []
+                for c in columns:
+                    if isinstance(stats[c], (int, float)) and isinstance(base.get(c), (int, float)) and base[c]:
+                        deltas.append(f"{(stats[c] - base[c]) / base[c] * 100:+.1f}%")
+                    else:
+                        deltas.append("-")
+                print(f"{'  vs base':<10}" + "".join(f"{d:>16}" for d in deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the chatbot API")
+    parser.add_argument("--base-url", default=os.getenv("LOADTEST_BASE_URL", "http://localhost:8000"))
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60, help="seconds to run (0 = until --requests is reached)")
+    parser.add_argument("--requests", type=int, default=None, help="stop after this many requests")
+    parser.add_argument("--mix", default="ask=6,simple=3,users=1", help="endpoint weights, e.g. ask=6,simple=3,users=1")
+    parser.add_argument("--questions", help="file with one question per line (default: built-in mix)")
+    parser.add_argument("--user-ids", default="1-10", help="user ids to ask as, e.g. 1-10 or 1,2,5")
+    parser.add_argument("--timeout", type=float, default=120, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON results path (default: tests/load/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="previous results JSON to print deltas against")
+    args = parser.parse_args()
+    if not args.duration and not args.requests:
+        parser.error("set --duration or --requests")
+
+    report = asyncio.run(run(args))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    output = args.output or os.path.join(
+        os.path.dirname(__file__), "results", datetime.now().strftime("%Y%m%d-%H%M%S") + ".json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
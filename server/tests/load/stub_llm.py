@@ -0,0 +1,156 @@
+"""
+Local stand-in for the OpenAI chat completions API, for load tests
+
+Answers the calls the chatbot graph makes with canned but well-formed
+responses, after a configurable delay, so a load run measures our own
+pipeline (routing, SQL against local Postgres, post-processing) instead of
+OpenAI's latency and rate limits.
+
+- Classifier prompt: a category picked from keywords in the query
+- Forced function calls (supervisor `route`, structured summarizer output): arguments built from the schema
+- SQL agent: one real `sql_db_query` tool call, then an answer that quotes its result
+- Other agents: a direct answer (no web search / calculator calls)
+
+Run:
+    STUB_LLM_LATENCY_MS=300 uvicorn --app-dir tests/load stub_llm:app --port 8100
+then start the API with OPENAI_BASE_URL=http://localhost:8100/v1
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+LATENCY_MS = float(os.getenv("STUB_LLM_LATENCY_MS", "300"))
+JITTER_MS = float(os.getenv("STUB_LLM_JITTER_MS", "100"))
+
+MEDIA_PATTERN = re.compile(r"\b(photo|image|picture|pic|post)s?\b", re.IGNORECASE)
+RECOMMEND_PATTERN = re.compile(r"\b(recommend|suggest)", re.IGNORECASE)
+GREETING_PATTERN = re.compile(r"\b(hi|hello|hey|thanks)\b|\d+\s*[-+*/]\s*\d+", re.IGNORECASE)
+
+USERS_QUERY = "SELECT id, name, bio, avatar_url FROM users ORDER BY id LIMIT 5"
+POSTS_QUERY = "SELECT post_id, author_name, caption, media_url FROM post_feed ORDER BY created_at DESC LIMIT 5"
+
+app = FastAPI(title="stub-llm")
+
+
+def _text(content) -> str:
+    """Flatten OpenAI message content (string or content parts) to text."""
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _first_user_text(messages) -> str:
+    for message in messages:
+        if message.get("role") == "user":
+            return _text(message.get("content"))
+    return ""
+
+
+def _classify(prompt: str) -> str:
+    query = prompt.split("Query:", 1)[-1].split("Respond with", 1)[0]
+    if RECOMMEND_PATTERN.search(query):
+        return "RECOMMENDER"
+    if GREETING_PATTERN.search(query):
+        return "ASSISTANT"
+    return "SQL"
+
+
+def _arguments_for(schema: dict, user_text: str) -> dict:
+    """Fill a function's JSON schema with plausible values."""
+    arguments = {}
+    for name, spec in schema.get("properties", {}).items():
+        enum = spec.get("enum") or next((o["enum"] for o in spec.get("anyOf", []) if "enum" in o), None)
+        if enum:
+            # The supervisor only runs after a worker has answered, so finish
+            arguments[name] = "FINISH" if "FINISH" in enum else enum[0]
+        elif spec.get("type") == "object":
+            arguments[name] = _arguments_for(spec, user_text)
+        elif spec.get("type") == "array":
+            arguments[name] = []
+        else:
+            arguments[name] = f"Here's what I found: {user_text[:4000]}"
+    return arguments
+
+
+def _message(content=None, tool_calls=None, function_call=None) -> dict:
+    message = {"role": "assistant", "content": content}
+    if tool_calls:
+        message["tool_calls"] = tool_calls
+    if function_call:
+        message["function_call"] = function_call
+    return message
+
+
+def _respond(body: dict) -> dict:
+    messages = body.get("messages", [])
+    user_text = _first_user_text(messages)
+    last = messages[-1] if messages else {}
+
+    # Forced function call: supervisor routing or structured summarizer output
+    function_call = body.get("function_call")
+    if isinstance(function_call, dict) and body.get("functions"):
+        function = next(f for f in body["functions"] if f["name"] == function_call["name"])
+        found = _text(last.get("content"))
+        if "**Information Found**:" in found:
+            # Summarizer: answer with what the workers found
+            found = found.split("**Information Found**:", 1)[1].split("Respond in a friendly", 1)[0].strip()
+        arguments = _arguments_for(function.get("parameters", {}), found)
+        return _message(function_call={"name": function["name"], "arguments": json.dumps(arguments)})
+
+    tool_names = {t["function"]["name"] for t in body.get("tools", [])}
+    if "sql_db_query" in tool_names:
+        if last.get("role") == "tool":
+            return _message(content=f"Sure! Here's what I found:\n{_text(last.get('content'))[:2000]}")
+        query = POSTS_QUERY if MEDIA_PATTERN.search(user_text) else USERS_QUERY
+        return _message(tool_calls=[{
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": "sql_db_query", "arguments": json.dumps({"query": query})},
+        }])
+
+    if "Classify this user query" in user_text:
+        return _message(content=_classify(user_text))
+
+    return _message(content=f"Happy to help! You asked: {user_text[-200:]}")
+
+
+def _stream(completion: dict):
+    """Server-sent events for stream=true: the whole message in one delta, then the finish chunk."""
+    choice = completion["choices"][0]
+    delta = dict(choice["message"])
+    if "tool_calls" in delta:
+        delta["tool_calls"] = [{"index": i, **call} for i, call in enumerate(delta["tool_calls"])]
+    chunk = {k: completion[k] for k in ("id", "created", "model")}
+    chunk["object"] = "chat.completion.chunk"
+    yield f"data: {json.dumps({**chunk, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}]})}\n\n"
+    yield f"data: {json.dumps({**chunk, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': choice['finish_reason']}]})}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    await asyncio.sleep(max(0.0, LATENCY_MS + random.uniform(-JITTER_MS, JITTER_MS)) / 1000)
+
+    message = _respond(body)
+    finish_reason = "tool_calls" if "tool_calls" in message else "function_call" if "function_call" in message else "stop"
+    completion = {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+    if body.get("stream"):
+        # Agent executors stream the model even when the caller doesn't
+        return StreamingResponse(_stream(completion), media_type="text/event-stream")
+    return completion
@@ -0,0 +1,66 @@
+import asyncio
+import io
+
+from botocore.stub import Stubber
+
+from app.common.async_minio_client import AsyncMinIOClient, BufferReader
+
+
+def test_buffer_reader_reads_parts_without_copying_the_source():
+    data = bytearray(b"0123456789")
+    reader = BufferReader(data)
+
+    assert reader.read(4) == b"0123"
+    data[4] = ord("X")  # shares memory with the caller's buffer
+    assert reader.read(3) == b"X56"
+    assert reader.seek(-2, io.SEEK_END) == 8
+    assert reader.read() == b"89"
+    reader.seek(0)
+    assert reader.read(100) == b"0123X56789"
+
+
+def test_exists_many_treats_only_not_found_as_missing():
+    client = AsyncMinIOClient(max_connections=1)
+    with Stubber(client.client) as stub:
+        stub.add_response("head_object", {}, {"Bucket": client.bucket, "Key": "a.jpg"})
+        stub.add_client_error("head_object", service_error_code="404", http_status_code=404)
+
+        assert asyncio.run(client.exists_many(["a.jpg", "b.jpg", "a.jpg"])) == {"a.jpg": True, "b.jpg": False}
+    client.close()
+
+
+def test_delete_many_batches_keys_and_reports_failures():
+    client = AsyncMinIOClient(max_connections=1)
+    keys = [f"k{i}" for i in range(1500)]
+    with Stubber(client.client) as stub:
+        stub.add_response(
+            "delete_objects",
+            {"Errors": [{"Key": "k7", "Code": "AccessDenied"}]},
+            {"Bucket": client.bucket, "Delete": {"Objects": [{"Key": k} for k in keys[:1000]], "Quiet": True}},
+        )
+        stub.add_response(
+            "delete_objects",
+            {},
+            {"Bucket": client.bucket, "Delete": {"Objects": [{"Key": k} for k in keys[1000:]], "Quiet": True}},
+        )
+
+        assert asyncio.run(client.delete_many(keys)) == ["k7"]
+    client.close()
+
+
+def test_download_buffer_fills_one_preallocated_buffer():
+    from botocore.response import StreamingBody
+
+    data = bytes(range(256)) * 3000
+    client = AsyncMinIOClient(max_connections=1)
+    with Stubber(client.client) as stub:
+        stub.add_response(
+            "get_object",
+            {"Body": StreamingBody(io.BytesIO(data), len(data)), "ContentLength": len(data)},
+            {"Bucket": client.bucket, "Key": "big.bin"},
+        )
+        buffer = asyncio.run(client.download_buffer("big.bin"))
+    client.close()
+
+    assert isinstance(buffer, bytearray)
+    assert buffer == data
@@ -0,0 +1,71 @@
+import asyncio
+
+from app.chatbot.service import ChatBotService
+
+
+class FakeGraph:
+    def __init__(self):
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def invoke(self, question, user_id, chat_history=None, cached_data=None):
+        self.calls.append((user_id, question))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        # Later items finish first so completion order differs from request order
+        await asyncio.sleep(0.01 if question == "slow" else 0)
+        self.in_flight -= 1
+        if question == "boom":
+            raise RuntimeError("boom")
+        return f"{user_id}:{question}"
+
+
+def run_batch(items, concurrency):
+    service = ChatBotService.__new__(ChatBotService)
+    service.graphService = FakeGraph()
+
+    async def collect():
+        return [r async for r in service.ask_batch(items, concurrency=concurrency)]
+
+    return service.graphService, asyncio.run(collect())
+
+
+def test_batch_streams_every_item_with_bounded_concurrency():
+    items = [(1, "slow"), (2, "fast"), (3, "fast"), (4, "fast")]
+    graph, results = run_batch(items, concurrency=2)
+
+    assert graph.max_in_flight == 2
+    assert sorted(r["index"] for r in results) == [0, 1, 2, 3]
+    assert results[-1]["index"] == 0
+    assert {r["index"]: r["response"] for r in results}[2] == "3:fast"
+
+
+def test_batch_dedupes_identical_items_and_isolates_errors():
+    items = [(1, "same"), (1, "same"), (2, "boom")]
+    graph, results = run_batch(items, concurrency=4)
+
+    assert graph.calls.count((1, "same")) == 1
+    by_index = {r["index"]: r for r in results}
+    assert by_index[0]["response"] == by_index[1]["response"] == "1:same"
+    assert by_index[2]["error"] == "Internal Server Error"
+
+
+def test_batch_formatting_error_only_fails_that_item():
+    service = ChatBotService.__new__(ChatBotService)
+    service.graphService = FakeGraph()
+    format_answer = service._format_answer
+
+    async def flaky_format(output, include_image_metadata):
+        if output == "2:bad":
+            raise ValueError("media lookup failed")
+        return await format_answer(output, include_image_metadata)
+
+    service._format_answer = flaky_format
+
+    async def collect():
+        return [r async for r in service.ask_batch([(1, "ok"), (2, "bad")], concurrency=2)]
+
+    by_index = {r["index"]: r for r in asyncio.run(collect())}
+    assert by_index[0]["response"] == "1:ok"
+    assert by_index[1]["error"] == "Internal Server Error"
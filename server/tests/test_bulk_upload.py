@@ -0,0 +1,139 @@
+import json
+import os
+
+from app.Media.bulk_upload import BulkMediaUploader, object_key
+
+
+class FakeConnection:
+    """Serves media rows to the paged SELECT and records UPDATE batches."""
+
+    def __init__(self, rows):
+        self.rows = dict(rows)
+        self.updates = []
+
+    def execute(self, statement, params):
+        sql = str(statement)
+        if sql.startswith("SELECT"):
+            page = [(i, url) for i, url in sorted(self.rows.items()) if i > params["last_id"] and "minio" not in url]
+            return Result(page[:1000])
+        batch = {
+            params[f"id_{i}"]: params[f"url_{i}"]
+            for i in range(len(params) // 3)
+            if self.rows[params[f"id_{i}"]] == params[f"source_{i}"]
+        }
+        self.updates.append(batch)
+        self.rows.update(batch)
+        return Result([])
+
+
+class Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class FakeUploader(BulkMediaUploader):
+    """own_transactions runs like the CLI (no caller connection, each UPDATE committed on its own)."""
+
+    def __init__(self, connection, checkpoint_path, failing=(), own_transactions=False):
+        super().__init__(
+            connection=None if own_transactions else connection,
+            workers=3, batch_size=2, checkpoint_path=checkpoint_path
+        )
+        self.fake_connection = connection
+        self.failing = set(failing)
+        self.copied = []
+
+    def _execute(self, statement, params, fetch=True):
+        result = self.fake_connection.execute(statement, params)
+        return result.all() if fetch else None
+
+    def _copy(self, media_id, source_url):
+        self.copied.append(media_id)
+        if media_id in self.failing:
+            raise RuntimeError("source timed out")
+        return f"http://minio:9000/media/photos/media_{media_id}.jpg", 1000
+
+
+def test_object_key_matches_migration_layout():
+    assert object_key(12, "https://images.unsplash.com/photo-1", "image/jpeg") == "photos/media_12.jpg"
+    assert object_key(3, "https://i.pravatar.cc/150?img=3", "image/png") == "avatars/media_3.png"
+
+
+def test_batches_updates_and_resumes_after_failures(tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.jsonl")
+    conn = FakeConnection({i: f"https://images.unsplash.com/photo-{i}" for i in range(1, 6)})
+
+    summary = FakeUploader(conn, checkpoint, failing={3}, own_transactions=True).run()
+
+    assert summary["uploaded"] == 4 and summary["failed"] == 1
+    assert all(len(batch) <= 2 for batch in conn.updates)
+    assert sum(len(batch) for batch in conn.updates) == 4
+    assert conn.rows[3] == "https://images.unsplash.com/photo-3"
+    entries = [json.loads(line) for line in open(checkpoint)]
+    assert {e["id"] for e in entries if "url" in e} == {1, 2, 4, 5}
+
+    # Second run: retries only the failed row, without replaying the committed UPDATEs
+    conn.updates.clear()
+    retry = FakeUploader(conn, checkpoint, own_transactions=True)
+    summary = retry.run()
+
+    assert retry.copied == [3]
+    assert summary["resumed"] == 0 and summary["uploaded"] == 1
+    assert conn.updates == [{3: "http://minio:9000/media/photos/media_3.jpg"}]
+    assert all("minio" in url for url in conn.rows.values())
+    # A run without failures that committed its own UPDATEs leaves no checkpoint behind
+    assert not os.path.exists(checkpoint)
+
+
+def test_checkpoint_outlives_a_run_inside_the_callers_transaction(tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.jsonl")
+    conn = FakeConnection({i: f"https://images.unsplash.com/photo-{i}" for i in range(1, 4)})
+
+    FakeUploader(conn, checkpoint).run()
+
+    # The migration's transaction rolls back: the rows point at their sources again
+    conn.rows = {i: f"https://images.unsplash.com/photo-{i}" for i in range(1, 4)}
+    rerun = FakeUploader(conn, checkpoint)
+    summary = rerun.run()
+
+    assert rerun.copied == []
+    assert summary["resumed"] == 3
+    assert all("minio" in url for url in conn.rows.values())
+
+
+def interrupted_checkpoint(path, uploader, media_ids):
+    with open(path, "w") as f:
+        f.write(json.dumps({"scope": uploader._scope()}) + "\n")
+        for i in media_ids:
+            entry = {"id": i, "source": f"https://images.unsplash.com/photo-{i}", "url": f"http://minio:9000/media/photos/media_{i}.jpg"}
+            f.write(json.dumps(entry) + "\n")
+
+
+def test_resumes_uploads_whose_update_did_not_land(tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.jsonl")
+    conn = FakeConnection({i: f"https://images.unsplash.com/photo-{i}" for i in range(1, 5)})
+    uploader = FakeUploader(conn, checkpoint)
+    interrupted_checkpoint(checkpoint, uploader, [1, 2])
+
+    summary = uploader.run()
+
+    assert uploader.copied == [3, 4]
+    assert summary["resumed"] == 2 and summary["uploaded"] == 2
+    assert all("minio" in url for url in conn.rows.values())
+
+
+def test_checkpoint_for_another_database_or_bucket_is_discarded(tmp_path, monkeypatch):
+    checkpoint = str(tmp_path / "checkpoint.jsonl")
+    conn = FakeConnection({i: f"https://images.unsplash.com/photo-{i}" for i in range(1, 4)})
+    uploader = FakeUploader(conn, checkpoint)
+    interrupted_checkpoint(checkpoint, uploader, [1, 2, 3])
+    monkeypatch.setattr(uploader.client, "bucket", "fresh-bucket")
+
+    summary = uploader.run()
+
+    # The recorded objects live in the old bucket, so everything is copied again
+    assert uploader.copied == [1, 2, 3]
+    assert summary["resumed"] == 0 and summary["uploaded"] == 3
@@ -0,0 +1,35 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.chatbot import router as chat_router
+
+
+class FakeChatBotService:
+    async def stream_question(self, session, question, include_image_metadata=True, cancel_event=None):
+        yield {"type": "answer", "text": f"echo {question}"}
+
+
+def connect(monkeypatch):
+    async def load_profile(session):
+        session.profile, session.profile_text = None, ""
+
+    monkeypatch.setattr(chat_router, "chat_bot_service", FakeChatBotService())
+    monkeypatch.setattr(chat_router.ChatSession, "load_profile", load_profile)
+    app = FastAPI()
+    app.include_router(chat_router.chat_bot_router)
+    return TestClient(app).websocket_connect("/chat-bot/ws?user_id=1")
+
+
+def test_malformed_frames_get_an_error_and_keep_the_connection(monkeypatch):
+    with connect(monkeypatch) as websocket:
+        assert websocket.receive_json()["type"] == "session"
+
+        websocket.send_text("not json")
+        assert websocket.receive_json()["type"] == "error"
+        websocket.send_json(["a", "list"])
+        assert websocket.receive_json()["type"] == "error"
+        websocket.send_bytes(b'{"question": "binary"}')
+        assert websocket.receive_json()["type"] == "error"
+
+        websocket.send_json({"question": "hi"})
+        assert websocket.receive_json() == {"type": "answer", "text": "echo hi", "question_id": 1}
@@ -0,0 +1,74 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from app.Media.compositing import composite_onto, encode, open_image, output_format, pack_mask, unpack_mask
+
+
+def _encode(image: Image.Image, fmt: str = "PNG") -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def test_pack_mask_round_trip_is_one_bit_per_pixel():
+    mask = np.zeros((7, 13), dtype=np.uint8)
+    mask[2:5, 3:9] = 255
+    packed = pack_mask(Image.fromarray(mask, mode="L"))
+
+    assert len(packed) == (7 * 13 + 7) // 8
+    assert np.array_equal(np.asarray(unpack_mask(packed, (13, 7))), mask)
+
+
+def test_composite_takes_person_from_host_and_rest_from_background():
+    host = Image.new("RGB", (8, 4), (255, 0, 0))
+    background = open_image(_encode(Image.new("RGB", (16, 8), (0, 0, 255))))
+    mask = np.zeros((4, 8), dtype=np.uint8)
+    mask[:, :4] = 255
+
+    output = encode(composite_onto(host, background, unpack_mask(pack_mask(Image.fromarray(mask, mode="L")), (8, 4))), "out.png")
+    pixels = np.asarray(Image.open(io.BytesIO(output.getbuffer())))
+
+    assert pixels.shape == (4, 8, 3)
+    assert tuple(pixels[0, 0]) == (255, 0, 0)
+    assert tuple(pixels[0, 7]) == (0, 0, 255)
+
+
+def test_open_image_decodes_at_reduced_size_for_a_smaller_target():
+    large = Image.effect_mandelbrot((1600, 1200), (-2, -1.5, 1, 1.5), 50).convert("RGB")
+
+    jpeg = open_image(bytearray(_encode(large, "JPEG")), fit=(300, 200))
+    png = open_image(memoryview(_encode(large)), fit=(300, 200))
+
+    # JPEG: DCT scaling to 1/4 (1/8 would be smaller than the target); PNG: the largest
+    # integer factor that still covers it
+    assert jpeg.size == (400, 300)
+    assert png.size == (320, 240)
+    assert open_image(_encode(large)).size == (1600, 1200)
+
+
+def test_open_background_resizes_in_bands_like_one_resize(monkeypatch):
+    import app.Media.compositing as compositing
+
+    monkeypatch.setattr(compositing, "RESIZE_BAND_ROWS", 16)
+    source = Image.effect_mandelbrot((300, 200), (-2, -1.5, 1, 1.5), 50).convert("RGB")
+
+    banded = np.asarray(compositing.open_background(_encode(source), (170, 90))).astype(int)
+    whole = np.asarray(source.resize((170, 90), Image.BILINEAR)).astype(int)
+
+    assert banded.shape == whole.shape
+    assert np.abs(banded - whole).max() <= 1
+
+
+def test_unpacked_mask_shares_the_unpacked_array():
+    mask = unpack_mask(bytes([0b10100000]), (3, 1))
+    assert list(np.asarray(mask)[0]) == [255, 0, 255]
+    assert mask.mode == "L"
+
+
+def test_output_format_follows_extension():
+    assert output_format("generated/a.png") == ("PNG", "image/png")
+    assert output_format("generated/a.WEBP") == ("WEBP", "image/webp")
+    assert output_format("generated/a.jpg") == ("JPEG", "image/jpeg")
+    assert output_format("generated/a") == ("JPEG", "image/jpeg")
@@ -0,0 +1,126 @@
+import io
+import json
+from collections import namedtuple
+from contextlib import contextmanager
+
+from PIL import Image
+
+from app.common import image_derivatives
+from app.common.image_derivatives import backfill, derivative_key, generate_derivatives, thumbnail_key, upload_image
+
+
+def encoded(size, fmt="JPEG", exif=None):
+    buffer = io.BytesIO()
+    image = Image.new("RGB", size, (200, 120, 40))
+    if exif:
+        image.save(buffer, fmt, exif=exif)
+    else:
+        image.save(buffer, fmt)
+    return buffer.getvalue()
+
+
+class RecordingClient:
+    def __init__(self):
+        self.uploads = {}
+
+    def upload_file(self, data, key, content_type="application/octet-stream"):
+        self.uploads[key] = (data, content_type)
+        return f"http://minio:9000/media/{key}"
+
+
+class StoredClient(RecordingClient):
+    """Serves originals to backfill through client.get_object."""
+
+    bucket = "media"
+
+    def __init__(self, originals):
+        super().__init__()
+        self.client = self
+        self.originals = originals
+
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO(self.originals[Key])}
+
+
+MediaRow = namedtuple("MediaRow", "id external_resource_url meta")
+
+
+class FakeEngine:
+    """Returns the media rows to backfill and records each UPDATE's parameters."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.updates = []
+
+    @contextmanager
+    def connect(self):
+        yield self
+
+    begin = connect
+
+    def execute(self, statement, params=None):
+        if str(statement).startswith("UPDATE"):
+            self.updates.append(params)
+        return self
+
+    def all(self):
+        return self.rows
+
+
+def test_variants_keep_aspect_ratio_and_skip_upscaling():
+    (width, height), variants = generate_derivatives(encoded((1920, 1280)), {"preview": 960, "thumb": 320}, fmt="webp")
+
+    assert (width, height) == (1920, 1280)
+    assert {name: (v["width"], v["height"]) for name, v in variants.items()} == {"preview": (960, 640), "thumb": (320, 213)}
+    assert Image.open(io.BytesIO(variants["thumb"]["data"])).format == "WEBP"
+
+    _, small = generate_derivatives(encoded((500, 400)), {"preview": 960, "thumb": 320}, fmt="jpeg")
+    assert list(small) == ["thumb"]
+    assert small["thumb"]["content_type"] == "image/jpeg"
+
+
+def test_rotated_exif_reports_displayed_size():
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotate 90 degrees clockwise
+    (width, height), variants = generate_derivatives(encoded((1200, 800), exif=exif), {"thumb": 300}, fmt="webp")
+
+    assert (width, height) == (800, 1200)
+    assert (variants["thumb"]["width"], variants["thumb"]["height"]) == (200, 300)
+
+
+def test_upload_image_stores_variants_under_deterministic_keys():
+    client = RecordingClient()
+
+    url, meta = upload_image(encoded((1920, 1280)), "photos/media_1.jpg", client=client)
+
+    assert url == "http://minio:9000/media/photos/media_1.jpg"
+    assert set(client.uploads) == {"photos/media_1.jpg", derivative_key("photos/media_1.jpg", "preview"), derivative_key("photos/media_1.jpg", "thumb")}
+    assert derivative_key("photos/media_1.jpg", "thumb", "webp") == "derivatives/thumb/photos/media_1.webp"
+    assert thumbnail_key(meta) == "derivatives/thumb/photos/media_1.webp"
+    assert thumbnail_key({"type": "image"}) is None
+
+
+def test_upload_image_keeps_original_when_variants_fail():
+    client = RecordingClient()
+
+    url, meta = upload_image(b"not an image", "photos/broken.jpg", client=client)
+
+    assert url.endswith("photos/broken.jpg")
+    assert meta == {}
+    assert list(client.uploads) == ["photos/broken.jpg"]
+
+
+def test_backfill_writes_meta_in_batched_updates(monkeypatch):
+    rows = [MediaRow(i, f"http://minio:9000/media/photos/media_{i}.jpg", {"type": "image"}) for i in range(1, 6)]
+    rows.append(MediaRow(6, "https://example.com/elsewhere.jpg", None))
+    engine = FakeEngine(rows)
+    monkeypatch.setattr(image_derivatives, "engine", engine)
+    client = StoredClient({f"photos/media_{i}.jpg": encoded((800, 600)) for i in range(1, 6)})
+
+    assert backfill(client=client, batch_size=2) == 5
+
+    assert [len(params) // 2 for params in engine.updates] == [2, 2, 1]
+    written = {params[f"id_{i}"]: json.loads(params[f"meta_{i}"]) for params in engine.updates for i in range(len(params) // 2)}
+    assert sorted(written) == [1, 2, 3, 4, 5]
+    assert written[1]["type"] == "image"
+    assert thumbnail_key(written[1]) == "derivatives/thumb/photos/media_1.webp"
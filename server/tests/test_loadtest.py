@@ -0,0 +1,26 @@
+from load.loadtest import parse_mix, percentile, summarize
+
+
+def test_percentile_interpolates_between_samples():
+    values = [10.0, 20.0, 30.0, 40.0, 50.0]
+    assert percentile(values, 50) == 30.0
+    assert percentile(values, 95) == 48.0
+    assert percentile([], 99) is None
+
+
+def test_summarize_reports_error_rate_and_latency_of_successes_only():
+    samples = [
+        {"latency_ms": 100.0, "ok": True, "status": 200},
+        {"latency_ms": 300.0, "ok": True, "status": 200},
+        {"latency_ms": 5.0, "ok": False, "status": 500},
+        {"latency_ms": 9.0, "ok": False, "status": "ReadTimeout"},
+    ]
+    report = summarize(samples, elapsed_s=2.0)
+    assert report["error_rate"] == 0.5
+    assert report["throughput_rps"] == 2.0
+    assert report["p50_ms"] == 200.0
+    assert report["error_statuses"] == {"500": 1, "ReadTimeout": 1}
+
+
+def test_parse_mix_weights():
+    assert parse_mix("ask=6,users=1") == {"ask": 6.0, "users": 1.0}
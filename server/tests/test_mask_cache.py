@@ -0,0 +1,84 @@
+import io
+
+import numpy as np
+from botocore.exceptions import ClientError
+from PIL import Image
+
+from app.Media.compositing import pack_mask, unpack_mask
+from app.Media.mask_cache import MaskCache, content_digest, mask_key
+
+
+class FakeMinIO:
+    """Just enough of MinIOClient for MaskCache: a dict of objects."""
+
+    bucket = "media"
+
+    def __init__(self):
+        self.objects = {}
+        self.reads = 0
+        self.client = self
+
+    def get_object(self, Bucket, Key):
+        self.reads += 1
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        return {"Body": io.BytesIO(self.objects[Key])}
+
+    def upload_file(self, data, key, content_type):
+        self.objects[key] = data
+        return f"http://minio/{key}"
+
+
+def _mask(width=10, height=6):
+    pixels = np.zeros((height, width), dtype=np.uint8)
+    pixels[1:4, 2:7] = 255
+    return Image.fromarray(pixels, mode="L")
+
+
+def test_put_then_get_from_memory_and_minio():
+    minio = FakeMinIO()
+    cache = MaskCache(minio)
+    digest = content_digest(b"portrait")
+    mask = _mask()
+
+    assert cache.get(digest, "v1") is None
+    cache.put(digest, "v1", mask.size, pack_mask(mask))
+
+    assert cache.get(digest, "v1") == (mask.size, pack_mask(mask))
+    assert minio.reads == 1  # the first miss; the hit came from memory
+
+    # A fresh process (empty LRU) reads the stored copy
+    size, packed = MaskCache(minio).get(digest, "v1")
+    assert np.array_equal(np.asarray(unpack_mask(packed, size)), np.asarray(mask))
+    assert len(minio.objects[mask_key(digest, "v1")]) == 8 + len(pack_mask(mask))
+
+
+def test_model_version_is_part_of_the_key():
+    cache = MaskCache(FakeMinIO())
+    mask = _mask()
+    cache.put("ab" * 32, "resnet101-torch@full", mask.size, pack_mask(mask))
+
+    assert cache.get("ab" * 32, "mobilenet-onnx_int8@512") is None
+
+
+def test_memory_is_bounded_by_bytes():
+    cache = MaskCache(FakeMinIO(), max_bytes=20)
+    for i in range(5):
+        cache.put(f"{i:064x}", "v1", (80, 1), bytes(10))
+
+    assert len(cache._masks) == 2
+    assert cache._bytes == 20
+
+
+def test_unreachable_minio_is_a_miss():
+    class Down(FakeMinIO):
+        def get_object(self, Bucket, Key):
+            raise ConnectionError("refused")
+
+        def upload_file(self, data, key, content_type):
+            raise ConnectionError("refused")
+
+    cache = MaskCache(Down())
+    assert cache.get("00" * 32, "v1") is None
+    cache.put("00" * 32, "v1", (8, 1), bytes(1))
+    assert cache.get("00" * 32, "v1") == ((8, 1), bytes(1))
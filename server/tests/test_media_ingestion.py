@@ -0,0 +1,146 @@
+import hashlib
+import io
+
+from PIL import Image
+from sqlalchemy.exc import IntegrityError
+
+from app.Media.ingestion import MediaIngestionService, content_key, hash_stream
+
+
+class RecordingClient:
+    bucket = "media"
+
+    def __init__(self):
+        self.uploads = []
+        self.client = self  # stands in for the boto3 client as well
+
+    def upload_file(self, data, key, content_type="application/octet-stream"):
+        self.uploads.append(key)
+        return self.get_file_url(key)
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None):
+        self.uploads.append(key)
+
+    def get_file_url(self, key):
+        return f"http://minio:9000/media/{key}"
+
+
+class InMemoryIngestion(MediaIngestionService):
+    """Hash index kept in a dict instead of Postgres."""
+
+    def __init__(self, client):
+        super().__init__(client)
+        self.rows = {}
+
+    def _find_by_hash(self, digest):
+        return self.rows.get(digest)
+
+    def _insert(self, url, meta, digest, size):
+        row = {"id": len(self.rows) + 1, "external_resource_url": url, "meta": meta}
+        self.rows[digest] = row
+        return row
+
+
+def jpeg(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def test_hash_stream_hashes_file_objects_in_chunks():
+    data = b"x" * 2500
+
+    spool, digest, size = hash_stream(io.BytesIO(data), chunk_size=1000)
+
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert size == 2500
+    assert spool.read() == data
+
+
+def test_content_key_is_derived_from_the_hash():
+    digest = hashlib.sha256(b"abc").hexdigest()
+
+    assert content_key(digest, "image/jpeg") == f"sha256/ba/{digest}.jpg"
+    assert content_key(digest, "image/webp").endswith(".webp")
+
+
+def test_identical_content_is_stored_once():
+    client = RecordingClient()
+    service = InMemoryIngestion(client)
+    photo = jpeg((10, 20, 30))
+
+    first, created = service.ingest(photo, "image/jpeg", meta={"tags": ["beach"]})
+    again, created_again = service.ingest(io.BytesIO(photo), "image/jpeg")
+    other, _ = service.ingest(jpeg((200, 20, 30)), "image/jpeg")
+
+    assert created and not created_again
+    assert again == first
+    assert other["id"] != first["id"]
+    assert first["meta"]["sha256"] == hashlib.sha256(photo).hexdigest()
+    assert first["meta"]["tags"] == ["beach"]
+    assert "thumb" in first["meta"]["variants"]
+    # Original + thumb variant per unique photo; nothing for the duplicate
+    assert len(client.uploads) == 4
+
+
+def test_lost_insert_race_returns_the_winning_row():
+    service = InMemoryIngestion(RecordingClient())
+    winner = {"id": 7, "external_resource_url": "http://minio:9000/media/x", "meta": {}}
+    lookups = iter([None, winner])
+    service._find_by_hash = lambda digest: next(lookups)
+
+    def conflict(*args):
+        raise IntegrityError("INSERT", {}, Exception("duplicate key"))
+    service._insert = conflict
+
+    assert service.ingest(b"same bytes", "application/octet-stream") == (winner, False)
+
+
+class StoredObjects(RecordingClient):
+    """Existing objects served to the hash backfill through get_object."""
+
+    def __init__(self, objects):
+        super().__init__()
+        self.objects = objects
+
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO(self.objects[Key])}
+
+
+class BackfillIngestion(InMemoryIngestion):
+    """Media rows without a hash entry, and an index that keeps the first row per hash."""
+
+    def __init__(self, client, media):
+        super().__init__(client)
+        self.media = media
+        self.batches = []
+
+    def _unhashed_rows(self, limit):
+        indexed = {row["id"] for row in self.rows.values()}
+        return [(media_id, url) for media_id, url in sorted(self.media.items()) if media_id not in indexed][:limit]
+
+    def _insert_hashes(self, entries):
+        self.batches.append(len(entries))
+        new = [(digest, media_id) for digest, media_id, _ in entries if digest not in self.rows]
+        for digest, media_id in new:
+            self.rows.setdefault(digest, {"id": media_id, "external_resource_url": self.media[media_id], "meta": {}})
+        return len({digest for digest, _ in new})
+
+
+def test_backfill_indexes_existing_media_so_reuploads_are_deduplicated():
+    beach, avatar = jpeg((10, 120, 200)), jpeg((200, 10, 10))
+    client = StoredObjects({"photos/media_1.jpg": beach, "avatars/media_2.jpg": avatar, "photos/media_3.jpg": beach})
+    ingestion = BackfillIngestion(client, {
+        1: "http://minio:9000/media/photos/media_1.jpg",
+        2: "http://minio:9000/media/avatars/media_2.jpg",
+        3: "http://minio:9000/media/photos/media_3.jpg",
+        4: "https://images.unsplash.com/photo-4",
+    })
+
+    stats = ingestion.backfill_hashes(batch_size=2)
+
+    assert stats == {"hashed": 2, "duplicates": 1, "skipped": 1}
+    assert ingestion.batches == [2, 1]
+    media, created = ingestion.ingest(beach, "image/jpeg")
+    assert (media["id"], created) == (1, False)
+    assert client.uploads == []
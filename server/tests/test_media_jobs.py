@@ -0,0 +1,259 @@
+import asyncio
+import time
+
+import pytest
+
+from app.Media.jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, MediaJobQueue, QueueFull
+
+
+class InMemoryJobQueue(MediaJobQueue):
+    """Job rows kept in a dict (shared between queues standing for processes) instead of Postgres."""
+
+    def __init__(self, runner, rows=None, **kwargs):
+        kwargs.setdefault("poll_seconds", 0.01)
+        super().__init__(runner, **kwargs)
+        self.rows = {} if rows is None else rows
+
+    def status(self, job_id):
+        return self.rows.get(job_id)
+
+    def _insert(self, job_id, pairs):
+        if sum(row["status"] == QUEUED for row in self.rows.values()) >= self.max_pending:
+            return False
+        self.rows[job_id] = {"status": QUEUED, "payload": pairs}
+        return True
+
+    def _claim_next(self, claim_id):
+        for job_id, row in self.rows.items():
+            expired = row["status"] == RUNNING and row["claimed_until"] < time.monotonic()
+            if row["status"] == QUEUED or expired:
+                row.update(status=RUNNING, claim_id=claim_id, claimed_until=time.monotonic() + self.lease_seconds)
+                return job_id, row["payload"]
+        return None
+
+    def _extend(self, job_id, claim_id):
+        row = self.rows[job_id]
+        if row["status"] != RUNNING or row["claim_id"] != claim_id:
+            return False
+        row["claimed_until"] = time.monotonic() + self.lease_seconds
+        return True
+
+    def _finish(self, job_id, claim_id, status, results, error):
+        row = self.rows[job_id]
+        if row["status"] != RUNNING or row["claim_id"] != claim_id:
+            return False
+        row.update(status=status, results=results, error=error)
+        return True
+
+
+PAIR = {"host_key": "host.jpg", "background_key": "bg.jpg"}
+
+
+async def wait_for(predicate):
+    while not predicate():
+        await asyncio.sleep(0.01)
+
+
+def test_jobs_run_and_record_results():
+    async def runner(pairs):
+        return [{**pair, "url": "http://minio/out.jpg"} for pair in pairs]
+
+    async def scenario():
+        queue = InMemoryJobQueue(runner, workers=2, max_pending=4)
+        await queue.start()
+        job_id = await queue.submit([PAIR])
+        await wait_for(lambda: queue.rows[job_id]["status"] == SUCCEEDED)
+        await queue.stop()
+        return queue.rows[job_id]
+
+    row = asyncio.run(scenario())
+    assert row["results"][0]["url"] == "http://minio/out.jpg"
+    assert row["error"] is None
+
+
+def test_failed_job_records_error():
+    async def runner(pairs):
+        raise RuntimeError("torch is not installed")
+
+    async def scenario():
+        queue = InMemoryJobQueue(runner, workers=1, max_pending=4)
+        await queue.start()
+        job_id = await queue.submit([PAIR])
+        await wait_for(lambda: queue.rows[job_id]["status"] not in (QUEUED, RUNNING))
+        await queue.stop()
+        return queue.rows[job_id]
+
+    row = asyncio.run(scenario())
+    assert row["status"] == FAILED
+    assert "torch" in row["error"]
+
+
+def test_full_queue_rejects_new_jobs():
+    release = asyncio.Event()
+
+    async def runner(pairs):
+        await release.wait()
+        return []
+
+    async def scenario():
+        queue = InMemoryJobQueue(runner, workers=1, max_pending=2)
+        await queue.start()
+        first = await queue.submit([PAIR])
+        # Let the worker pick up the first job; the next two wait
+        await wait_for(lambda: queue.rows[first]["status"] == RUNNING)
+        await queue.submit([PAIR])
+        await queue.submit([PAIR])
+        with pytest.raises(QueueFull):
+            await queue.submit([PAIR])
+        release.set()
+        await wait_for(lambda: all(row["status"] == SUCCEEDED for row in queue.rows.values()))
+        # Room again once the backlog drains
+        await queue.submit([PAIR])
+        await queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_any_process_submits_and_runners_share_the_jobs():
+    ran = []
+
+    async def runner(pairs):
+        ran.append(pairs[0]["n"])
+        await asyncio.sleep(0.02)
+        return []
+
+    async def scenario():
+        rows = {}
+        # A process that isn't running jobs (yet) still accepts them
+        api = InMemoryJobQueue(runner, rows=rows, max_pending=8)
+        job_ids = [await api.submit([{**PAIR, "n": n}]) for n in range(4)]
+        runners = [InMemoryJobQueue(runner, rows=rows, workers=1) for _ in range(2)]
+        for queue in runners:
+            await queue.start()
+        await wait_for(lambda: all(rows[job_id]["status"] == SUCCEEDED for job_id in job_ids))
+        for queue in runners:
+            await queue.stop()
+
+    asyncio.run(scenario())
+    assert sorted(ran) == [0, 1, 2, 3]
+
+
+def test_only_expired_claims_are_taken_over():
+    ran = []
+
+    async def runner(pairs):
+        ran.append(pairs[0]["n"])
+        return []
+
+    async def scenario():
+        queue = InMemoryJobQueue(runner, workers=1)
+        queue.rows = {
+            # Runner died: lease ran out
+            "a": {"status": RUNNING, "payload": [{**PAIR, "n": 1}], "claim_id": "gone", "claimed_until": time.monotonic() - 1},
+            # Another process is still running it
+            "b": {"status": RUNNING, "payload": [{**PAIR, "n": 2}], "claim_id": "alive", "claimed_until": time.monotonic() + 60},
+        }
+        await queue.start()
+        await wait_for(lambda: queue.rows["a"]["status"] == SUCCEEDED)
+        await queue.stop()
+        return queue.rows["b"]
+
+    assert asyncio.run(scenario())["status"] == RUNNING
+    assert ran == [1]
+
+
+def test_long_jobs_keep_their_claim():
+    release = asyncio.Event()
+
+    async def runner(pairs):
+        await release.wait()
+        return []
+
+    async def scenario():
+        rows = {}
+        owner = InMemoryJobQueue(runner, rows=rows, workers=1, lease_seconds=0.06)
+        other = InMemoryJobQueue(runner, rows=rows, workers=1, lease_seconds=0.06)
+        await owner.start()
+        job_id = await owner.submit([PAIR])
+        await wait_for(lambda: rows[job_id]["status"] == RUNNING)
+        claim = rows[job_id]["claim_id"]
+        await other.start()
+        # Several leases long: the heartbeat keeps extending it, so the other runner never takes over
+        await asyncio.sleep(0.2)
+        assert rows[job_id]["claim_id"] == claim
+        release.set()
+        await wait_for(lambda: rows[job_id]["status"] == SUCCEEDED)
+        await owner.stop()
+        await other.stop()
+
+    asyncio.run(scenario())
+
+
+def test_workers_retry_when_the_database_is_unavailable():
+    async def runner(pairs):
+        return []
+
+    class StartingDatabaseQueue(InMemoryJobQueue):
+        failures_left = 3
+
+        def _claim_next(self, claim_id):
+            if self.failures_left:
+                self.failures_left -= 1
+                raise RuntimeError("connection refused")
+            return super()._claim_next(claim_id)
+
+    async def scenario():
+        queue = StartingDatabaseQueue(runner, workers=1)
+        queue.rows = {"a": {"status": QUEUED, "payload": [PAIR]}}
+        await queue.start()
+        await wait_for(lambda: queue.rows["a"]["status"] == SUCCEEDED)
+        await queue.stop()
+        return queue.failures_left
+
+    assert asyncio.run(scenario()) == 0
+
+
+@pytest.mark.parametrize("failing_finishes", [1, 2])
+def test_worker_survives_failures_to_record_a_job(failing_finishes):
+    async def runner(pairs):
+        return []
+
+    class FlakyJobQueue(InMemoryJobQueue):
+        def _finish(self, job_id, claim_id, status, results, error):
+            if self.failures_left:
+                self.failures_left -= 1
+                raise RuntimeError("database is down")
+            return super()._finish(job_id, claim_id, status, results, error)
+
+    async def scenario():
+        queue = FlakyJobQueue(runner, workers=1, max_pending=4)
+        queue.failures_left = failing_finishes
+        await queue.start()
+        first = await queue.submit([PAIR])
+        second = await queue.submit([PAIR])
+        await wait_for(lambda: queue.rows[second]["status"] == SUCCEEDED)
+        await queue.stop()
+        return queue.rows[first]
+
+    row = asyncio.run(scenario())
+    if failing_finishes == 1:
+        # Recording the success failed, so the job is recorded as failed instead
+        assert row["status"] == FAILED
+        assert "database is down" in row["error"]
+    else:
+        # Nothing could be recorded: left running until its lease expires and a runner claims it again
+        assert row["status"] == RUNNING
+
+
+def test_result_of_a_lost_claim_is_dropped():
+    async def runner(pairs):
+        return [{"url": "late"}]
+
+    async def scenario():
+        queue = InMemoryJobQueue(runner)
+        queue.rows = {"a": {"status": RUNNING, "payload": [PAIR], "claim_id": "new", "claimed_until": time.monotonic() + 60}}
+        await queue._run("a", [PAIR], "old")
+        return queue.rows["a"]
+
+    row = asyncio.run(scenario())
+    assert row["status"] == RUNNING and "results" not in row
@@ -0,0 +1,62 @@
+from app.chatbot.media_refs import MediaResolver
+from app.chatbot.media_utils import find_media_ids
+
+ANSWER = (
+    "Alice shared two posts:\n"
+    "![Beach sunset]([[media:7]])\n"
+    "and [[media:3]] - plus an old one [[media:99]]. Sunset again: [[media:7]]"
+)
+
+
+class StubResolver(MediaResolver):
+    def __init__(self, urls, **kwargs):
+        super().__init__(**kwargs)
+        self.urls = urls
+        self.loads = []
+
+    def _load_media(self, media_ids):
+        self.loads.append(list(media_ids))
+        return {media_id: (self.urls[media_id], None) for media_id in media_ids if media_id in self.urls}
+
+
+def test_find_media_ids_in_first_seen_order():
+    assert find_media_ids(ANSWER) == [7, 3, 99]
+    assert find_media_ids("no references here") == []
+
+
+def test_expand_keeps_alt_and_drops_unknown_ids():
+    resolver = StubResolver({3: "http://localhost:9000/media/3.jpg", 7: "http://localhost:9000/media/7.jpg"})
+
+    text, images = resolver.expand(ANSWER)
+
+    assert "[[media:" not in text
+    assert "![Beach sunset](http://localhost:9000/media/7.jpg)" in text
+    assert "![Image 3](http://localhost:9000/media/3.jpg)" in text
+    assert "old one ." in text
+    assert images == [
+        {"url": "http://localhost:9000/media/7.jpg", "alt": "Beach sunset", "media_id": 7, "thumbnail_url": None},
+        {"url": "http://localhost:9000/media/3.jpg", "alt": "Image 3", "media_id": 3, "thumbnail_url": None},
+    ]
+    assert resolver.loads == [[7, 3, 99]]
+
+
+def test_lookup_serves_repeats_from_cache_and_invalidates():
+    resolver = StubResolver({3: "http://localhost:9000/media/3.jpg"}, max_entries=1)
+
+    resolver.expand("[[media:3]]")
+    resolver.expand("again [[media:3]]")
+    assert resolver.loads == [[3]]
+
+    resolver.invalidate(3)
+    resolver.expand("[[media:3]]")
+    assert resolver.loads == [[3], [3]]
+
+
+def test_expand_adds_thumbnail_urls_from_media_meta():
+    resolver = StubResolver({})
+    resolver._load_media = lambda ids: {5: ("http://minio:9000/media/photos/5.jpg", "derivatives/thumb/photos/5.webp")}
+
+    text, images = resolver.expand("[[media:5]]")
+
+    assert text == "![Image 5](http://localhost:9000/media/photos/5.jpg)"
+    assert images[0]["thumbnail_url"] == "http://localhost:9000/media/derivatives/thumb/photos/5.webp"
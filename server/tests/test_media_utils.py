@@ -0,0 +1,50 @@
+import random
+
+from app.chatbot.media_utils import ResponsePostProcessor, format_response_with_images, wrap_plain_urls_as_images
+
+ANSWER = (
+    "Hey! Here's Alice's latest:\n"
+    "![Beach sunset](http://minio:9000/media/posts/1.jpg)\n"
+    "Also http://minio:9000/media/posts/2.png?X-Amz-Signature=abc, and "
+    "[her blog](http://example.com/alice) plus http://example.com/about.\n"
+    "Same photo again: ![Post 1](http://minio:9000/media/posts/1.jpg)"
+)
+
+
+def test_single_pass_rewrites_hosts_and_collects_images():
+    result = format_response_with_images(ANSWER)
+
+    assert "minio:9000" not in result["text"]
+    assert "[her blog](http://example.com/alice)" in result["text"]
+    assert result["images"] == [
+        {"url": "http://localhost:9000/media/posts/1.jpg", "alt": "Beach sunset"},
+        {"url": "http://localhost:9000/media/posts/2.png?X-Amz-Signature=abc", "alt": "Image"},
+    ]
+    assert result["has_images"]
+
+
+def test_wrap_keeps_existing_markdown_and_trailing_punctuation():
+    text = "Posts: http://minio:9000/media/a.jpg, ![Mine](http://minio:9000/media/b.jpg) and http://minio:9000/media/c.jpg."
+
+    assert wrap_plain_urls_as_images(text) == (
+        "Posts: ![Image 1](http://minio:9000/media/a.jpg), ![Mine](http://minio:9000/media/b.jpg)"
+        " and ![Image 2](http://minio:9000/media/c.jpg)."
+    )
+
+
+def test_streamed_chunks_match_whole_text():
+    whole = ResponsePostProcessor(wrap_bare_urls=True)
+    expected = whole.process(ANSWER)
+
+    rng = random.Random(7)
+    for _ in range(50):
+        streamed = ResponsePostProcessor(wrap_bare_urls=True)
+        position, out = 0, []
+        while position < len(ANSWER):
+            size = rng.randint(1, 12)
+            out.append(streamed.feed(ANSWER[position:position + size]))
+            position += size
+        out.append(streamed.close())
+
+        assert "".join(out) == expected
+        assert streamed.images == whole.images
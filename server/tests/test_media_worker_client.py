@@ -0,0 +1,85 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import httpx
+import pytest
+
+from app.Media.worker_client import DEMO_MEDIA_PATHS, MediaWorkerClient, MediaWorkerError, MediaWorkerUnavailable
+
+SERVER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def client_with(handler):
+    client = MediaWorkerClient(url="http://media-worker:8200", timeout=5)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url=client.url)
+    return client
+
+
+def test_generate_batch_posts_pairs_and_returns_results():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        pairs = json.loads(request.content)["pairs"]
+        return httpx.Response(200, json={"results": [{**pair, "url": "http://minio/out.jpg"} for pair in pairs]})
+
+    pairs = [{"host_key": "host.jpg", "background_key": "bg.jpg"}]
+    results = asyncio.run(client_with(handler).generate_batch(pairs))
+
+    assert requests[0].method == "POST"
+    assert requests[0].url.path == "/generate/batch"
+    assert results == [{"host_key": "host.jpg", "background_key": "bg.jpg", "url": "http://minio/out.jpg"}]
+
+
+def test_unreachable_worker_raises_unavailable():
+    def handler(request):
+        raise httpx.ConnectError("connection refused", request=request)
+
+    with pytest.raises(MediaWorkerUnavailable):
+        asyncio.run(client_with(handler).warm_up())
+
+
+def test_worker_errors_are_raised():
+    def handler(request):
+        return httpx.Response(500, json={"detail": "boom"})
+
+    with pytest.raises(MediaWorkerError, match="500"):
+        asyncio.run(client_with(handler).generate_batch([]))
+
+
+def test_generate_media_sends_no_paths():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"response": {}})
+
+    asyncio.run(client_with(handler).generate_media(*DEMO_MEDIA_PATHS))
+
+    assert requests[0].url.path == "/generate"
+    assert requests[0].content == b""
+
+
+def test_generate_media_rejects_other_paths():
+    def handler(request):
+        raise AssertionError("nothing should be sent")
+
+    with pytest.raises(ValueError):
+        asyncio.run(client_with(handler).generate_media("/etc/passwd", "frankie.jpg", "/tmp/out.jpg"))
+
+
+def test_unix_socket_url_uses_uds_transport():
+    client = MediaWorkerClient(url="unix:///tmp/media-worker.sock")
+    assert str(client.client.base_url) == "http://media-worker"
+
+
+def test_api_media_modules_do_not_import_torch():
+    code = "import sys, app.Media.router, app.Media.jobs; print('torch' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=SERVER_DIR, capture_output=True, text=True, check=True,
+        env={**os.environ, "MEDIA_WORKER_URL": "http://media-worker:8200"},
+    )
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,77 @@
+from urllib.parse import parse_qs, urlparse
+
+from app.common.minio_client import MediaURLService, MinIOClient
+
+
+def make_service(**kwargs):
+    client = MinIOClient()
+    client.endpoint, client.bucket, client.secure = "minio:9000", "media", False
+    return MediaURLService(client, **kwargs)
+
+
+def test_public_mode_uses_base_url_and_leaves_other_urls():
+    service = make_service(mode="public", public_base_url="https://cdn.example.com/media/")
+
+    assert service.public_url("posts/a b.jpg") == "https://cdn.example.com/media/posts/a%20b.jpg"
+    assert service.convert_url("http://minio:9000/media/posts/1.jpg") == "https://cdn.example.com/media/posts/1.jpg"
+    assert service.convert_url("http://example.com/x.jpg") == "http://example.com/x.jpg"
+    # Already signed URLs keep their query
+    signed = "http://minio:9000/media/posts/1.jpg?X-Amz-Signature=abc"
+    assert service.convert_url(signed) == signed
+
+
+def test_presigned_urls_are_signed_for_public_endpoint_and_cached():
+    service = make_service(mode="presigned", public_endpoint="media.example.com", expires_in=600)
+
+    urls = service.public_urls(["posts/1.jpg", "posts/2.jpg", "posts/1.jpg"])
+
+    assert set(urls) == {"posts/1.jpg", "posts/2.jpg"}
+    parsed = urlparse(urls["posts/1.jpg"])
+    assert parsed.netloc == "media.example.com"
+    assert parsed.path == "/media/posts/1.jpg"
+    assert parse_qs(parsed.query)["X-Amz-Expires"] == ["600"]
+    # Served from the cache rather than signed again
+    assert service.public_url("posts/1.jpg") is urls["posts/1.jpg"]
+
+
+def test_presigned_urls_are_resigned_near_expiry(monkeypatch):
+    service = make_service(mode="presigned", expires_in=100)
+    now = [1000.0]
+    monkeypatch.setattr("app.common.minio_client.time.time", lambda: now[0])
+    signed = []
+    monkeypatch.setattr(service, "_presign", lambda key: signed.append(key) or f"signed-{len(signed)}")
+
+    assert service.public_url("a.jpg") == "signed-1"
+    now[0] += 85
+    assert service.public_url("a.jpg") == "signed-1"
+    # Less than a tenth of the lifetime left
+    now[0] += 10
+    assert service.public_url("a.jpg") == "signed-2"
+
+
+def test_cache_evicts_expired_then_oldest_entries():
+    service = make_service(mode="public", max_entries=10)
+
+    service.public_urls(f"k{i}" for i in range(11))
+
+    assert len(service._urls) == 9
+    assert "k0" not in service._urls and "k10" in service._urls
+
+
+def test_post_processing_follows_configured_endpoint(monkeypatch):
+    from app.chatbot import media_utils
+
+    client = MinIOClient()
+    client.endpoint, client.bucket, client.secure = "storage.internal:9100", "media", False
+    service = MediaURLService(client, mode="public", public_base_url="https://cdn.example.com/media", public_endpoint="cdn.example.com")
+    monkeypatch.setattr(media_utils, "media_url_service", service)
+
+    result = media_utils.format_response_with_images(
+        "![Post](http://storage.internal:9100/media/posts/1.jpg) and http://storage.internal:9100/other/2.png"
+    )
+
+    assert result["text"] == "![Post](https://cdn.example.com/media/posts/1.jpg) and http://cdn.example.com/other/2.png"
+    assert [image["url"] for image in result["images"]] == [
+        "https://cdn.example.com/media/posts/1.jpg",
+        "http://cdn.example.com/other/2.png",
+    ]
@@ -0,0 +1,38 @@
+from langchain_core.agents import AgentAction
+
+from app.chatbot.model_tiers import sql_escalation_reason, summary_escalation_reason
+
+
+def _query(observation):
+    return (AgentAction("sql_db_query", "SELECT 1", ""), observation)
+
+
+def test_sql_result_with_rows_is_kept():
+    result = {"output": "You follow 5 people!", "intermediate_steps": [_query("[(5,)]")]}
+    assert sql_escalation_reason(result) is None
+
+
+def test_sql_tool_error_escalates():
+    result = {"output": "Here you go", "intermediate_steps": [_query("Error: relation \"follows\" does not exist")]}
+    assert sql_escalation_reason(result) == "tool_error"
+
+
+def test_sql_empty_result_escalates():
+    result = {"output": "Nothing found", "intermediate_steps": [_query("")]}
+    assert sql_escalation_reason(result) == "empty_result"
+
+
+def test_sql_iteration_limit_escalates():
+    result = {"output": "Agent stopped due to iteration limit or time limit.", "intermediate_steps": []}
+    assert sql_escalation_reason(result) == "iteration_limit"
+
+
+def test_summary_that_drops_images_escalates():
+    source = "[{'SQL': 'Here: ![Image 1](http://localhost:9000/media/photos/media_1.jpg)'}]"
+    assert summary_escalation_reason("Hey! Alice posted a photo.", source) == "dropped_images"
+    assert summary_escalation_reason("Hey! ![Image 1](http://localhost:9000/media/photos/media_1.jpg)", source) is None
+
+
+def test_summary_double_wrapped_image_escalates():
+    summary = "Check this out: ![Post](![Image](http://localhost:9000/media/photos/media_1.jpg))"
+    assert summary_escalation_reason(summary, "") == "double_wrapped_image"
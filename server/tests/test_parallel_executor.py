@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+
+from langchain.agents.agent import BaseMultiActionAgent
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.agents import AgentAction, AgentFinish, AgentStep
+from langchain_core.tools import Tool
+
+from app.chatbot.parallel_executor import ParallelAgentExecutor
+
+
+class TwoCallAgent(BaseMultiActionAgent):
+    """Issues two tool calls in its first step, then finishes with the observations."""
+
+    @property
+    def input_keys(self):
+        return ["input"]
+
+    def plan(self, intermediate_steps, callbacks=None, **kwargs):
+        if not intermediate_steps:
+            return [AgentAction("slow", "a", ""), AgentAction("fast", "b", "")]
+        return AgentFinish({"output": [obs for _, obs in intermediate_steps]}, "")
+
+    async def aplan(self, intermediate_steps, callbacks=None, **kwargs):
+        return self.plan(intermediate_steps, callbacks, **kwargs)
+
+
+def _make_executor(barrier):
+    def slow(x):
+        barrier.wait(timeout=5)
+        time.sleep(0.05)
+        return f"slow:{x}"
+
+    def fast(x):
+        barrier.wait(timeout=5)
+        return f"fast:{x}"
+
+    tools = [Tool(name="slow", func=slow, description="slow"), Tool(name="fast", func=fast, description="fast")]
+    return ParallelAgentExecutor(agent=TwoCallAgent(), tools=tools)
+
+
+def test_tool_calls_run_concurrently_and_keep_order():
+    # Both tools block on the barrier, so this only finishes if they run at the same time
+    result = _make_executor(threading.Barrier(2)).invoke({"input": "q"})
+    assert result["output"] == ["slow:a", "fast:b"]
+
+
+def test_async_tool_calls_run_concurrently_and_keep_order():
+    result = asyncio.run(_make_executor(threading.Barrier(2)).ainvoke({"input": "q"}))
+    assert result["output"] == ["slow:a", "fast:b"]
+
+
+def test_perform_agent_action_returns_an_agent_step():
+    executor = _make_executor(threading.Barrier(1))
+    tools = {tool.name: tool for tool in executor.tools}
+    action = AgentAction("fast", "c", "")
+
+    step = executor._perform_agent_action(tools, {"slow": "green", "fast": "blue"}, action)
+
+    assert step == AgentStep(action=action, observation="fast:c")
+
+
+def test_iterating_steps_keeps_observation_order():
+    steps = list(_make_executor(threading.Barrier(2)).iter({"input": "q"}))
+    observations = [observation for chunk in steps for _, observation in chunk.get("intermediate_step", [])]
+    assert observations == ["slow:a", "fast:b"]
+    assert steps[-1]["output"] == ["slow:a", "fast:b"]
+
+
+class ToolStarts(BaseCallbackHandler):
+    def __init__(self):
+        self.names = []
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        self.names.append(serialized["name"])
+
+
+class UnknownToolAgent(TwoCallAgent):
+    def plan(self, intermediate_steps, callbacks=None, **kwargs):
+        if not intermediate_steps:
+            return [AgentAction("fast", "b", ""), AgentAction("missing", "c", "")]
+        return AgentFinish({"output": [obs for _, obs in intermediate_steps]}, "")
+
+
+def test_async_sync_only_tools_get_the_run_callbacks():
+    handler = ToolStarts()
+    executor = _make_executor(threading.Barrier(2))
+    asyncio.run(executor.ainvoke({"input": "q"}, config={"callbacks": [handler]}))
+    assert sorted(handler.names) == ["fast", "slow"]
+
+
+def test_async_unknown_tools_get_the_run_callbacks():
+    handler = ToolStarts()
+    executor = _make_executor(threading.Barrier(1))
+    executor.agent = UnknownToolAgent()
+    result = asyncio.run(executor.ainvoke({"input": "q"}, config={"callbacks": [handler]}))
+    assert sorted(handler.names) == ["fast", "invalid_tool"]
+    assert result["output"][0] == "fast:b"
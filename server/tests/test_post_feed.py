@@ -0,0 +1,45 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import app.Follow.model  # noqa: F401
+import app.Places.model  # noqa: F401
+import app.Timeline.model  # noqa: F401
+from app.Media.model import Media
+from app.Post.feed import PostFeedRefresher, register_refresh_listeners
+from app.Post.model import Post
+from app.User.model import User
+
+
+@pytest.fixture
+def refresher():
+    refresher = PostFeedRefresher(interval_seconds=30, max_staleness_seconds=600)
+    register_refresh_listeners(refresher)
+    return refresher
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    for model in (User, Media, Post):
+        model.__table__.create(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def test_feed_is_marked_dirty_on_commit_not_flush(db, refresher):
+    db.add(User(id=1, name="user 1"))
+    db.flush()
+    # A refresh now wouldn't see the row yet and would clear the flag
+    assert not refresher._is_due()
+
+    db.commit()
+    assert refresher._is_due()
+
+
+def test_rolled_back_writes_leave_the_feed_clean(db, refresher):
+    db.add(User(id=1, name="user 1"))
+    db.flush()
+    db.rollback()
+    db.commit()
+    assert not refresher._is_due()
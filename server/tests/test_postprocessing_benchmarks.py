@@ -0,0 +1,10 @@
+from benchmarks.bench_postprocessing import DEFAULT_THRESHOLD, load_baseline, regressions, run
+
+
+def test_postprocessing_hot_paths_have_not_regressed():
+    baseline = load_baseline()
+    assert baseline, "tests/benchmarks/baseline.json is missing; run bench_postprocessing.py --update-baseline"
+
+    slower = regressions(run(repeat=5), baseline, DEFAULT_THRESHOLD)
+
+    assert not slower, "slower than baseline: " + ", ".join(f"{name} {ratio:.2f}x" for name, ratio in slower)
@@ -0,0 +1,39 @@
+from app.chatbot.schema_selector import ALL_TABLES, KEYWORD_MAP, select_tables, describe_tables
+
+
+def test_select_tables_follow_question():
+    assert select_tables("Who are my followers?") == ["follow", "users"]
+
+
+def test_select_tables_adds_bridge_table():
+    # posts joins users and media, so it is pulled in even though it isn't named
+    assert select_tables("Show me my photos") == ["media", "post_feed", "posts", "users"]
+
+
+def test_select_tables_adds_referenced_tables():
+    assert select_tables("Which places did I visit on my trips?") == ["places", "timelines", "users"]
+
+
+def test_select_tables_falls_back_to_all_tables():
+    assert select_tables("hello there") == ALL_TABLES
+
+
+def test_describe_tables_only_includes_selected():
+    schema = describe_tables(["follow", "users"])
+    assert "follow table" in schema
+    assert "users table" in schema
+    assert "media table" not in schema
+
+
+def test_describe_tables_lists_post_feed_first():
+    schema = describe_tables(["media", "post_feed", "posts"])
+    assert schema.startswith("- post_feed view")
+
+
+def test_internal_tables_are_never_selected():
+    internal = {"media_hashes", "media_jobs"}
+    for question in ("What is the status of the job created at noon?", "Show the error and result payload size",
+                     "hello there", "Show me my photos"):
+        assert not internal & set(select_tables(question))
+    assert not internal & set(ALL_TABLES)
+    assert not any(internal & tables for tables in KEYWORD_MAP.values())
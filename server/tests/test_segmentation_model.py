@@ -0,0 +1,180 @@
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+
+torch = pytest.importorskip("torch")
+
+from app.Media.service import PERSON_CLASS, SegmentationModel, forward_groups  # noqa: E402
+
+
+def test_model_is_loaded_once_across_threads(monkeypatch):
+    model = SegmentationModel(torch_threads=1)
+    loads = []
+    release = threading.Event()
+
+    def slow_load():
+        loads.append(1)
+        release.wait(1)
+        return object()
+    monkeypatch.setattr(model, "_load", slow_load)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(model.get())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
+    assert len({id(result) for result in results}) == 1
+    assert model.loaded
+
+
+def _fake_logits(model, person_box):
+    """Make _logits return scores with a person rectangle (x0, y0, x1, y1) in working-image pixels."""
+    def logits(image):
+        scores = torch.zeros(21, image.height, image.width)
+        x0, y0, x1, y1 = person_box
+        scores[PERSON_CLASS, y0:y1, x0:x1] = 1
+        return scores
+    model._logits = logits
+
+
+def test_working_size_downscales_and_mask_is_upscaled():
+    model = SegmentationModel(backend="lraspp", working_size=100)
+    seen = []
+    _fake_logits(model, (25, 0, 75, 50))
+    fake = model._logits
+    model._logits = lambda image: seen.append(image.size) or fake(image)
+
+    mask = model.person_mask(Image.new("RGB", (400, 200)))
+
+    assert seen == [(100, 50)]
+    assert mask.size == (400, 200)
+    pixels = np.asarray(mask)
+    assert pixels[100, 200] == 255 and pixels[100, 20] == 0
+    assert set(np.unique(pixels)) == {0, 255}
+
+
+def test_small_images_are_not_upscaled():
+    model = SegmentationModel(working_size=512)
+    _fake_logits(model, (0, 0, 10, 10))
+
+    classes = model.predict(Image.new("RGB", (64, 32)))
+
+    assert classes.shape == (32, 64)
+    assert classes[5, 5] == PERSON_CLASS and classes[20, 20] == 0
+
+
+def test_version_and_validation():
+    assert SegmentationModel(backend="mobilenet", runtime="onnx_int8", working_size=512).version == "mobilenet-onnx_int8@512"
+    assert SegmentationModel().version.startswith("resnet101-torch@")
+    with pytest.raises(ValueError):
+        SegmentationModel(backend="resnet18")
+    with pytest.raises(ValueError):
+        SegmentationModel(runtime="tensorrt")
+
+
+def test_person_masks_batches_similar_sizes():
+    model = SegmentationModel(working_size=0)
+    batches = []
+
+    def forward(input_batch):
+        batches.append(tuple(input_batch.shape))
+        scores = torch.zeros(input_batch.shape[0], 21, *input_batch.shape[2:])
+        scores[:, PERSON_CLASS, :2, :2] = 1
+        return scores
+    model._forward = forward
+
+    images = [Image.new("RGB", (60, 40)), Image.new("RGB", (300, 200)), Image.new("RGB", (64, 30))]
+    masks = model.person_masks(images, batch_size=8)
+
+    # The two small images share a padded batch; the large one runs alone
+    assert sorted(batches) == [(1, 3, 200, 300), (2, 3, 40, 64)]
+    assert [mask.size for mask in masks] == [image.size for image in images]
+    assert np.asarray(masks[2])[1, 1] == 255 and np.asarray(masks[2])[10, 10] == 0
+
+
+def test_forward_groups_cap_images_and_padded_pixels():
+    assert forward_groups([(512, 384)] * 10, batch_size=8, max_pixels=4_194_304) == [list(range(8)), [8, 9]]
+    # Full-resolution photos: one per pass instead of eight stacked
+    assert forward_groups([(4032, 3024)] * 3, batch_size=8, max_pixels=4_194_304) == [[0], [1], [2]]
+    # Padding counts: a larger image shrinks what fits alongside it
+    sizes = [(1000, 1000), (1000, 1000), (2000, 2000), (1000, 1000)]
+    assert forward_groups(sizes, batch_size=8, max_pixels=4_000_000) == [[0, 1], [2], [3]]
+
+
+def test_person_masks_splits_batches_by_pixels():
+    model = SegmentationModel(working_size=0)
+    batches = []
+
+    def forward(input_batch):
+        batches.append(input_batch.shape[0])
+        return torch.zeros(input_batch.shape[0], 21, *input_batch.shape[2:])
+    model._forward = forward
+
+    masks = model.person_masks([Image.new("RGB", (100, 100))] * 5, batch_size=8, max_pixels=20_000)
+
+    assert batches == [2, 2, 1]
+    assert len(masks) == 5
+
+
+def test_generate_batch_reads_and_writes_minio():
+    import asyncio
+    import io
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app.Media.service import MediaService
+
+    def encode(color):
+        buffer = io.BytesIO()
+        Image.new("RGB", (32, 16), color).save(buffer, "PNG")
+        return buffer.getvalue()
+
+    class Storage:
+        def __init__(self):
+            self.objects = {"host.png": encode((255, 0, 0)), "bg.png": encode((0, 0, 255))}
+            self.downloads = []
+
+        async def download_buffer(self, key):
+            self.downloads.append(key)
+            return bytearray(self.objects[key])
+
+        async def upload(self, key, data, content_type):
+            self.objects[key] = bytes(data)
+            return f"http://minio/{key}"
+
+    from app.Media.mask_cache import MaskCache
+
+    segmented = []
+    model = SegmentationModel()
+    model.person_masks = lambda images: segmented.extend(images) or [Image.new("L", image.size, 255) for image in images]
+    storage = Storage()
+    service = MediaService(
+        model=model,
+        executor=ThreadPoolExecutor(1),
+        compositor=ThreadPoolExecutor(1),
+        storage=storage,
+        # In-memory only: the MinIO copy fails to load/store and is skipped
+        masks=MaskCache(client=None),
+    )
+
+    results = asyncio.run(service.generate_batch([
+        {"host_key": "host.png", "background_key": "bg.png", "output_key": "out/1.png"},
+        {"host_key": "host.png", "background_key": "bg.png"},
+        {"host_key": "missing.png", "background_key": "bg.png"},
+    ]))
+
+    assert sorted(storage.downloads) == ["bg.png", "host.png", "missing.png"]
+    assert results[0]["url"] == "http://minio/out/1.png"
+    assert results[1]["output_key"].startswith("generated/") and "url" in results[1]
+    assert "missing.png" in results[2]["error"]
+    assert Image.open(io.BytesIO(storage.objects["out/1.png"])).getpixel((0, 0)) == (255, 0, 0)
+    assert len(segmented) == 1
+
+    # The same portrait on another background reuses the cached mask
+    again = asyncio.run(service.generate_batch([{"host_key": "host.png", "background_key": "bg.png"}]))
+    assert "url" in again[0] and len(segmented) == 1
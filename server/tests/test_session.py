@@ -0,0 +1,34 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from app.chatbot.session import CancelOnEvent, ChatSession, RunCancelled
+
+
+def test_record_trims_history_to_window():
+    session = ChatSession(user_id=1, history_limit=4)
+    for i in range(3):
+        session.record(f"q{i}", f"a{i}", [{"agent": "SQL", "text": f"a{i}"}])
+
+    assert [m["content"] for m in session.history] == ["q1", "a1", "q2", "a2"]
+    assert session.last_results == [{"agent": "SQL", "text": "a2"}]
+
+
+def test_question_ids_increase_per_connection():
+    session = ChatSession(user_id=1)
+    assert [session.next_question_id() for _ in range(3)] == [1, 2, 3]
+    assert ChatSession(user_id=1).next_question_id() == 1
+
+
+def test_cancel_event_stops_runnables_in_worker_threads():
+    event = threading.Event()
+    config = {"callbacks": [CancelOnEvent(event)]}
+    step = RunnableLambda(lambda x: x + 1)
+
+    with ThreadPoolExecutor(1) as pool:
+        assert pool.submit(step.invoke, 1, config).result() == 2
+        event.set()
+        with pytest.raises(RunCancelled):
+            pool.submit(step.invoke, 1, config).result()
@@ -0,0 +1,33 @@
+import asyncio
+
+from app.chatbot.speculation import Speculation, local_prior
+
+
+def test_local_prior_routes_like_the_classifier():
+    assert local_prior("Who are my followers?") == "SQL"
+    assert local_prior("Show me my photos") == "SQL"
+    assert local_prior("Can you recommend places to visit?") == "Recommender"
+    assert local_prior("hello!") == "Assistant"
+    assert local_prior("what is 12 * 7") == "Assistant"
+
+
+def test_speculation_kept_when_classifier_agrees():
+    async def scenario():
+        task = asyncio.create_task(asyncio.sleep(0, result="answer"))
+        speculation = Speculation("SQL", "q", ["users"], task)
+        speculation.resolve("SQL", classify_ms=5.0)
+        assert speculation.usable_for("q")
+        return await task
+
+    assert asyncio.run(scenario()) == "answer"
+
+
+def test_speculation_cancelled_when_classifier_disagrees():
+    async def scenario():
+        task = asyncio.create_task(asyncio.sleep(10))
+        speculation = Speculation("SQL", "q", ["users"], task)
+        speculation.resolve("Assistant", classify_ms=5.0)
+        await asyncio.sleep(0)
+        return task.cancelled(), speculation.usable_for("q")
+
+    assert asyncio.run(scenario()) == (True, False)
@@ -0,0 +1,137 @@
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+import app.Places.model  # noqa: F401
+from app.chatbot.user_context import UserContextService, user_context_service
+from app.Follow.model import Follow
+from app.Media.model import Media
+from app.Post.model import Post
+from app.Timeline.model import Timeline
+from app.User.model import User
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    for model in (User, Media, Post, Follow, Timeline):
+        model.__table__.create(engine)
+    with Session(engine) as session:
+        session.add_all(User(id=i, name=f"user {i}", email=f"user{i}@example.com", phone=i) for i in range(1, 4))
+        session.add(Media(id=1, external_resource_url="http://minio:9000/media/1.jpg", meta={"tags": ["beach"]}))
+        session.commit()
+        yield session
+
+
+@pytest.fixture
+def loads(db, monkeypatch):
+    """Profiles of the singleton (whose ORM listeners are registered) loaded from the SQLite session.
+
+    The real loader's SQL is Postgres-only; this one counts the same rows and records each load.
+    """
+    calls = []
+
+    def load_profile(user_id):
+        calls.append(user_id)
+        count = lambda model, *where: db.execute(select(func.count()).select_from(model).where(*where)).scalar()
+        return {
+            "id": user_id,
+            "name": db.get(User, user_id).name,
+            "following_count": count(Follow, Follow.source_user_id == user_id),
+            "follower_count": count(Follow, Follow.destination_user_id == user_id),
+            "post_count": count(Post, Post.user_id == user_id),
+        }
+
+    monkeypatch.setattr(user_context_service, "_load_profile", load_profile)
+    user_context_service.invalidate_all()
+    yield calls
+    user_context_service.invalidate_all()
+
+
+def test_cached_profile_is_reused(loads):
+    first = user_context_service.get_profile(1)
+    assert user_context_service.get_profile(1) is first
+    assert loads == [1]
+
+
+def test_post_write_reloads_its_user_only(db, loads):
+    user_context_service.get_profile(1)
+    user_context_service.get_profile(2)
+
+    db.add(Post(id=1, user_id=1, media_id=1))
+    db.commit()
+
+    assert user_context_service.get_profile(1)["post_count"] == 1
+    user_context_service.get_profile(2)
+    assert loads == [1, 2, 1]
+
+
+def test_follow_write_reloads_both_users(db, loads):
+    user_context_service.get_profile(1)
+    user_context_service.get_profile(2)
+    user_context_service.get_profile(3)
+
+    db.add(Follow(id=1, source_user_id=1, destination_user_id=2))
+    db.commit()
+
+    assert user_context_service.get_profile(1)["following_count"] == 1
+    assert user_context_service.get_profile(2)["follower_count"] == 1
+    user_context_service.get_profile(3)
+    assert loads == [1, 2, 3, 1, 2]
+
+
+def test_media_write_reloads_every_profile(db, loads):
+    user_context_service.get_profile(1)
+    user_context_service.get_profile(2)
+
+    db.get(Media, 1).meta = {"tags": ["beach", "sunset"]}
+    db.commit()
+
+    user_context_service.get_profile(1)
+    user_context_service.get_profile(2)
+    assert loads == [1, 2, 1, 2]
+
+
+def test_flushed_writes_invalidate_only_once_committed(db, loads):
+    user_context_service.get_profile(1)
+
+    db.add(Post(id=1, user_id=1, media_id=1))
+    db.flush()
+    # Another connection can't see the row yet; reloading now would cache the old profile
+    assert user_context_service.get_profile(1)["post_count"] == 0
+    assert loads == [1]
+
+    db.commit()
+    assert user_context_service.get_profile(1)["post_count"] == 1
+    assert loads == [1, 1]
+
+
+def test_rolled_back_writes_keep_the_cache(db, loads):
+    user_context_service.get_profile(1)
+
+    db.add(Post(id=1, user_id=1, media_id=1))
+    db.flush()
+    db.rollback()
+    db.commit()
+
+    user_context_service.get_profile(1)
+    assert loads == [1]
+
+
+def test_load_racing_an_invalidation_is_not_cached():
+    class RacingService(UserContextService):
+        def __init__(self):
+            super().__init__()
+            self.loads = 0
+
+        def _load_profile(self, user_id):
+            self.loads += 1
+            if self.loads == 1:
+                # A commit lands while the first load is still reading
+                self.invalidate(user_id)
+            return {"id": user_id, "load": self.loads}
+
+    service = RacingService()
+    assert service.get_profile(1) == {"id": 1, "load": 1}
+    assert service.get_profile(1) == {"id": 1, "load": 2}
+    assert service.get_profile(1) == {"id": 1, "load": 2}
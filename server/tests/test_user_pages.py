@@ -0,0 +1,112 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+# The relationships on User resolve against these models
+import app.Follow.model  # noqa: F401
+import app.Media.model  # noqa: F401
+import app.Places.model  # noqa: F401
+import app.Post.model  # noqa: F401
+import app.Timeline.model  # noqa: F401
+from app.User.model import User
+from app.User.service import UserService
+
+
+class SQLiteUserService(UserService):
+    """pg_class only exists in Postgres; count the rows instead."""
+
+    def estimated_total(self, db):
+        return db.query(User).count()
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    User.__table__.create(engine)
+    with Session(engine) as session:
+        session.add_all(User(id=i, name=f"user {i}", email=f"user{i}@example.com", phone=i) for i in range(1, 8))
+        session.commit()
+        yield session
+
+
+def test_pages_follow_the_cursor_to_the_end(db):
+    service = SQLiteUserService()
+    ids, after_id = [], None
+    while True:
+        page = service.list_users(db, after_id=after_id, limit=3)
+        ids.extend(item["id"] for item in page["items"])
+        after_id = page["next_after_id"]
+        if after_id is None:
+            break
+
+    assert ids == list(range(1, 8))
+    assert page["total_estimate"] == 7
+
+
+def test_last_full_page_has_no_next_cursor(db):
+    page = SQLiteUserService().list_users(db, after_id=4, limit=3)
+    assert [item["id"] for item in page["items"]] == [5, 6, 7]
+    assert page["next_after_id"] is None
+
+
+def test_fields_select_columns_and_keep_id(db):
+    page = SQLiteUserService().list_users(db, limit=2, fields=["name"])
+    assert page["items"] == [{"id": 1, "name": "user 1"}, {"id": 2, "name": "user 2"}]
+    assert page["next_after_id"] == 2
+
+
+def test_unknown_field_is_rejected(db):
+    with pytest.raises(ValueError, match="password"):
+        SQLiteUserService().list_users(db, fields=["name", "password"])
+
+
+class StubResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class StubDB:
+    """Answers the pg_class estimate with reltuples and COUNT(*) with count."""
+
+    def __init__(self, reltuples, count):
+        self.reltuples = reltuples
+        self.count = count
+        self.queries = []
+
+    def execute(self, query):
+        sql = str(query)
+        self.queries.append("reltuples" if "pg_class" in sql else "count")
+        return StubResult(self.reltuples if "pg_class" in sql else self.count)
+
+
+@pytest.mark.parametrize("reltuples", [None, -1])
+def test_unanalyzed_table_falls_back_to_count(reltuples):
+    db = StubDB(reltuples=reltuples, count=42)
+    assert UserService().estimated_total(db) == 42
+    assert db.queries == ["reltuples", "count"]
+
+
+def test_analyzed_table_uses_reltuples():
+    db = StubDB(reltuples=1_000_000, count=999_999)
+    assert UserService().estimated_total(db) == 1_000_000
+    assert db.queries == ["reltuples"]
+
+
+def test_estimate_is_cached_until_it_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.User.service.time.monotonic", lambda: now[0])
+    service = UserService(count_cache_seconds=300)
+    db = StubDB(reltuples=10, count=10)
+
+    assert service.estimated_total(db) == 10
+    db.reltuples = 20
+    now[0] += 299
+    assert service.estimated_total(db) == 10
+    assert db.queries == ["reltuples"]
+
+    now[0] += 1
+    assert service.estimated_total(db) == 20
+    assert db.queries == ["reltuples", "reltuples"]